@@ -1,26 +1,88 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, Response, stream_with_context
 from flask_cors import CORS
+import base64
+import binascii
+import json
+import multiprocessing
 import os
 import sys
+import time
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from retrieval_system import InformationRetrievalSystem
-from config import JSON_FILE, MODEL_DIR
+from config import JSON_FILE, MODEL_DIR, MAX_PAGE_SIZE, MAX_SUGGESTIONS
 
 app = Flask(__name__)
 CORS(app)
 
-ir_system = InformationRetrievalSystem(model_path=MODEL_DIR)
-ir_system.load_collection(filepath=JSON_FILE)
+ir_system = None
+metrics = None
+if multiprocessing.parent_process() is None:
+    # Spawned encoder workers re-import this module; only the server process
+    # loads the model and the collection.
+    ir_system = InformationRetrievalSystem(model_path=MODEL_DIR)
+    ir_system.load_collection(filepath=JSON_FILE)
+    metrics = ir_system.metrics
+
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    if endpoint != "/metrics":
+        metrics.increment(
+            "http_requests_total",
+            help_text="HTTP requests by endpoint, method and status.",
+            endpoint=endpoint,
+            method=request.method,
+            status=response.status_code,
+        )
+        if "request_start" in g:
+            metrics.observe_request(endpoint, time.perf_counter() - g.request_start)
+    return response
+
+
+def encode_cursor(query: str, offset: int, page_size: int) -> str:
+    payload = json.dumps({"q": query, "o": offset, "n": page_size}).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return str(payload["q"]), int(payload["o"]), int(payload["n"])
+    except (ValueError, KeyError, TypeError, binascii.Error):
+        raise ValueError("Invalid cursor")
+
+
+def serialize_result(doc, score):
+    return {
+        "document": doc,
+        "score": float(score),
+    }
 
 
 @app.route("/api/search", methods=["POST"])
 def search():
     try:
         data = request.json
-        query = data.get("query", "")
-        top_k = data.get("top_k", 10)
+        cursor = data.get("cursor")
+
+        if cursor:
+            try:
+                query, offset, top_k = decode_cursor(cursor)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+        else:
+            query = data.get("query", "")
+            top_k = data.get("top_k", 10)
+            offset = 0
 
         if not query:
             return jsonify({"error": "Query is required"}), 400
@@ -28,36 +90,97 @@ def search():
         if isinstance(top_k, str):
             top_k = int(top_k)
 
-        top_k = min(max(1, top_k), 50)
+        top_k = min(max(1, top_k), MAX_PAGE_SIZE)
+        offset = max(0, offset)
 
-        print(f"Searching for '{query}' with top_k={top_k}")
+        print(f"Searching for '{query}' with top_k={top_k}, offset={offset}")
 
-        results = ir_system.retrieve(query, top_k=top_k)
+        results = ir_system.retrieve(query, top_k=top_k, offset=offset)
+        total = len(ir_system.documents)
 
-        serializable_results = []
-        for doc, score in results:
-            serializable_results.append(
+        with metrics.timer("serialisation"):
+            serializable_results = [
+                serialize_result(doc, score) for doc, score in results
+            ]
+
+            next_offset = offset + len(results)
+            next_cursor = (
+                encode_cursor(query, next_offset, top_k)
+                if results and next_offset < total
+                else None
+            )
+
+            response = jsonify(
                 {
-                    "document": doc,
-                    "score": float(score),
+                    "query": query,
+                    "results": serializable_results,
+                    "offset": offset,
+                    "total": total,
+                    "next_cursor": next_cursor,
                 }
             )
 
-        return jsonify({"query": query, "results": serializable_results})
+        return response
     except Exception as e:
+        metrics.increment(
+            "search_errors_total", help_text="Searches that raised an error."
+        )
         print(f"Error in search: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/api/search/stream", methods=["POST"])
+def search_stream():
+    try:
+        data = request.json
+        query = data.get("query", "")
+        limit = data.get("limit")
+
+        if not query:
+            return jsonify({"error": "Query is required"}), 400
+
+        if limit is not None:
+            limit = max(1, int(limit))
+
+        print(f"Streaming results for '{query}' with limit={limit}")
+
+        results = ir_system.iter_results(query, limit=limit)
+
+        def generate():
+            for rank, (doc, score) in enumerate(results, 1):
+                result = serialize_result(doc, score)
+                result["rank"] = rank
+                yield json.dumps(result, ensure_ascii=False) + "\n"
+
+        return Response(
+            stream_with_context(generate()), mimetype="application/x-ndjson"
+        )
+    except Exception as e:
+        metrics.increment(
+            "search_errors_total", help_text="Searches that raised an error."
+        )
+        print(f"Error in search stream: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/suggest", methods=["GET"])
+def suggest():
+    try:
+        query = request.args.get("q", default="", type=str)
+        limit = request.args.get("limit", default=8, type=int)
+        limit = min(max(1, limit), MAX_SUGGESTIONS)
+
+        suggestions = ir_system.suggest(query, limit=limit)
+
+        return jsonify({"query": query, "suggestions": suggestions})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route("/api/document/<path:doc_id>", methods=["GET"])
 def get_document(doc_id):
     try:
-        document = None
-        for doc in ir_system.documents:
-            if doc.get("id") == doc_id:
-                document = doc
-                break
-
+        document = ir_system.get_document_by_id(doc_id)
         if document is None:
             return jsonify({"error": "Document not found"}), 404
 
@@ -71,12 +194,7 @@ def get_similar_documents(doc_id):
     try:
         top_k = request.args.get("top_k", default=5, type=int)
 
-        doc_index = -1
-        for idx, doc in enumerate(ir_system.documents):
-            if doc.get("id") == doc_id:
-                doc_index = idx
-                break
-
+        doc_index = ir_system.get_document_index(doc_id)
         if doc_index == -1:
             return jsonify({"error": "Document not found"}), 404
 
@@ -129,6 +247,7 @@ def get_stats():
         stats = {
             "total_documents": len(ir_system.documents),
             "cache_stats": cache_stats,
+            "performance": metrics.get_stats(),
         }
 
         return jsonify(stats)
@@ -136,5 +255,12 @@ def get_stats():
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    return Response(
+        metrics.render_prometheus(), mimetype="text/plain; version=0.0.4"
+    )
+
+
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,122 @@
+import os
+import resource
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, Any
+from data_extraction import CollectionExtractor
+from oai_simulator import SyntheticRepository, OAIPMHSimulator
+from colorama import Fore, Style, init
+
+init(autoreset=True)
+
+BENCHMARK_COLLECTIONS = {"msc_sim": 1500, "phd_sim": 1000, "other_sim": 500}
+
+SCENARIOS = {
+    "clean": {},
+    "faulty": {
+        "unavailable_rate": 0.05,
+        "malformed_rate": 0.02,
+        "timeout_rate": 0.01,
+    },
+}
+
+
+def run_harvest(
+    simulator: OAIPMHSimulator,
+    concurrent: bool,
+    max_records: int,
+    requests_per_second: float,
+    timeout: float,
+) -> Dict[str, Any]:
+    extractor = CollectionExtractor(
+        base_url=simulator.url,
+        requests_per_second=requests_per_second,
+        timeout=timeout,
+    )
+    collections = {name: name for name in simulator.repository.collections}
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_file = os.path.join(tmp_dir, "harvest.xml")
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        collection_stats = extractor.extract_multiple_collections(
+            collections,
+            max_records=max_records,
+            filepath=output_file,
+            concurrent=concurrent,
+        )
+        elapsed = time.perf_counter() - start
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        output_size = os.path.getsize(output_file)
+
+    records = sum(collection_stats.values())
+    return {
+        "records": records,
+        "seconds": elapsed,
+        "records_per_second": records / elapsed if elapsed > 0 else 0.0,
+        "megabytes": output_size / (1024 * 1024),
+        "peak_python_mb": peak_memory / (1024 * 1024),
+        **extractor.stats,
+    }
+
+
+def run_benchmark(
+    page_size: int = 100,
+    latency: float = 0.05,
+    requests_per_second: float = 50.0,
+    timeout: float = 2.0,
+) -> Dict[str, Dict[str, Any]]:
+    repository = SyntheticRepository(BENCHMARK_COLLECTIONS)
+    max_records = sum(BENCHMARK_COLLECTIONS.values())
+    results = {}
+
+    for scenario, faults in SCENARIOS.items():
+        for mode, concurrent in (("sequential", False), ("concurrent", True)):
+            simulator = OAIPMHSimulator(
+                repository,
+                page_size=page_size,
+                latency=latency,
+                timeout_delay=timeout * 2,
+                **faults,
+            )
+            with simulator:
+                results[f"{scenario}/{mode}"] = run_harvest(
+                    simulator, concurrent, max_records, requests_per_second, timeout
+                )
+
+    return results
+
+
+def print_results(results: Dict[str, Dict[str, Any]]) -> None:
+    print("\n" + "=" * 96)
+    print(f"{Fore.CYAN}HARVESTER BENCHMARK{Style.RESET_ALL}")
+    print("=" * 96)
+    print(
+        f"{'run':22} {'records':>8} {'time (s)':>9} {'rec/s':>9} {'requests':>9} "
+        f"{'retries':>8} {'throttled':>9} {'failed':>7} {'peak MB':>8}"
+    )
+    print("-" * 96)
+    for name, result in results.items():
+        print(
+            f"{Fore.YELLOW}{name:22}{Style.RESET_ALL} {result['records']:>8} "
+            f"{result['seconds']:>9.2f} {result['records_per_second']:>9.1f} "
+            f"{result['requests']:>9} {result['retries']:>8} {result['throttled']:>9} "
+            f"{result['failed_pages']:>7} {result['peak_python_mb']:>8.2f}"
+        )
+    print("-" * 96)
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{Fore.BLUE}Process peak RSS: {max_rss:.1f} MB{Style.RESET_ALL}")
+    print("=" * 96)
+
+
+def main():
+    results = run_benchmark()
+    print_results(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import os
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from typing import Dict, Any, List, Optional
+from data_processing import DocumentProcessor
+from oai_simulator import SyntheticRepository
+from colorama import Fore, Style, init
+
+init(autoreset=True)
+
+BENCHMARK_RECORDS = 5000
+ROUNDS = 3
+WORKER_COUNTS = (1, 2, 4, 8)
+
+
+class XPathDocumentProcessor(DocumentProcessor):
+    """Previous extractor: one XPath search per field, kept as the baseline."""
+
+    def _process_record(self, record: ET.Element) -> Optional[Dict[str, Any]]:
+        metadata = record.find(".//dim:dim", self.namespaces)
+        if metadata is None:
+            return None
+
+        collection_values = []
+        for field in metadata.findall(
+            ".//dim:field[@element='relation']", self.namespaces
+        ):
+            if field.text and field.text.strip():
+                collection_values.append(field.text.strip())
+
+        doc = {
+            "id": self._extract_identifier(record),
+            "uri": self._extract_field(metadata, "identifier", "uri"),
+            "title": self._extract_field(metadata, "title"),
+            "abstract": self._extract_field(metadata, "description", "abstract"),
+            "authors": self._extract_multiple_fields(metadata, "contributor", "author"),
+            "keywords": self._extract_multiple_fields(metadata, "subject"),
+            "date": self._extract_field(metadata, "date", "issued"),
+            "type": self._extract_field(metadata, "type"),
+            "language": self._extract_field(metadata, "language", "iso"),
+            "subjects_udc": self._extract_multiple_fields(metadata, "subject", "udc"),
+            "subjects_fos": self._extract_multiple_fields(metadata, "subject", "fos"),
+            "grade": self._extract_field(metadata, "degree", "grade"),
+            "collections": collection_values,
+        }
+        return self._clean_document(doc)
+
+    def _extract_field(
+        self, metadata: ET.Element, element: str, qualifier: str = None
+    ) -> str:
+        xpath = f".//dim:field[@element='{element}']"
+        if qualifier:
+            xpath += f"[@qualifier='{qualifier}']"
+
+        field = metadata.find(xpath, self.namespaces)
+        return field.text if field is not None and field.text else ""
+
+    def _extract_multiple_fields(
+        self, metadata: ET.Element, element: str, qualifier: str = None
+    ) -> List[str]:
+        xpath = f".//dim:field[@element='{element}']"
+        if qualifier:
+            xpath += f"[@qualifier='{qualifier}']"
+
+        fields = metadata.findall(xpath, self.namespaces)
+        return [field.text for field in fields if field.text]
+
+
+def time_extraction(
+    processor: DocumentProcessor, records: List[ET.Element]
+) -> Dict[str, Any]:
+    best = float("inf")
+    documents = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        documents = [processor._process_record(record) for record in records]
+        best = min(best, time.perf_counter() - start)
+
+    return {
+        "documents": documents,
+        "seconds": best,
+        "records_per_second": len(records) / best if best > 0 else 0.0,
+    }
+
+
+def time_streaming(xml_file: str, record_count: int, workers: int) -> Dict[str, Any]:
+    processor = DocumentProcessor(workers=workers)
+    start = time.perf_counter()
+    documents = list(processor.iter_documents(xml_file))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "documents": documents,
+        "seconds": elapsed,
+        "records_per_second": record_count / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def run_benchmark(record_count: int = BENCHMARK_RECORDS) -> Dict[str, Dict[str, Any]]:
+    repository = SyntheticRepository({"msc_sim": record_count})
+    results = {}
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        xml_file = os.path.join(tmp_dir, "records.xml")
+        repository.write_xml_file(xml_file, "msc_sim", record_count)
+        records = list(ET.parse(xml_file).getroot())
+
+        processor = DocumentProcessor(workers=1)
+        results["xpath"] = time_extraction(XPathDocumentProcessor(workers=1), records)
+        results["single-pass"] = time_extraction(processor, records)
+        if results["xpath"]["documents"] != results["single-pass"]["documents"]:
+            raise AssertionError("Single-pass extraction differs from the XPath baseline")
+
+        expected = [
+            doc
+            for doc in results["single-pass"]["documents"]
+            if doc and processor._is_valid_document(doc)
+        ]
+        for workers in WORKER_COUNTS:
+            if workers > (os.cpu_count() or 1):
+                break
+            result = time_streaming(xml_file, record_count, workers)
+            if result["documents"] != expected:
+                raise AssertionError(
+                    f"Conversion with {workers} workers differs from the serial output"
+                )
+            results[f"stream/{workers} workers"] = result
+
+    return results
+
+
+def print_results(results: Dict[str, Dict[str, Any]]) -> None:
+    print("\n" + "=" * 60)
+    print(f"{Fore.CYAN}RECORD PROCESSING BENCHMARK{Style.RESET_ALL}")
+    print("=" * 60)
+    print(f"{'run':20} {'docs':>8} {'time (s)':>10} {'rec/s':>12}")
+    print("-" * 60)
+    for name, result in results.items():
+        print(
+            f"{Fore.YELLOW}{name:20}{Style.RESET_ALL} {len(result['documents']):>8} "
+            f"{result['seconds']:>10.3f} {result['records_per_second']:>12.1f}"
+        )
+    print("-" * 60)
+    speedup = results["xpath"]["seconds"] / results["single-pass"]["seconds"]
+    print(f"{Fore.GREEN}✅ Identical output, {speedup:.2f}x faster{Style.RESET_ALL}")
+    print("=" * 60)
+
+
+def main():
+    results = run_benchmark()
+    print_results(results)
+
+
+if __name__ == "__main__":
+    main()
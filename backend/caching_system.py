@@ -1,7 +1,10 @@
 import pickle
 import hashlib
 import os
-from typing import Dict, List, Any
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Tuple
 import numpy as np
 from colorama import Fore, Style, init
 
@@ -94,21 +97,65 @@ class EmbeddingCache:
         }
 
 
+class RankingCache:
+    def __init__(self, max_items: int = 256):
+        self.max_items = max_items
+        self.rankings = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        with self._lock:
+            ranking = self.rankings.get(key)
+            if ranking is not None:
+                self.rankings.move_to_end(key)
+            return ranking
+
+    def store(self, key: str, ranked_indices: np.ndarray, scores: np.ndarray):
+        with self._lock:
+            self.rankings[key] = (ranked_indices, scores)
+            self.rankings.move_to_end(key)
+            while len(self.rankings) > self.max_items:
+                self.rankings.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self.rankings.clear()
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            cached_rankings = len(self.rankings)
+            cached_bytes = sum(
+                indices.nbytes + scores.nbytes
+                for indices, scores in self.rankings.values()
+            )
+
+        return {
+            "cached_rankings": cached_rankings,
+            "ranking_cache_bytes": cached_bytes,
+        }
+
+
 class PerformanceMonitor:
     def __init__(self):
-        self.timings = {}
+        self.timings = threading.local()
         self.counters = {}
+        self._lock = threading.Lock()
 
-    def start_timer(self, operation: str):
-        import time
+    def _start_times(self) -> Dict[str, float]:
+        if not hasattr(self.timings, "start_times"):
+            self.timings.start_times = {}
+        return self.timings.start_times
 
-        self.timings[operation] = time.time()
+    def start_timer(self, operation: str):
+        self._start_times()[operation] = time.perf_counter()
 
     def end_timer(self, operation: str):
-        import time
+        start_time = self._start_times().pop(operation, None)
+        if start_time is None:
+            return 0
 
-        if operation in self.timings:
-            duration = time.time() - self.timings[operation]
+        duration = time.perf_counter() - start_time
+        with self._lock:
             if f"{operation}_total" not in self.counters:
                 self.counters[f"{operation}_total"] = 0
                 self.counters[f"{operation}_count"] = 0
@@ -116,19 +163,21 @@ class PerformanceMonitor:
             self.counters[f"{operation}_total"] += duration
             self.counters[f"{operation}_count"] += 1
 
-            return duration
-        return 0
+        return duration
 
     def get_stats(self) -> Dict[str, float]:
+        with self._lock:
+            counters = dict(self.counters)
+
         stats = {}
-        for key, value in self.counters.items():
+        for key, value in counters.items():
             if key.endswith("_total"):
                 operation = key[:-6]
                 count_key = f"{operation}_count"
-                if count_key in self.counters:
-                    avg_time = value / self.counters[count_key]
+                if count_key in counters:
+                    avg_time = value / counters[count_key]
                     stats[f"{operation}_avg_time"] = avg_time
                     stats[f"{operation}_total_time"] = value
-                    stats[f"{operation}_count"] = self.counters[count_key]
+                    stats[f"{operation}_count"] = counters[count_key]
 
         return stats
@@ -0,0 +1,254 @@
+import time
+from typing import List, Dict, Any, Tuple
+import numpy as np
+from config import (
+    ANALYSIS_DUPLICATE_THRESHOLD,
+    ANALYSIS_DENSITY_THRESHOLD,
+    ANALYSIS_TOP_K,
+    ANALYSIS_BLOCK_SIZE,
+    COLLECTION_ANALYSIS_REPORT,
+    COLLECTION_DENSITY_FILE,
+)
+from utils import DisjointSet, save_json, save_jsonl
+from colorama import Fore, Style, init
+
+init(autoreset=True)
+
+
+class EmbeddingPairAnalyzer:
+    """Upper-triangular blocked cosine scan; memory is O(block² + n·top_k)."""
+
+    def __init__(
+        self,
+        duplicate_threshold: float = ANALYSIS_DUPLICATE_THRESHOLD,
+        density_threshold: float = ANALYSIS_DENSITY_THRESHOLD,
+        top_k: int = ANALYSIS_TOP_K,
+        block_size: int = ANALYSIS_BLOCK_SIZE,
+    ):
+        self.duplicate_threshold = duplicate_threshold
+        self.density_threshold = density_threshold
+        self.top_k = top_k
+        self.block_size = block_size
+        self.stats = {"blocks": 0, "duplicate_pairs": 0, "seconds": 0.0}
+
+    def analyze(self, embeddings: np.ndarray) -> Dict[str, Any]:
+        start = time.perf_counter()
+
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.maximum(norms, 1e-12)
+
+        count = len(vectors)
+        top_k = min(self.top_k, max(count - 1, 0))
+        top_scores = np.full((count, top_k), -np.inf, dtype=np.float32)
+        neighbours_above = np.zeros(count, dtype=np.int32)
+        duplicate_pairs: List[Tuple[int, int, float]] = []
+
+        self.stats["blocks"] = 0
+        for row_start in range(0, count, self.block_size):
+            row_end = min(row_start + self.block_size, count)
+            rows = vectors[row_start:row_end]
+
+            for col_start in range(row_start, count, self.block_size):
+                col_end = min(col_start + self.block_size, count)
+                block = rows @ vectors[col_start:col_end].T
+                diagonal = row_start == col_start
+
+                if diagonal:
+                    np.fill_diagonal(block, -np.inf)
+
+                self._update_density(
+                    block, row_start, top_scores, neighbours_above, top_k
+                )
+                if not diagonal:
+                    self._update_density(
+                        block.T, col_start, top_scores, neighbours_above, top_k
+                    )
+
+                # Diagonal blocks are symmetric; only their upper half is new.
+                candidates = block if not diagonal else np.triu(block, k=1)
+                row_ids, col_ids = np.nonzero(candidates >= self.duplicate_threshold)
+                duplicate_pairs.extend(
+                    zip(
+                        (row_ids + row_start).tolist(),
+                        (col_ids + col_start).tolist(),
+                        block[row_ids, col_ids].tolist(),
+                    )
+                )
+                self.stats["blocks"] += 1
+
+        top_scores = -np.sort(-top_scores, axis=1)
+        self.stats["duplicate_pairs"] = len(duplicate_pairs)
+        self.stats["seconds"] = time.perf_counter() - start
+
+        return {
+            "duplicate_pairs": duplicate_pairs,
+            "nearest_similarity": top_scores[:, 0] if top_k else np.zeros(count),
+            "mean_top_k_similarity": (
+                top_scores.mean(axis=1) if top_k else np.zeros(count)
+            ),
+            "neighbours_above": neighbours_above,
+        }
+
+    def _update_density(
+        self,
+        block: np.ndarray,
+        offset: int,
+        top_scores: np.ndarray,
+        neighbours_above: np.ndarray,
+        top_k: int,
+    ) -> None:
+        rows = slice(offset, offset + block.shape[0])
+        neighbours_above[rows] += np.count_nonzero(
+            block >= self.density_threshold, axis=1
+        )
+        if top_k == 0:
+            return
+
+        merged = np.concatenate([top_scores[rows], block], axis=1)
+        top_scores[rows] = np.partition(merged, merged.shape[1] - top_k, axis=1)[
+            :, -top_k:
+        ]
+
+
+def duplicate_groups(
+    documents, duplicate_pairs: List[Tuple[int, int, float]]
+) -> List[Dict[str, Any]]:
+    disjoint_set = DisjointSet(len(documents))
+    min_similarity: Dict[int, float] = {}
+    for first, second, _ in duplicate_pairs:
+        disjoint_set.union(first, second)
+
+    for first, second, score in duplicate_pairs:
+        root = disjoint_set.find(first)
+        min_similarity[root] = min(min_similarity.get(root, 1.0), score)
+
+    groups = []
+    for members in disjoint_set.groups():
+        root = disjoint_set.find(members[0])
+        groups.append(
+            {
+                "size": len(members),
+                "min_similarity": round(min_similarity[root], 4),
+                "documents": [
+                    {
+                        "index": index,
+                        "id": documents[index].get("id", ""),
+                        "title": documents[index].get("title", ""),
+                    }
+                    for index in members
+                ],
+            }
+        )
+
+    groups.sort(key=lambda group: (-group["size"], -group["min_similarity"]))
+    return groups
+
+
+def analyze_collection(
+    documents,
+    embeddings: np.ndarray,
+    analyzer: EmbeddingPairAnalyzer = None,
+    report_file: str = COLLECTION_ANALYSIS_REPORT,
+    density_file: str = COLLECTION_DENSITY_FILE,
+) -> Dict[str, Any]:
+    analyzer = analyzer or EmbeddingPairAnalyzer()
+    result = analyzer.analyze(embeddings)
+    groups = duplicate_groups(documents, result["duplicate_pairs"])
+
+    if hasattr(documents, "column"):
+        document_ids = documents.column("id")
+    else:
+        document_ids = [doc.get("id", "") for doc in documents]
+
+    nearest = result["nearest_similarity"]
+    neighbours = result["neighbours_above"]
+    percentiles = (50, 90, 99)
+    report = {
+        "documents": len(documents),
+        "duplicate_threshold": analyzer.duplicate_threshold,
+        "density_threshold": analyzer.density_threshold,
+        "top_k": analyzer.top_k,
+        **analyzer.stats,
+        "duplicate_groups": len(groups),
+        "documents_in_groups": sum(group["size"] for group in groups),
+        "nearest_similarity_percentiles": {
+            f"p{p}": float(np.percentile(nearest, p)) if len(nearest) else 0.0
+            for p in percentiles
+        },
+        "neighbours_above_percentiles": {
+            f"p{p}": float(np.percentile(neighbours, p)) if len(neighbours) else 0.0
+            for p in percentiles
+        },
+        "isolated_documents": int(np.count_nonzero(neighbours == 0)),
+        "groups": groups,
+    }
+    save_json(report, report_file)
+
+    save_jsonl(
+        (
+            {
+                "id": document_ids[index],
+                "nearest_similarity": round(float(nearest[index]), 4),
+                "mean_top_k_similarity": round(
+                    float(result["mean_top_k_similarity"][index]), 4
+                ),
+                "neighbours_above": int(neighbours[index]),
+            }
+            for index in range(len(documents))
+        ),
+        density_file,
+    )
+
+    return report
+
+
+def print_report(report: Dict[str, Any], max_groups: int = 10) -> None:
+    print("\n" + "=" * 60)
+    print(f"{Fore.CYAN}COLLECTION ANALYSIS{Style.RESET_ALL}")
+    print("=" * 60)
+    print(
+        f"{Fore.YELLOW}Documents: {report['documents']:,} | Blocks: {report['blocks']:,} | "
+        f"{report['seconds']:.2f}s{Style.RESET_ALL}"
+    )
+    print(
+        f"{Fore.RED}Duplicate groups (cos ≥ {report['duplicate_threshold']}): "
+        f"{report['duplicate_groups']:,} covering {report['documents_in_groups']:,} documents{Style.RESET_ALL}"
+    )
+    print(
+        f"{Fore.BLUE}Nearest-neighbour similarity: {report['nearest_similarity_percentiles']}{Style.RESET_ALL}"
+    )
+    print(
+        f"{Fore.BLUE}Neighbours with cos ≥ {report['density_threshold']}: "
+        f"{report['neighbours_above_percentiles']} | isolated: {report['isolated_documents']:,}{Style.RESET_ALL}"
+    )
+
+    for group in report["groups"][:max_groups]:
+        print("-" * 60)
+        print(
+            f"{Fore.MAGENTA}{group['size']} documents, min cos {group['min_similarity']}{Style.RESET_ALL}"
+        )
+        for doc in group["documents"][:5]:
+            print(f"  - {doc['title']}")
+
+    print("=" * 60)
+
+
+def main():
+    from retrieval_system import InformationRetrievalSystem
+
+    ir_system = InformationRetrievalSystem()
+    # Thresholds are calibrated on the model's full-dimensional embeddings.
+    ir_system.projection = None
+    ir_system.load_collection()
+
+    report = analyze_collection(ir_system.documents, ir_system.document_embeddings)
+    print_report(report)
+    print(
+        f"{Fore.GREEN}Report saved to: {COLLECTION_ANALYSIS_REPORT} "
+        f"(per-document density: {COLLECTION_DENSITY_FILE}){Style.RESET_ALL}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+import json
+import mmap
+import os
+import re
+from collections.abc import Sequence
+from typing import List, Dict, Any, Iterable, Optional, Union
+import numpy as np
+from config import JSON_FILE, COLLECTION_STORE_FILE
+from utils import ensure_dir, load_json
+from colorama import Fore, Style, init
+
+init(autoreset=True)
+
+STORE_MAGIC = b"IRUMCOL1"
+LIST_SEPARATOR = "\x1f"
+
+STRING_FIELDS = ("id", "uri", "title", "abstract")
+LIST_FIELDS = ("authors", "keywords")
+CODED_FIELDS = ("type", "language")
+# Materialisation order; matches the documents written by DocumentProcessor.
+COLUMN_FIELDS = (
+    "id",
+    "uri",
+    "title",
+    "abstract",
+    "authors",
+    "keywords",
+    "date",
+    "type",
+    "language",
+)
+FIELD_BITS = {field: bit for bit, field in enumerate(COLUMN_FIELDS)}
+YEAR_PATTERN = re.compile(r"[1-9]\d{3}")
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) // 8 * 8
+
+
+class _StringHeap:
+    def __init__(self, count: int):
+        self.offsets = np.zeros(count + 1, dtype=np.uint64)
+        self.data = bytearray()
+
+    def append(self, value: str) -> None:
+        self.data += value.encode("utf-8")
+
+    def end_row(self, index: int) -> None:
+        self.offsets[index + 1] = len(self.data)
+
+
+def write_collection_store(
+    documents: Iterable[Dict[str, Any]], filepath: str = COLLECTION_STORE_FILE
+) -> int:
+    documents = list(documents)
+    count = len(documents)
+
+    present = np.zeros(count, dtype=np.uint16)
+    year = np.full(count, -1, dtype=np.int16)
+    codes = {field: np.zeros(count, dtype=np.uint16) for field in CODED_FIELDS}
+    vocabularies: Dict[str, Dict[str, int]] = {field: {} for field in CODED_FIELDS}
+    heaps = {
+        field: _StringHeap(count)
+        for field in STRING_FIELDS + LIST_FIELDS + ("extras",)
+    }
+
+    for index, doc in enumerate(documents):
+        extras = {}
+        for field, bit in FIELD_BITS.items():
+            if field not in doc:
+                continue
+            value = doc[field]
+
+            # Anything a column cannot hold exactly is kept in the extras heap.
+            if field in STRING_FIELDS and isinstance(value, str):
+                heaps[field].append(value)
+            elif field in LIST_FIELDS and _is_joinable(value):
+                heaps[field].append(LIST_SEPARATOR.join(value))
+            elif field == "date" and _is_year(value):
+                year[index] = int(value)
+            elif field in CODED_FIELDS and isinstance(value, str):
+                vocabulary = vocabularies[field]
+                codes[field][index] = vocabulary.setdefault(value, len(vocabulary))
+            else:
+                extras[field] = value
+                continue
+            present[index] |= 1 << bit
+
+        extras.update(
+            (key, value) for key, value in doc.items() if key not in COLUMN_FIELDS
+        )
+        if extras:
+            heaps["extras"].append(json.dumps(extras, ensure_ascii=False))
+
+        for heap in heaps.values():
+            heap.end_row(index)
+
+    arrays = {"present": present, "year": year}
+    arrays.update({f"{field}.code": column for field, column in codes.items()})
+    for field, heap in heaps.items():
+        arrays[f"{field}.offsets"] = heap.offsets
+        arrays[f"{field}.heap"] = np.frombuffer(bytes(heap.data), dtype=np.uint8)
+
+    # Arrays come first, each 8-byte aligned; the JSON header describing them
+    # follows, and the file ends with the header length.
+    columns = {}
+    position = len(STORE_MAGIC)
+    for name, array in arrays.items():
+        columns[name] = {
+            "dtype": array.dtype.str,
+            "length": len(array),
+            "offset": position,
+        }
+        position = _align(position + array.nbytes)
+
+    header = json.dumps(
+        {
+            "count": count,
+            "vocabularies": {
+                field: list(vocabulary) for field, vocabulary in vocabularies.items()
+            },
+            "columns": columns,
+        }
+    ).encode("utf-8")
+
+    ensure_dir(os.path.dirname(filepath))
+    tmp_path = f"{filepath}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(STORE_MAGIC)
+        for name, array in arrays.items():
+            f.write(b"\0" * (columns[name]["offset"] - f.tell()))
+            f.write(array.tobytes())
+        f.write(b"\0" * (position - f.tell()))
+        f.write(header)
+        f.write(np.uint64(len(header)).tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, filepath)
+
+    return count
+
+
+def _is_year(value: Any) -> bool:
+    return isinstance(value, str) and YEAR_PATTERN.fullmatch(value) is not None
+
+
+def _is_joinable(values: Any) -> bool:
+    return isinstance(values, list) and all(
+        isinstance(value, str) and value and LIST_SEPARATOR not in value
+        for value in values
+    )
+
+
+class CollectionStore(Sequence):
+    """Memory-mapped collection; documents are built only when accessed."""
+
+    def __init__(self, filepath: str = COLLECTION_STORE_FILE):
+        self.filepath = filepath
+        self.file = open(filepath, "rb")
+        self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self.buffer[: len(STORE_MAGIC)] != STORE_MAGIC:
+            self.close()
+            raise ValueError(f"Not a collection store: {filepath}")
+
+        header_end = len(self.buffer) - 8
+        header_size = int(np.frombuffer(self.buffer, np.uint64, 1, header_end)[0])
+        header = json.loads(self.buffer[header_end - header_size : header_end])
+
+        self.count = header["count"]
+        self.vocabularies = header["vocabularies"]
+        self.columns = {
+            name: np.frombuffer(
+                self.buffer, np.dtype(spec["dtype"]), spec["length"], spec["offset"]
+            )
+            for name, spec in header["columns"].items()
+        }
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(
+        self, index: Union[int, slice]
+    ) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
+        if isinstance(index, slice):
+            return [self._document(i) for i in range(*index.indices(self.count))]
+
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("collection index out of range")
+        return self._document(index)
+
+    def get_field(self, index: int, field: str) -> Any:
+        if field in COLUMN_FIELDS and self._is_present(index, field):
+            return self._column_value(index, field)
+        return self._extras(index).get(field)
+
+    def column(self, field: str) -> List[Any]:
+        return [self.get_field(index, field) for index in range(self.count)]
+
+    def close(self) -> None:
+        self.columns = {}
+        if self.buffer is not None:
+            self.buffer.close()
+            self.buffer = None
+        self.file.close()
+
+    def _document(self, index: int) -> Dict[str, Any]:
+        doc = {}
+        for field in COLUMN_FIELDS:
+            if self._is_present(index, field):
+                doc[field] = self._column_value(index, field)
+        doc.update(self._extras(index))
+        return doc
+
+    def _is_present(self, index: int, field: str) -> bool:
+        return bool(self.columns["present"][index] >> FIELD_BITS[field] & 1)
+
+    def _column_value(self, index: int, field: str) -> Any:
+        if field in STRING_FIELDS:
+            return self._string(field, index)
+        if field in LIST_FIELDS:
+            value = self._string(field, index)
+            return value.split(LIST_SEPARATOR) if value else []
+        if field == "date":
+            return str(int(self.columns["year"][index]))
+        return self.vocabularies[field][int(self.columns[f"{field}.code"][index])]
+
+    def _string(self, field: str, index: int) -> str:
+        offsets = self.columns[f"{field}.offsets"]
+        heap = self.columns[f"{field}.heap"]
+        start, end = int(offsets[index]), int(offsets[index + 1])
+        return heap[start:end].tobytes().decode("utf-8")
+
+    def _extras(self, index: int) -> Dict[str, Any]:
+        value = self._string("extras", index)
+        return json.loads(value) if value else {}
+
+
+def store_path_for(json_filepath: str) -> str:
+    return os.path.splitext(json_filepath)[0] + ".store"
+
+
+def open_collection(
+    filepath: str = JSON_FILE,
+) -> Union[CollectionStore, List[Dict[str, Any]]]:
+    # A store written next to the JSON file is used as long as it is not older
+    # than the JSON, so re-running the pipeline never serves stale documents.
+    store_path = filepath if filepath.endswith(".store") else store_path_for(filepath)
+    if os.path.exists(store_path) and (
+        store_path == filepath
+        or not os.path.exists(filepath)
+        or os.path.getmtime(store_path) >= os.path.getmtime(filepath)
+    ):
+        return CollectionStore(store_path)
+
+    return load_json(filepath)
+
+
+def convert_json_to_store(
+    json_filepath: str = JSON_FILE, store_filepath: Optional[str] = None
+) -> str:
+    store_filepath = store_filepath or store_path_for(json_filepath)
+    count = write_collection_store(load_json(json_filepath), store_filepath)
+
+    json_size = os.path.getsize(json_filepath) / (1024 * 1024)
+    store_size = os.path.getsize(store_filepath) / (1024 * 1024)
+    print(
+        f"{Fore.GREEN}💾 {count} documents written to {store_filepath}{Style.RESET_ALL}"
+    )
+    print(
+        f"{Fore.BLUE}📁 JSON: {json_size:.2f} MB → store: {store_size:.2f} MB{Style.RESET_ALL}"
+    )
+    return store_filepath
+
+
+def main():
+    convert_json_to_store(JSON_FILE, COLLECTION_STORE_FILE)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,7 +9,9 @@ MAX_RECORDS = 10000
 DATA_DIR = "data"
 XML_FILE = f"{DATA_DIR}/repositorium_data.xml"
 JSON_FILE = f"{DATA_DIR}/collection_documents.json"
-TRAIN_FILE = f"{DATA_DIR}/training_similarities.json"
+JSONL_FILE = f"{DATA_DIR}/collection_documents.jsonl"
+TRAIN_FILE = f"{DATA_DIR}/training_pairs.npz"
+LEGACY_TRAIN_FILE = f"{DATA_DIR}/training_similarities.json"
 MODEL_DIR = "models"
 
 BASE_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
@@ -26,3 +28,66 @@ EXTRACTION_TIMEOUT = 45
 MAX_RETRIES = 3
 BASE_DELAY = 1.0
 MAX_CONSECUTIVE_ERRORS = 5
+
+MAX_PAGE_SIZE = 50
+RANKING_CACHE_SIZE = 256
+MAX_SUGGESTIONS = 20
+
+HARVEST_CONCURRENT = True
+HARVEST_WORKERS = 4
+HARVEST_REQUESTS_PER_SECOND = 2.0
+HARVEST_BURST = 2
+MAX_BACKOFF_DELAY = 60.0
+
+XML_DELTA_FILE = f"{DATA_DIR}/repositorium_delta.xml"
+HARVEST_STATE_FILE = f"{DATA_DIR}/harvest_state.json"
+
+PROCESSING_WORKERS = None  # None uses every CPU core
+PROCESSING_CHUNK_SIZE = 250
+
+COLLECTION_STORE_FILE = f"{DATA_DIR}/collection_documents.store"
+
+NEAR_DUPLICATE_DETECTION = True
+NEAR_DUPLICATE_THRESHOLD = 0.85
+MINHASH_PERMUTATIONS = 128
+SHINGLE_SIZE = 5
+NEAR_DUPLICATE_REPORT = f"{DATA_DIR}/near_duplicates_report.json"
+
+ANALYSIS_DUPLICATE_THRESHOLD = 0.95
+ANALYSIS_DENSITY_THRESHOLD = 0.75
+ANALYSIS_TOP_K = 10
+ANALYSIS_BLOCK_SIZE = 2048
+COLLECTION_ANALYSIS_REPORT = f"{DATA_DIR}/collection_analysis.json"
+COLLECTION_DENSITY_FILE = f"{DATA_DIR}/collection_density.jsonl"
+
+MAX_PAIRS_PER_DOCUMENT = 50
+SIMILARITY_WORKERS = None  # None uses every CPU core
+
+TFIDF_STREAMING = False
+TFIDF_HASH_FEATURES = 2**20
+TFIDF_CHUNK_SIZE = 10000
+
+MINED_PAIRS_FILE = f"{DATA_DIR}/mined_pairs.npz"
+MINING_REPORT = f"{DATA_DIR}/mining_report.json"
+MINING_TOP_K = 10
+MINING_MIN_LOSS = 0.04  # |model cosine - label| >= 0.2
+MINING_BLOCK_SIZE = 2048
+TRAINING_COST_FACTOR = 3.0  # training step cost relative to a forward pass
+
+TRAINING_TOKEN_CACHE = True
+TOKEN_CACHE_DIR = "cache/tokens"
+BUCKET_BATCHES = 50
+EVALUATION_BATCH_SIZE = 128
+TRAINING_CHECKPOINT = f"{MODEL_DIR}/training_checkpoint.pt"
+CHECKPOINT_STEPS = 200
+TELEMETRY_STEPS = 50
+TRAINING_TELEMETRY_FILE = f"{DATA_DIR}/training_telemetry.jsonl"
+
+EMBEDDING_PROJECTION = "pca"  # "pca", or "truncate" for Matryoshka-trained models
+EMBEDDING_DIMENSIONS = 128
+MATRYOSHKA_DIMS = None  # e.g. (384, 256, 128, 64) to train with MatryoshkaLoss
+PROJECTION_FILE = "embedding_projection.npz"
+PROJECTION_REPORT = f"{DATA_DIR}/projection_report.json"
+
+ENCODING_WORKERS = 4  # each worker loads its own copy of the model; None uses every CPU core
+ENCODING_CHUNK_SIZE = 256
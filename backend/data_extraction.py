@@ -1,29 +1,74 @@
 import requests
+import threading
 import time
-import os
-from typing import Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
 import xml.etree.ElementTree as ET
+from requests.adapters import HTTPAdapter
 from config import *
-from utils import ensure_dir
+from harvest_sink import XmlRecordSink
+from harvest_state import HarvestState
+from rate_limiter import HostRateLimiter, parse_retry_after
 import random
 from colorama import Fore, Style, init
 
 init(autoreset=True)
 
+OAI_NS = "http://www.openarchives.org/OAI/2.0/"
+
+
+class RecordBudget:
+    def __init__(self, max_records: int):
+        self.remaining = max_records
+        self._lock = threading.Lock()
+
+    def take(self, requested: int) -> int:
+        with self._lock:
+            granted = min(requested, self.remaining)
+            self.remaining -= granted
+            return granted
+
+    def exhausted(self) -> bool:
+        with self._lock:
+            return self.remaining <= 0
+
 
 class CollectionExtractor:
-    def __init__(self, base_url: str = REPOSITORIUM_BASE_URL):
+    def __init__(
+        self,
+        base_url: str = REPOSITORIUM_BASE_URL,
+        requests_per_second: float = HARVEST_REQUESTS_PER_SECOND,
+        max_workers: int = HARVEST_WORKERS,
+        timeout: float = EXTRACTION_TIMEOUT,
+    ):
         self.base_url = base_url
+        self.timeout = timeout
+        self.max_workers = max_workers
         self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
         self.session.headers.update(
             {
                 "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
             }
         )
+        self.rate_limiter = HostRateLimiter(requests_per_second, HARVEST_BURST)
+        self.stats = {"requests": 0, "retries": 0, "throttled": 0, "failed_pages": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, stat: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            self.stats[stat] += amount
 
     def extract_multiple_collections(
-        self, collections: dict, max_records: int = MAX_RECORDS
-    ) -> str:
+        self,
+        collections: dict,
+        max_records: int = MAX_RECORDS,
+        filepath: str = XML_FILE,
+        concurrent: bool = HARVEST_CONCURRENT,
+        state: HarvestState = None,
+    ) -> Dict[str, int]:
         print(
             f"{Fore.CYAN}Starting extraction from multiple collections{Style.RESET_ALL}"
         )
@@ -33,58 +78,77 @@ class CollectionExtractor:
         print(f"{Fore.BLUE}Total target: {max_records} records{Style.RESET_ALL}")
         print("=" * 60)
 
-        xml_content = '<?xml version="1.0" encoding="UTF-8"?>\n<collection>\n'
-        total_records = 0
-        collection_stats = {}
-
-        for collection_name, collection_id in collections.items():
-            if total_records >= max_records:
-                print(
-                    f"{Fore.GREEN}Target of {max_records} records reached!{Style.RESET_ALL}"
-                )
-                break
+        start_time = time.perf_counter()
+        budget = RecordBudget(max_records)
 
-            remaining_records = max_records - total_records
+        resuming = (
+            state is not None
+            and state.in_progress
+            and state.output_file == filepath
+        )
+        if resuming:
+            filepath = state.output_file
             print(
-                f"\n{Fore.MAGENTA}📁 COLLECTION: {collection_name} ({collection_id}){Style.RESET_ALL}"
+                f"{Fore.YELLOW}Resuming interrupted harvest into {filepath}{Style.RESET_ALL}"
             )
+            sink = XmlRecordSink(
+                filepath,
+                append=state.output_offset is not None,
+                resume_offset=state.output_offset,
+            ).open()
+        else:
+            sink = XmlRecordSink(filepath).open()
+            if state is not None:
+                if state.in_progress:
+                    print(
+                        f"{Fore.YELLOW}Discarding unfinished harvest into {state.output_file}{Style.RESET_ALL}"
+                    )
+                state.start_run(filepath)
+
+        if concurrent and len(collections) > 1:
+            workers = min(self.max_workers, len(collections))
             print(
-                f"{Fore.CYAN}Remaining records needed: {remaining_records}{Style.RESET_ALL}"
+                f"{Fore.MAGENTA}Harvesting {len(collections)} collections with {workers} workers{Style.RESET_ALL}"
             )
-            print("-" * 40)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    collection_name: executor.submit(
+                        self._extract_collection_safely,
+                        collection_name,
+                        collection_id,
+                        sink,
+                        budget,
+                        state,
+                    )
+                    for collection_name, collection_id in collections.items()
+                }
+                collection_stats = {
+                    name: future.result() for name, future in futures.items()
+                }
+        else:
+            collection_stats = {}
+            for collection_name, collection_id in collections.items():
+                if budget.exhausted():
+                    # The record cap ends the run; a collection it never
+                    # reaches keeps its progress for the next run.
+                    if state is not None:
+                        state.defer_collection(collection_id)
+                    continue
 
-            try:
-                collection_xml, records_extracted = self.extract_single_collection(
-                    collection_id, remaining_records
+                collection_stats[collection_name] = self._extract_collection_safely(
+                    collection_name, collection_id, sink, budget, state
                 )
 
-                if records_extracted > 0:
-                    collection_records = self._extract_records_from_xml(collection_xml)
-                    xml_content += collection_records
-
-                    total_records += records_extracted
-                    collection_stats[collection_name] = records_extracted
-
-                    print(
-                        f"{Fore.GREEN}✅ Extracted {records_extracted} records from {collection_name}{Style.RESET_ALL}"
-                    )
-                    print(
-                        f"{Fore.BLUE}📊 Accumulated total: {total_records}/{max_records}{Style.RESET_ALL}"
-                    )
-                else:
-                    print(
-                        f"{Fore.RED}❌ No records found in {collection_name}{Style.RESET_ALL}"
-                    )
-                    collection_stats[collection_name] = 0
-
-            except Exception as e:
+            if budget.exhausted():
                 print(
-                    f"{Fore.RED}❌ Error extracting from {collection_name}: {e}{Style.RESET_ALL}"
+                    f"{Fore.GREEN}Target of {max_records} records reached!{Style.RESET_ALL}"
                 )
-                collection_stats[collection_name] = 0
-                continue
 
-        xml_content += "</collection>"
+        sink.close()
+
+        total_records = sum(collection_stats.values())
+
+        elapsed = time.perf_counter() - start_time
 
         print("\n" + "=" * 60)
         print(f"{Fore.CYAN}📈 FINAL EXTRACTION STATISTICS{Style.RESET_ALL}")
@@ -96,20 +160,141 @@ class CollectionExtractor:
             )
         print("-" * 40)
         print(f"{Fore.GREEN}{'TOTAL':15}: {total_records:4d} records{Style.RESET_ALL}")
+        print(
+            f"{Fore.BLUE}Requests: {self.stats['requests']} | Retries: {self.stats['retries']} | "
+            f"Throttled: {self.stats['throttled']} | Time: {elapsed:.1f}s{Style.RESET_ALL}"
+        )
+        if state is not None:
+            delta = state.get_delta()
+            print(
+                f"{Fore.BLUE}Changed: {len(delta['changed_ids'])} | Deleted: {len(delta['deleted_ids'])}{Style.RESET_ALL}"
+            )
+            if not state.finish_run():
+                print(
+                    f"{Fore.YELLOW}Harvest incomplete; the next run resumes from the last checkpoint.{Style.RESET_ALL}"
+                )
         print("=" * 60)
 
-        return xml_content
+        return collection_stats
+
+    def _extract_collection_safely(
+        self,
+        collection_name: str,
+        collection_id: str,
+        sink: XmlRecordSink,
+        budget: RecordBudget,
+        state: HarvestState = None,
+    ) -> int:
+        print(
+            f"\n{Fore.MAGENTA}📁 COLLECTION: {collection_name} ({collection_id}){Style.RESET_ALL}"
+        )
+        print(
+            f"{Fore.CYAN}Remaining records needed: {budget.remaining}{Style.RESET_ALL}"
+        )
+        print("-" * 40)
+
+        try:
+            records_extracted = self.extract_single_collection(
+                collection_id, sink, budget.remaining, budget, state
+            )
+        except Exception as e:
+            print(
+                f"{Fore.RED}❌ Error extracting from {collection_name}: {e}{Style.RESET_ALL}"
+            )
+            return 0
+
+        if records_extracted > 0:
+            print(
+                f"{Fore.GREEN}✅ Extracted {records_extracted} records from {collection_name}{Style.RESET_ALL}"
+            )
+        else:
+            print(
+                f"{Fore.RED}❌ No records found in {collection_name}{Style.RESET_ALL}"
+            )
+
+        return records_extracted
+
+    def _fetch_page(self, params: dict) -> Optional[str]:
+        bucket = self.rate_limiter.for_url(self.base_url)
+        throttled = False
+
+        for attempt in range(MAX_RETRIES):
+            if attempt > 0:
+                self._count("retries")
+                if not throttled:
+                    delay = min(MAX_BACKOFF_DELAY, (2**attempt) + random.uniform(0, 1))
+                    print(
+                        f"{Fore.YELLOW}  Attempt {attempt + 1} after {delay:.1f}s...{Style.RESET_ALL}"
+                    )
+                    time.sleep(delay)
+
+            throttled = False
+            bucket.acquire()
+            self._count("requests")
+
+            try:
+                response = self.session.get(
+                    self.base_url, params=params, timeout=self.timeout
+                )
+
+                if response.status_code in (429, 503):
+                    self._count("throttled")
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                    if retry_after is not None:
+                        retry_after = min(retry_after, MAX_BACKOFF_DELAY)
+                    delay = bucket.penalize(retry_after)
+                    throttled = True
+                    print(
+                        f"{Fore.YELLOW}  Server returned {response.status_code}, backing off {delay:.1f}s{Style.RESET_ALL}"
+                    )
+                    continue
+
+                response.raise_for_status()
+                bucket.reward()
+                return response.text
+
+            except requests.RequestException as e:
+                print(
+                    f"{Fore.RED}  Error on attempt {attempt + 1}: {e}{Style.RESET_ALL}"
+                )
+
+        self._count("failed_pages")
+        return None
 
     def extract_single_collection(
-        self, collection_id: str, max_records: int
-    ) -> Tuple[str, int]:
+        self,
+        collection_id: str,
+        sink: XmlRecordSink,
+        max_records: int,
+        budget: RecordBudget = None,
+        state: HarvestState = None,
+    ) -> int:
+        if budget is None:
+            budget = RecordBudget(max_records)
+
+        checkpoint = state.get_collection(collection_id) if state else {}
+        resumption_token = checkpoint.get("resumption_token")
+        # Records of the next page already written by a run the cap stopped.
+        page_skip = checkpoint.get("page_skip", 0)
+        collection_started = bool(checkpoint.get("pending_datestamp"))
+        if collection_started:
+            harvest_from = checkpoint.get("harvest_from")
+            print(
+                f"{Fore.YELLOW}  [{collection_id}] Resuming from last committed page{Style.RESET_ALL}"
+            )
+        else:
+            harvest_from = checkpoint.get("last_datestamp")
+            if harvest_from:
+                print(
+                    f"{Fore.YELLOW}  [{collection_id}] Incremental harvest from {harvest_from}{Style.RESET_ALL}"
+                )
+
         records_count = 0
-        resumption_token = None
         consecutive_errors = 0
         max_consecutive_errors = MAX_CONSECUTIVE_ERRORS
-        collection_records = ""
+        finished = False
 
-        while records_count < max_records:
+        while records_count < max_records and not budget.exhausted():
             if resumption_token:
                 params = {"verb": "ListRecords", "resumptionToken": resumption_token}
             else:
@@ -118,34 +303,13 @@ class CollectionExtractor:
                     "metadataPrefix": METADATA_PREFIX,
                     "set": collection_id,
                 }
+                if harvest_from:
+                    params["from"] = harvest_from
 
-            success = False
-            for attempt in range(3):
-                try:
-                    if attempt > 0:
-                        delay = (2**attempt) + random.uniform(0, 1)
-                        print(
-                            f"{Fore.YELLOW}  Attempt {attempt + 1} after {delay:.1f}s...{Style.RESET_ALL}"
-                        )
-                        time.sleep(delay)
-
-                    response = self.session.get(
-                        self.base_url, params=params, timeout=EXTRACTION_TIMEOUT
-                    )
-                    response.raise_for_status()
-                    response_xml = response.text
-                    success = True
-                    consecutive_errors = 0
-                    break
-
-                except requests.RequestException as e:
-                    print(
-                        f"{Fore.RED}  Error on attempt {attempt + 1}: {e}{Style.RESET_ALL}"
-                    )
-                    if attempt == 2:
-                        consecutive_errors += 1
+            response_xml = self._fetch_page(params)
 
-            if not success:
+            if response_xml is None:
+                consecutive_errors += 1
                 if consecutive_errors >= max_consecutive_errors:
                     print(
                         f"{Fore.RED}  Too many consecutive errors. Stopping this collection.{Style.RESET_ALL}"
@@ -154,77 +318,124 @@ class CollectionExtractor:
                 else:
                     continue
 
-            if "noRecordsMatch" in response_xml:
-                print(
-                    f"{Fore.BLUE}  No more records in this collection.{Style.RESET_ALL}"
-                )
-                break
-
             try:
                 root = ET.fromstring(response_xml)
-                records = root.findall(
-                    ".//{http://www.openarchives.org/OAI/2.0/}record"
-                )
+            except ET.ParseError as e:
+                print(f"{Fore.RED}  Error parsing XML: {e}{Style.RESET_ALL}")
+                consecutive_errors += 1
+                if consecutive_errors >= max_consecutive_errors:
+                    break
+                continue
 
-                batch_count = 0
-                for record in records:
-                    collection_records += ET.tostring(record, encoding="unicode") + "\n"
-                    records_count += 1
-                    batch_count += 1
-                    if records_count >= max_records:
-                        break
+            consecutive_errors = 0
+            error_codes = {
+                error.get("code") for error in root.findall(f"{{{OAI_NS}}}error")
+            }
 
+            if "badResumptionToken" in error_codes and resumption_token:
                 print(
-                    f"{Fore.CYAN}  Batch: {batch_count} records | Collection total: {records_count}{Style.RESET_ALL}"
+                    f"{Fore.YELLOW}  Resumption token expired, restarting this collection.{Style.RESET_ALL}"
                 )
+                resumption_token = None
+                page_skip = 0
+                continue
+
+            if state and not collection_started:
+                response_date = root.findtext(f"{{{OAI_NS}}}responseDate")
+                state.begin_collection(collection_id, harvest_from, response_date)
+                collection_started = True
 
-                rt_elem = root.find(
-                    ".//{http://www.openarchives.org/OAI/2.0/}resumptionToken"
+            if "noRecordsMatch" in error_codes:
+                print(
+                    f"{Fore.BLUE}  No more records in this collection.{Style.RESET_ALL}"
                 )
-                if rt_elem is not None and rt_elem.text:
-                    resumption_token = rt_elem.text.strip()
+                finished = True
+                break
 
-                    delay = BASE_DELAY + random.uniform(0, 0.5)
-                    time.sleep(delay)
+            live_records = []
+            deleted_ids = []
+            for record in root.iter(f"{{{OAI_NS}}}record"):
+                header = record.find(f"{{{OAI_NS}}}header")
+                if header is not None and header.get("status") == "deleted":
+                    deleted_ids.append(header.findtext(f"{{{OAI_NS}}}identifier"))
                 else:
-                    print(
-                        f"{Fore.BLUE}  End of records for this collection.{Style.RESET_ALL}"
-                    )
-                    break
+                    live_records.append(record)
 
-            except ET.ParseError as e:
-                print(f"{Fore.RED}  Error parsing XML: {e}{Style.RESET_ALL}")
-                consecutive_errors += 1
-                if consecutive_errors >= max_consecutive_errors:
-                    break
-                continue
+            live_records = live_records[page_skip:]
+            granted = budget.take(min(len(live_records), max_records - records_count))
+            page_complete = granted == len(live_records)
+
+            records_count += granted
+
+            print(
+                f"{Fore.CYAN}  [{collection_id}] Batch: {granted} records, {len(deleted_ids)} deleted | Collection total: {records_count}{Style.RESET_ALL}"
+            )
 
-        return collection_records, records_count
+            rt_elem = root.find(f".//{{{OAI_NS}}}resumptionToken")
+            next_token = (
+                rt_elem.text.strip()
+                if rt_elem is not None and rt_elem.text
+                else None
+            )
 
-    def _extract_records_from_xml(self, xml_content: str) -> str:
-        return xml_content
+            serialized = [
+                ET.tostring(record, encoding="unicode")
+                for record in live_records[:granted]
+            ]
+            if state:
+                changed_ids = [
+                    record.findtext(f"{{{OAI_NS}}}header/{{{OAI_NS}}}identifier")
+                    for record in live_records[:granted]
+                ]
+                # A page cut short by the record cap is fetched again by the
+                # next run, which skips the records written here.
+                sink.write_page(
+                    serialized,
+                    lambda offset: state.commit_page(
+                        collection_id,
+                        next_token if page_complete else resumption_token,
+                        changed_ids,
+                        deleted_ids,
+                        offset,
+                        0 if page_complete else page_skip + granted,
+                    ),
+                )
+            else:
+                sink.write_records(serialized)
 
-    def save_xml(self, xml_content: str, filepath: str = XML_FILE) -> None:
-        ensure_dir(os.path.dirname(filepath))
+            if not page_complete:
+                break
+            page_skip = 0
 
-        with open(filepath, "w", encoding="utf-8") as f:
-            f.write(xml_content)
+            if next_token:
+                resumption_token = next_token
+            else:
+                print(
+                    f"{Fore.BLUE}  End of records for this collection.{Style.RESET_ALL}"
+                )
+                finished = True
+                break
 
-        print(f"\n{Fore.GREEN}💾 XML saved to: {filepath}{Style.RESET_ALL}")
+        if state and finished:
+            state.complete_collection(collection_id)
+        elif state and (records_count >= max_records or budget.exhausted()):
+            # Stopped by the record cap rather than by errors: the run can
+            # end, but the datestamp only moves once the listing is done.
+            state.defer_collection(collection_id)
+            print(
+                f"{Fore.YELLOW}  [{collection_id}] Record cap reached; the next run continues this collection.{Style.RESET_ALL}"
+            )
 
-        file_size = os.path.getsize(filepath) / (1024 * 1024)
-        print(f"{Fore.BLUE}📁 File size: {file_size:.2f} MB{Style.RESET_ALL}")
+        return records_count
 
 
 def main():
     extractor = CollectionExtractor()
 
-    xml_data = extractor.extract_multiple_collections(
-        COLLECTIONS, max_records=MAX_RECORDS
+    extractor.extract_multiple_collections(
+        COLLECTIONS, max_records=MAX_RECORDS, filepath=XML_FILE
     )
 
-    extractor.save_xml(xml_data)
-
     print(
         f"\n{Fore.GREEN}🎉 Multi-collection extraction completed successfully!{Style.RESET_ALL}"
     )
@@ -1,46 +1,109 @@
 import xml.etree.ElementTree as ET
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator, Tuple
 import re
 from config import *
-from utils import clean_text, save_json
+from utils import (
+    clean_text,
+    save_json,
+    save_jsonl,
+    iterparse_records,
+    parallel_map_chunks,
+    resolve_workers,
+)
 from colorama import Fore, Style, init
 
 init(autoreset=True)
 
+# (element, qualifier) -> document slot; a None qualifier matches any qualifier.
+DIM_FIELD_SLOTS = (
+    (("identifier", "uri"), "uri", False),
+    (("title", None), "title", False),
+    (("description", "abstract"), "abstract", False),
+    (("contributor", "author"), "authors", True),
+    (("subject", None), "keywords", True),
+    (("date", "issued"), "date", False),
+    (("type", None), "type", False),
+    (("language", "iso"), "language", False),
+    (("subject", "udc"), "subjects_udc", True),
+    (("subject", "fos"), "subjects_fos", True),
+    (("degree", "grade"), "grade", False),
+    (("relation", None), "collections", True),
+)
+SINGLE_VALUE_SLOTS = tuple(slot for _, slot, multiple in DIM_FIELD_SLOTS if not multiple)
+MULTI_VALUE_SLOTS = tuple(slot for _, slot, multiple in DIM_FIELD_SLOTS if multiple)
+
 
 class DocumentProcessor:
-    def __init__(self):
+    def __init__(
+        self,
+        workers: Optional[int] = PROCESSING_WORKERS,
+        chunk_size: int = PROCESSING_CHUNK_SIZE,
+    ):
+        self.workers = resolve_workers(workers)
+        self.chunk_size = chunk_size
         self.namespaces = {
             "oai": "http://www.openarchives.org/OAI/2.0/",
             "dim": "http://www.dspace.org/xmlns/dspace/dim",
         }
+        self.field_tag = f"{{{self.namespaces['dim']}}}field"
+        self._field_targets: Dict[Tuple[str, Optional[str]], Tuple] = {}
 
     def xml_to_json(self, xml_filepath: str = XML_FILE) -> List[Dict[str, Any]]:
         print(f"{Fore.CYAN}Starting XML→JSON conversion...{Style.RESET_ALL}")
 
+        documents = list(self.iter_documents(xml_filepath))
+
+        print(
+            f"{Fore.GREEN}Conversion completed: {len(documents)} valid documents{Style.RESET_ALL}"
+        )
+        return documents
+
+    def xml_to_jsonl(
+        self, xml_filepath: str = XML_FILE, jsonl_filepath: str = JSONL_FILE
+    ) -> int:
+        print(f"{Fore.CYAN}Starting XML→JSONL conversion...{Style.RESET_ALL}")
+
+        count = save_jsonl(self.iter_documents(xml_filepath), jsonl_filepath)
+
+        print(
+            f"{Fore.GREEN}Conversion completed: {count} valid documents written to {jsonl_filepath}{Style.RESET_ALL}"
+        )
+        return count
+
+    def iter_documents(self, xml_filepath: str = XML_FILE) -> Iterator[Dict[str, Any]]:
+        record_tag = f"{{{self.namespaces['oai']}}}record"
+        processed = 0
+
         try:
-            tree = ET.parse(xml_filepath)
-            root = tree.getroot()
+            records = iterparse_records(xml_filepath, record_tag)
+            if self.workers > 1:
+                # Records are serialised before the reader detaches them, and
+                # chunks come back from the pool in file order.
+                records = (ET.tostring(record) for record in records)
+                batches = parallel_map_chunks(
+                    process_record_chunk, records, self.chunk_size, self.workers
+                )
+            else:
+                batches = ((1, self._process_records([record])) for record in records)
+
+            for count, documents in batches:
+                yield from documents
+
+                previous = processed
+                processed += count
+                if processed // 1000 > previous // 1000:
+                    print(
+                        f"{Fore.BLUE}Processed {processed} records...{Style.RESET_ALL}"
+                    )
         except ET.ParseError as e:
             print(f"{Fore.RED}Error processing XML: {e}{Style.RESET_ALL}")
-            return []
 
+    def _process_records(self, records: List[ET.Element]) -> List[Dict[str, Any]]:
         documents = []
-        records = root.findall(".//oai:record", self.namespaces)
-
-        print(f"{Fore.YELLOW}Processing {len(records)} records...{Style.RESET_ALL}")
-
-        for i, record in enumerate(records):
+        for record in records:
             doc = self._process_record(record)
             if doc and self._is_valid_document(doc):
                 documents.append(doc)
-
-            if (i + 1) % 50 == 0:
-                print(f"{Fore.BLUE}Processed {i + 1} records...{Style.RESET_ALL}")
-
-        print(
-            f"{Fore.GREEN}Conversion completed: {len(documents)} valid documents{Style.RESET_ALL}"
-        )
         return documents
 
     def _process_record(self, record: ET.Element) -> Optional[Dict[str, Any]]:
@@ -49,34 +112,42 @@ class DocumentProcessor:
             if metadata is None:
                 return None
 
-            collection_values = []
-            relation_fields = metadata.findall(
-                ".//dim:field[@element='relation']", self.namespaces
-            )
-            for field in relation_fields:
-                if field.text and field.text.strip():
-                    collection_values.append(field.text.strip())
+            values = dict.fromkeys(SINGLE_VALUE_SLOTS)
+            lists = {slot: [] for slot in MULTI_VALUE_SLOTS}
+
+            for field in metadata.iter(self.field_tag):
+                key = (field.get("element"), field.get("qualifier"))
+                targets = self._field_targets.get(key)
+                if targets is None:
+                    targets = self._resolve_field_targets(*key)
+                    self._field_targets[key] = targets
+
+                text = field.text
+                for slot, multiple in targets:
+                    if not multiple:
+                        # Only the first matching field counts, even when empty.
+                        if values[slot] is None:
+                            values[slot] = text or ""
+                    elif slot == "collections":
+                        if text and text.strip():
+                            lists[slot].append(text.strip())
+                    elif text:
+                        lists[slot].append(text)
 
             doc = {
                 "id": self._extract_identifier(record),
-                "uri": self._extract_field(metadata, "identifier", "uri"),
-                "title": self._extract_field(metadata, "title"),
-                "abstract": self._extract_field(metadata, "description", "abstract"),
-                "authors": self._extract_multiple_fields(
-                    metadata, "contributor", "author"
-                ),
-                "keywords": self._extract_multiple_fields(metadata, "subject"),
-                "date": self._extract_field(metadata, "date", "issued"),
-                "type": self._extract_field(metadata, "type"),
-                "language": self._extract_field(metadata, "language", "iso"),
-                "subjects_udc": self._extract_multiple_fields(
-                    metadata, "subject", "udc"
-                ),
-                "subjects_fos": self._extract_multiple_fields(
-                    metadata, "subject", "fos"
-                ),
-                "grade": self._extract_field(metadata, "degree", "grade"),
-                "collections": collection_values,
+                "uri": values["uri"] or "",
+                "title": values["title"] or "",
+                "abstract": values["abstract"] or "",
+                "authors": lists["authors"],
+                "keywords": lists["keywords"],
+                "date": values["date"] or "",
+                "type": values["type"] or "",
+                "language": values["language"] or "",
+                "subjects_udc": lists["subjects_udc"],
+                "subjects_fos": lists["subjects_fos"],
+                "grade": values["grade"] or "",
+                "collections": lists["collections"],
             }
 
             doc = self._clean_document(doc)
@@ -87,6 +158,15 @@ class DocumentProcessor:
             print(f"{Fore.RED}Error processing record: {e}{Style.RESET_ALL}")
             return None
 
+    def _resolve_field_targets(
+        self, element: str, qualifier: Optional[str]
+    ) -> Tuple[Tuple[str, bool], ...]:
+        targets = []
+        for (slot_element, slot_qualifier), slot, multiple in DIM_FIELD_SLOTS:
+            if slot_element == element and slot_qualifier in (None, qualifier):
+                targets.append((slot, multiple))
+        return tuple(targets)
+
     def _extract_identifier(self, record: ET.Element) -> str:
         header = record.find(".//oai:header", self.namespaces)
         if header is not None:
@@ -95,26 +175,6 @@ class DocumentProcessor:
                 return identifier.text or ""
         return ""
 
-    def _extract_field(
-        self, metadata: ET.Element, element: str, qualifier: str = None
-    ) -> str:
-        xpath = f".//dim:field[@element='{element}']"
-        if qualifier:
-            xpath += f"[@qualifier='{qualifier}']"
-
-        field = metadata.find(xpath, self.namespaces)
-        return field.text if field is not None and field.text else ""
-
-    def _extract_multiple_fields(
-        self, metadata: ET.Element, element: str, qualifier: str = None
-    ) -> List[str]:
-        xpath = f".//dim:field[@element='{element}']"
-        if qualifier:
-            xpath += f"[@qualifier='{qualifier}']"
-
-        fields = metadata.findall(xpath, self.namespaces)
-        return [field.text for field in fields if field.text]
-
     def _clean_document(self, doc: Dict[str, Any]) -> Dict[str, Any]:
         text_fields = ["title", "abstract"]
         for field in text_fields:
@@ -153,6 +213,35 @@ class DocumentProcessor:
 
         return True
 
+    def apply_delta(
+        self,
+        documents: List[Dict[str, Any]],
+        delta_documents: List[Dict[str, Any]],
+        changed_ids: List[str],
+        deleted_ids: List[str],
+    ) -> List[Dict[str, Any]]:
+        updates = {doc["id"]: doc for doc in delta_documents}
+        removed = set(deleted_ids) | (set(changed_ids) - set(updates))
+
+        merged = []
+        replaced = 0
+        for doc in documents:
+            if doc["id"] in removed:
+                continue
+            if doc["id"] in updates:
+                merged.append(updates.pop(doc["id"]))
+                replaced += 1
+            else:
+                merged.append(doc)
+
+        merged.extend(updates.values())
+
+        print(
+            f"{Fore.GREEN}Delta applied: {replaced} updated, {len(updates)} added, "
+            f"{len(documents) - len(merged) + len(updates)} removed{Style.RESET_ALL}"
+        )
+        return merged
+
     def save_collection(
         self, documents: List[Dict[str, Any]], filepath: str = JSON_FILE
     ) -> None:
@@ -160,6 +249,18 @@ class DocumentProcessor:
         print(f"{Fore.GREEN}Collection saved to: {filepath}{Style.RESET_ALL}")
 
 
+_worker_processor = None
+
+
+def process_record_chunk(records: List[bytes]) -> Tuple[int, List[Dict[str, Any]]]:
+    global _worker_processor
+    if _worker_processor is None:
+        _worker_processor = DocumentProcessor(workers=1)
+
+    elements = [ET.fromstring(record) for record in records]
+    return len(records), _worker_processor._process_records(elements)
+
+
 def main():
     processor = DocumentProcessor()
 
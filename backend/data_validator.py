@@ -1,17 +1,51 @@
 import xml.etree.ElementTree as ET
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import re
-from utils import load_json, save_json
+from config import (
+    PROCESSING_WORKERS,
+    PROCESSING_CHUNK_SIZE,
+    NEAR_DUPLICATE_DETECTION,
+    NEAR_DUPLICATE_THRESHOLD,
+    NEAR_DUPLICATE_REPORT,
+)
+from utils import (
+    load_json,
+    save_json,
+    iterparse_records,
+    parallel_map_chunks,
+    resolve_workers,
+)
+from harvest_sink import XmlRecordSink
+from near_duplicates import NearDuplicateDetector
 from colorama import Fore, Style, init
 
 init(autoreset=True)
 
+OAI_RECORD_TAG = "{http://www.openarchives.org/OAI/2.0/}record"
+OAI_IDENTIFIER_PATH = (
+    "{http://www.openarchives.org/OAI/2.0/}header/"
+    "{http://www.openarchives.org/OAI/2.0/}identifier"
+)
+
 
 class DataValidator:
-    def __init__(self):
+    def __init__(
+        self,
+        workers: Optional[int] = PROCESSING_WORKERS,
+        chunk_size: int = PROCESSING_CHUNK_SIZE,
+        near_duplicate_threshold: Optional[float] = (
+            NEAR_DUPLICATE_THRESHOLD if NEAR_DUPLICATE_DETECTION else None
+        ),
+        near_duplicate_report: str = NEAR_DUPLICATE_REPORT,
+    ):
+        self.workers = resolve_workers(workers)
+        self.chunk_size = chunk_size
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.near_duplicate_report = near_duplicate_report
         self.validation_stats = {
             "total_documents": 0,
             "duplicates_removed": 0,
+            "near_duplicates_removed": 0,
             "invalid_removed": 0,
             "empty_abstracts": 0,
             "short_abstracts": 0,
@@ -22,37 +56,29 @@ class DataValidator:
     def validate_xml_before_processing(self, xml_filepath: str) -> str:
         print(f"{Fore.CYAN}Validating and cleaning XML file...{Style.RESET_ALL}")
 
+        seen_identifiers = set()
+        total_records = 0
+        duplicates_in_xml = 0
+
         try:
-            tree = ET.parse(xml_filepath)
-            root = tree.getroot()
+            for record in iterparse_records(xml_filepath, OAI_RECORD_TAG):
+                identifier = record.findtext(OAI_IDENTIFIER_PATH)
+                total_records += 1
+                if identifier is None:
+                    continue
+
+                if identifier not in seen_identifiers:
+                    seen_identifiers.add(identifier)
+                else:
+                    duplicates_in_xml += 1
+                    print(
+                        f"{Fore.RED}Duplicate XML record found: {identifier}{Style.RESET_ALL}"
+                    )
         except ET.ParseError as e:
             print(f"{Fore.RED}Error parsing XML: {e}{Style.RESET_ALL}")
             return xml_filepath
 
-        records = root.findall(".//{http://www.openarchives.org/OAI/2.0/}record")
-        print(f"{Fore.YELLOW}Found {len(records)} records in XML{Style.RESET_ALL}")
-
-        seen_identifiers = set()
-        unique_records = []
-        duplicates_in_xml = 0
-
-        for record in records:
-            header = record.find(".//{http://www.openarchives.org/OAI/2.0/}header")
-            if header is not None:
-                identifier_elem = header.find(
-                    "{http://www.openarchives.org/OAI/2.0/}identifier"
-                )
-                if identifier_elem is not None:
-                    identifier = identifier_elem.text
-
-                    if identifier not in seen_identifiers:
-                        seen_identifiers.add(identifier)
-                        unique_records.append(record)
-                    else:
-                        duplicates_in_xml += 1
-                        print(
-                            f"{Fore.RED}Duplicate XML record found: {identifier}{Style.RESET_ALL}"
-                        )
+        print(f"{Fore.YELLOW}Found {total_records} records in XML{Style.RESET_ALL}")
 
         if duplicates_in_xml > 0:
             print(
@@ -61,12 +87,14 @@ class DataValidator:
 
             cleaned_xml_path = xml_filepath.replace(".xml", "_cleaned.xml")
 
-            new_root = ET.Element("collection")
-            for recor in unique_records:
-                new_root.append(record)
-
-            tree = ET.ElementTree(new_root)
-            tree.write(cleaned_xml_path, encoding="utf-8", xml_declaration=True)
+            seen_identifiers.clear()
+            with XmlRecordSink(cleaned_xml_path) as sink:
+                for record in iterparse_records(xml_filepath, OAI_RECORD_TAG):
+                    identifier = record.findtext(OAI_IDENTIFIER_PATH)
+                    if identifier is None or identifier in seen_identifiers:
+                        continue
+                    seen_identifiers.add(identifier)
+                    sink.write_records([ET.tostring(record, encoding="unicode")])
 
             print(
                 f"{Fore.GREEN}Cleaned XML saved to: {cleaned_xml_path}{Style.RESET_ALL}"
@@ -90,6 +118,8 @@ class DataValidator:
 
         documents = self._clean_and_normalize(documents)
 
+        documents = self._remove_near_duplicates(documents)
+
         documents = self._final_validation(documents)
 
         self.validation_stats["final_documents"] = len(documents)
@@ -143,6 +173,28 @@ class DataValidator:
 
         return unique_documents
 
+    def _remove_near_duplicates(
+        self, documents: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        if self.near_duplicate_threshold is None or len(documents) < 2:
+            return documents
+
+        print(
+            f"{Fore.YELLOW}Removing near-duplicates (Jaccard ≥ {self.near_duplicate_threshold})...{Style.RESET_ALL}"
+        )
+
+        detector = NearDuplicateDetector(threshold=self.near_duplicate_threshold)
+        unique_documents, report = detector.deduplicate(documents)
+        save_json(report, self.near_duplicate_report)
+
+        self.validation_stats["near_duplicates_removed"] = report["documents_removed"]
+        print(
+            f"{Fore.BLUE}Removed {report['documents_removed']} near-duplicates in "
+            f"{len(report['clusters'])} clusters (report: {self.near_duplicate_report}){Style.RESET_ALL}"
+        )
+
+        return unique_documents
+
     def _validate_document_quality(
         self, documents: List[Dict[str, Any]]
     ) -> List[Dict[str, Any]]:
@@ -182,29 +234,40 @@ class DataValidator:
     ) -> List[Dict[str, Any]]:
         print(f"{Fore.YELLOW}Cleaning and normalizing data...{Style.RESET_ALL}")
 
+        if self.workers > 1 and len(documents) > self.chunk_size:
+            cleaned = []
+            for chunk in parallel_map_chunks(
+                clean_document_chunk, documents, self.chunk_size, self.workers
+            ):
+                cleaned.extend(chunk)
+            return cleaned
+
         for doc in documents:
-            if "title" in doc:
-                doc["title"] = self._clean_text(doc["title"])
+            self._clean_document(doc)
+
+        return documents
 
-            if "abstract" in doc:
-                doc["abstract"] = self._clean_text(doc["abstract"])
+    def _clean_document(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        if "title" in doc:
+            doc["title"] = self._clean_text(doc["title"])
 
-            if "authors" in doc:
-                doc["authors"] = [
-                    self._clean_text(author)
-                    for author in doc["authors"]
-                    if author.strip()
-                ]
+        if "abstract" in doc:
+            doc["abstract"] = self._clean_text(doc["abstract"])
 
-            if "keywords" in doc:
-                doc["keywords"] = [
-                    self._clean_text(kw) for kw in doc["keywords"] if kw.strip()
-                ]
+        if "authors" in doc:
+            doc["authors"] = [
+                self._clean_text(author) for author in doc["authors"] if author.strip()
+            ]
 
-            if "date" in doc:
-                doc["date"] = self._normalize_date(doc["date"])
+        if "keywords" in doc:
+            doc["keywords"] = [
+                self._clean_text(kw) for kw in doc["keywords"] if kw.strip()
+            ]
 
-        return documents
+        if "date" in doc:
+            doc["date"] = self._normalize_date(doc["date"])
+
+        return doc
 
     def _final_validation(
         self, documents: List[Dict[str, Any]]
@@ -265,6 +328,9 @@ class DataValidator:
         print(
             f"{Fore.RED}Duplicates Removed:        {stats['duplicates_removed']:,}{Style.RESET_ALL}"
         )
+        print(
+            f"{Fore.RED}Near-Duplicates Removed:   {stats['near_duplicates_removed']:,}{Style.RESET_ALL}"
+        )
         print(
             f"{Fore.RED}Invalid Documents Removed: {stats['invalid_removed']:,}{Style.RESET_ALL}"
         )
@@ -291,6 +357,17 @@ class DataValidator:
         print("=" * 60)
 
 
+_worker_validator = None
+
+
+def clean_document_chunk(documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    global _worker_validator
+    if _worker_validator is None:
+        _worker_validator = DataValidator(workers=1)
+
+    return [_worker_validator._clean_document(doc) for doc in documents]
+
+
 def main():
     from config import JSON_FILE
 
@@ -0,0 +1,86 @@
+import multiprocessing
+import os
+import time
+from typing import List, Iterator, Tuple, Optional
+import numpy as np
+from config import ENCODING_WORKERS, ENCODING_CHUNK_SIZE
+from utils import parallel_map_chunks, resolve_workers
+from colorama import Fore, Style, init
+
+init(autoreset=True)
+
+_encoder = {}
+
+
+def _init_encoder(model_path: str, threads: int) -> None:
+    # Each worker loads its own CPU copy of the model and splits the cores
+    # with the other workers instead of oversubscribing them.
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    torch.set_num_threads(threads)
+    _encoder["model"] = SentenceTransformer(model_path, device="cpu")
+
+
+def encode_chunk(texts: List[str]) -> np.ndarray:
+    return _encoder["model"].encode(
+        texts, convert_to_numpy=True, show_progress_bar=False
+    )
+
+
+def encode_texts(
+    model,
+    model_path: str,
+    texts: List[str],
+    workers: Optional[int] = ENCODING_WORKERS,
+    chunk_size: int = ENCODING_CHUNK_SIZE,
+) -> Iterator[Tuple[List[str], np.ndarray]]:
+    """Encodes texts longest first, yielding (texts, embeddings) per chunk.
+
+    Sorting keeps each batch to similar lengths, so little compute goes to
+    padding. On CPU the chunks are sharded across a process pool; on GPU, or
+    when there is only one chunk, the already loaded model is used.
+    """
+    texts = sorted(texts, key=len, reverse=True)
+    workers = min(resolve_workers(workers), -(-len(texts) // chunk_size))
+    if getattr(model, "device", None) is not None and model.device.type != "cpu":
+        workers = 1
+
+    if workers <= 1:
+        _encoder["model"] = model
+        initializer, initargs = None, ()
+    else:
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        initializer, initargs = _init_encoder, (model_path, threads)
+
+    print(
+        f"{Fore.YELLOW}Encoding {len(texts)} texts with {max(workers, 1)} "
+        f"process(es)...{Style.RESET_ALL}"
+    )
+    start = time.perf_counter()
+    encoded = 0
+    try:
+        # Results come back in input order, one per chunk_size texts.
+        results = parallel_map_chunks(
+            encode_chunk,
+            texts,
+            chunk_size,
+            workers,
+            initializer=initializer,
+            initargs=initargs,
+            # Forking after torch has started its thread pools (e.g. right
+            # after training) can deadlock the children, so workers are
+            # spawned fresh.
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        for index, embeddings in enumerate(results):
+            chunk = texts[index * chunk_size : (index + 1) * chunk_size]
+            encoded += len(chunk)
+            elapsed = time.perf_counter() - start
+            print(
+                f"{Fore.BLUE}Encoded {encoded}/{len(texts)} documents "
+                f"({encoded / max(elapsed, 1e-9):.1f} docs/s){Style.RESET_ALL}"
+            )
+            yield chunk, embeddings
+    finally:
+        _encoder.pop("model", None)
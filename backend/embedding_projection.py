@@ -0,0 +1,206 @@
+import os
+import time
+from typing import Dict, Any, Optional
+import numpy as np
+from config import (
+    MODEL_DIR,
+    EMBEDDING_PROJECTION,
+    EMBEDDING_DIMENSIONS,
+    PROJECTION_FILE,
+    PROJECTION_REPORT,
+)
+from utils import ensure_dir, save_json
+from colorama import Fore, Style, init
+
+init(autoreset=True)
+
+REPORT_QUERIES = 200
+REPORT_TOP_K = (1, 10, 100)
+
+
+class EmbeddingProjection:
+    """Linear map from model embeddings to fewer dimensions.
+
+    "pca" centres and projects onto the leading principal components of the
+    document embeddings; "truncate" keeps the first dimensions, which only
+    preserves ranking for Matryoshka-trained models.
+    """
+
+    def __init__(
+        self,
+        method: str,
+        dimensions: int,
+        mean: Optional[np.ndarray] = None,
+        components: Optional[np.ndarray] = None,
+    ):
+        self.method = method
+        self.dimensions = dimensions
+        self.mean = mean
+        self.components = components
+
+    @classmethod
+    def fit_pca(cls, embeddings: np.ndarray, dimensions: int) -> "EmbeddingProjection":
+        vectors = np.asarray(embeddings, dtype=np.float64)
+        mean = vectors.mean(axis=0)
+        centered = vectors - mean
+
+        # The covariance is only d×d, so its eigendecomposition is cheap even
+        # for large collections.
+        eigenvalues, eigenvectors = np.linalg.eigh(centered.T @ centered)
+        order = np.argsort(eigenvalues)[::-1][:dimensions]
+        components = eigenvectors[:, order].T
+
+        projection = cls(
+            "pca", dimensions, mean.astype(np.float32), components.astype(np.float32)
+        )
+        projection.explained_variance = float(
+            eigenvalues[order].sum() / max(eigenvalues.sum(), 1e-12)
+        )
+        return projection
+
+    @classmethod
+    def truncation(cls, dimensions: int) -> "EmbeddingProjection":
+        return cls("truncate", dimensions)
+
+    def transform(self, embeddings: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if self.method == "truncate":
+            return np.ascontiguousarray(vectors[..., : self.dimensions])
+        return (vectors - self.mean) @ self.components.T
+
+    def save(self, model_path: str = MODEL_DIR) -> str:
+        ensure_dir(model_path)
+        filepath = os.path.join(model_path, PROJECTION_FILE)
+        arrays = {"method": np.array(self.method), "dimensions": np.array(self.dimensions)}
+        if self.method == "pca":
+            arrays.update(mean=self.mean, components=self.components)
+        np.savez(filepath, **arrays)
+        return filepath
+
+
+def load_projection(model_path: str = MODEL_DIR) -> Optional[EmbeddingProjection]:
+    filepath = os.path.join(model_path, PROJECTION_FILE)
+    if not os.path.exists(filepath):
+        return None
+
+    with np.load(filepath) as data:
+        method = str(data["method"])
+        dimensions = int(data["dimensions"])
+        if method == "truncate":
+            return EmbeddingProjection.truncation(dimensions)
+        return EmbeddingProjection(method, dimensions, data["mean"], data["components"])
+
+
+def remove_projection(model_path: str = MODEL_DIR) -> bool:
+    filepath = os.path.join(model_path, PROJECTION_FILE)
+    if os.path.exists(filepath):
+        os.remove(filepath)
+        return True
+    return False
+
+
+def _rank(document_embeddings: np.ndarray, query_embedding: np.ndarray, top_k: int) -> np.ndarray:
+    # Same cosine scoring as InformationRetrievalSystem._calculate_similarities.
+    similarities = np.dot(document_embeddings, query_embedding) / (
+        np.linalg.norm(document_embeddings, axis=1) * np.linalg.norm(query_embedding)
+    )
+    top = np.argpartition(similarities, -top_k)[-top_k:]
+    return top[np.argsort(similarities[top])[::-1]]
+
+
+def projection_report(
+    document_embeddings: np.ndarray,
+    query_embeddings: np.ndarray,
+    projection: EmbeddingProjection,
+) -> Dict[str, Any]:
+    full_documents = np.asarray(document_embeddings, dtype=np.float32)
+    reduced_documents = projection.transform(full_documents)
+    reduced_queries = projection.transform(query_embeddings)
+    max_k = min(max(REPORT_TOP_K), len(full_documents))
+
+    recalls = {k: [] for k in REPORT_TOP_K if k <= max_k}
+    timings = {"full": [], "reduced": []}
+    for query, reduced_query in zip(query_embeddings, reduced_queries):
+        start = time.perf_counter()
+        full_ranking = _rank(full_documents, query, max_k)
+        timings["full"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        reduced_ranking = _rank(reduced_documents, reduced_query, max_k)
+        timings["reduced"].append(time.perf_counter() - start)
+
+        # Recall of the full-dimensional top-k within the reduced top-k.
+        for k in recalls:
+            overlap = np.intersect1d(full_ranking[:k], reduced_ranking[:k])
+            recalls[k].append(len(overlap) / k)
+
+    return {
+        "method": projection.method,
+        "dimensions": projection.dimensions,
+        "full_dimensions": int(full_documents.shape[1]),
+        "documents": len(full_documents),
+        "queries": len(query_embeddings),
+        "explained_variance": getattr(projection, "explained_variance", None),
+        "recall_at_k": {f"@{k}": float(np.mean(values)) for k, values in recalls.items()},
+        "median_latency_ms": {
+            name: float(np.median(values) * 1000) for name, values in timings.items()
+        },
+        "memory_mb": {
+            "full": full_documents.nbytes / (1024 * 1024),
+            "reduced": reduced_documents.nbytes / (1024 * 1024),
+        },
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print("\n" + "=" * 60)
+    print(f"{Fore.CYAN}EMBEDDING PROJECTION{Style.RESET_ALL}")
+    print("=" * 60)
+    print(
+        f"{Fore.YELLOW}{report['method']}: {report['full_dimensions']} → {report['dimensions']} "
+        f"dimensions | {report['documents']:,} documents, {report['queries']} queries{Style.RESET_ALL}"
+    )
+    if report["explained_variance"] is not None:
+        print(f"{Fore.BLUE}Explained variance: {report['explained_variance']:.1%}{Style.RESET_ALL}")
+    recalls = " | ".join(
+        f"R{k} {value:.3f}" for k, value in report["recall_at_k"].items()
+    )
+    print(f"{Fore.GREEN}Recall vs full dimensionality: {recalls}{Style.RESET_ALL}")
+    latency = report["median_latency_ms"]
+    memory = report["memory_mb"]
+    print(
+        f"{Fore.MAGENTA}Scoring latency: {latency['full']:.2f} ms → {latency['reduced']:.2f} ms | "
+        f"Memory: {memory['full']:.1f} MB → {memory['reduced']:.1f} MB{Style.RESET_ALL}"
+    )
+    print("=" * 60)
+
+
+def main():
+    from retrieval_system import InformationRetrievalSystem
+    from streaming_tfidf import iter_text_chunks
+
+    ir_system = InformationRetrievalSystem()
+    # Fit on the full-dimensional embeddings, whatever is installed now.
+    ir_system.projection = None
+    ir_system.load_collection()
+    embeddings = ir_system.document_embeddings
+
+    if EMBEDDING_PROJECTION == "truncate":
+        projection = EmbeddingProjection.truncation(EMBEDDING_DIMENSIONS)
+    else:
+        projection = EmbeddingProjection.fit_pca(embeddings, EMBEDDING_DIMENSIONS)
+
+    # Titles stand in for user queries.
+    titles = next(iter_text_chunks(ir_system.documents, "title", REPORT_QUERIES), [])
+    queries = ir_system.model.encode(titles, convert_to_numpy=True)
+
+    report = projection_report(embeddings, queries, projection)
+    save_json(report, PROJECTION_REPORT)
+    print_report(report)
+
+    filepath = projection.save(MODEL_DIR)
+    print(f"{Fore.GREEN}Projection saved to: {filepath}{Style.RESET_ALL}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import json
+import os
+import threading
+from typing import Dict, Any, List, Optional
+from utils import ensure_dir
+
+
+class HarvestState:
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        self._lock = threading.Lock()
+        self.state = {
+            "output_file": None,
+            "output_offset": None,
+            "in_progress": False,
+            "collections": {},
+            "changed_ids": [],
+            "deleted_ids": [],
+        }
+        if os.path.exists(filepath):
+            with open(filepath, "r", encoding="utf-8") as f:
+                self.state.update(json.load(f))
+
+        self._changed = dict.fromkeys(self.state["changed_ids"])
+        self._deleted = dict.fromkeys(self.state["deleted_ids"])
+
+    @property
+    def in_progress(self) -> bool:
+        return self.state["in_progress"]
+
+    @property
+    def output_file(self) -> Optional[str]:
+        return self.state["output_file"]
+
+    @property
+    def output_offset(self) -> Optional[int]:
+        return self.state["output_offset"]
+
+    def has_checkpoints(self) -> bool:
+        return any(
+            entry.get("last_datestamp")
+            for entry in self.state["collections"].values()
+        )
+
+    def get_collection(self, collection_id: str) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.state["collections"].get(collection_id, {}))
+
+    def reset(self) -> None:
+        with self._lock:
+            self.state["collections"] = {}
+            self.state["in_progress"] = False
+            self._changed.clear()
+            self._deleted.clear()
+            self._save()
+
+    def start_run(self, output_file: str) -> None:
+        with self._lock:
+            self.state["output_file"] = output_file
+            self.state["output_offset"] = None
+            self.state["in_progress"] = True
+            # Progress of an abandoned run points into another output file,
+            # so those collections restart from their last completed
+            # datestamp. Collections deferred by the record cap continue.
+            for entry in self.state["collections"].values():
+                if not entry.get("deferred"):
+                    entry["pending_datestamp"] = None
+                    entry["harvest_from"] = None
+                    entry["resumption_token"] = None
+                    entry["page_skip"] = 0
+                entry["deferred"] = False
+            self._changed.clear()
+            self._deleted.clear()
+            self._save()
+
+    def begin_collection(
+        self, collection_id: str, harvest_from: Optional[str], response_date: str
+    ) -> None:
+        with self._lock:
+            entry = self.state["collections"].setdefault(collection_id, {})
+            entry["harvest_from"] = harvest_from
+            entry["pending_datestamp"] = response_date
+            self._save()
+
+    def commit_page(
+        self,
+        collection_id: str,
+        resumption_token: Optional[str],
+        changed_ids: List[str],
+        deleted_ids: List[str],
+        output_offset: int,
+        page_skip: int = 0,
+    ) -> None:
+        with self._lock:
+            entry = self.state["collections"].setdefault(collection_id, {})
+            entry["resumption_token"] = resumption_token
+            entry["page_skip"] = page_skip
+            self.state["output_offset"] = max(
+                output_offset, self.state["output_offset"] or 0
+            )
+            for identifier in changed_ids:
+                self._deleted.pop(identifier, None)
+                self._changed[identifier] = None
+            for identifier in deleted_ids:
+                self._changed.pop(identifier, None)
+                self._deleted[identifier] = None
+            self._save()
+
+    def complete_collection(self, collection_id: str) -> None:
+        with self._lock:
+            entry = self.state["collections"].setdefault(collection_id, {})
+            if entry.get("pending_datestamp"):
+                entry["last_datestamp"] = entry["pending_datestamp"]
+            entry["pending_datestamp"] = None
+            entry["harvest_from"] = None
+            entry["resumption_token"] = None
+            entry["page_skip"] = 0
+            entry["deferred"] = False
+            self._save()
+
+    def defer_collection(self, collection_id: str) -> None:
+        # A collection stopped by the record cap keeps its place in the
+        # listing for the next run without holding this run open.
+        with self._lock:
+            entry = self.state["collections"].get(collection_id)
+            if entry and entry.get("pending_datestamp"):
+                entry["deferred"] = True
+                self._save()
+
+    def finish_run(self) -> bool:
+        with self._lock:
+            finished = not any(
+                entry.get("pending_datestamp") and not entry.get("deferred")
+                for entry in self.state["collections"].values()
+            )
+            if finished:
+                self.state["in_progress"] = False
+                self._save()
+            return finished
+
+    def get_delta(self) -> Dict[str, List[str]]:
+        with self._lock:
+            return {
+                "changed_ids": list(self._changed),
+                "deleted_ids": list(self._deleted),
+            }
+
+    def _save(self) -> None:
+        self.state["changed_ids"] = list(self._changed)
+        self.state["deleted_ids"] = list(self._deleted)
+
+        ensure_dir(os.path.dirname(self.filepath))
+        tmp_path = f"{self.filepath}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.filepath)
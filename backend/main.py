@@ -6,6 +6,8 @@ from similarity_calculator import SimilarityCalculator
 from model_trainer import SentenceTransformerTrainer
 from caching_system import PerformanceMonitor
 from data_validator import DataValidator
+from harvest_state import HarvestState
+from collection_store import open_collection, write_collection_store
 from retrieval_system import InformationRetrievalSystem
 from utils import ensure_dir, load_json, save_json
 from colorama import Fore, Style, init
@@ -25,13 +27,58 @@ def extract_data():
     print("=" * 60)
 
     extractor = CollectionExtractor()
+    state = HarvestState(HARVEST_STATE_FILE)
+    if not (state.in_progress and state.output_file == XML_FILE):
+        state.reset()
 
-    xml_data = extractor.extract_multiple_collections(
-        COLLECTIONS, max_records=MAX_RECORDS
+    collection_stats = extractor.extract_multiple_collections(
+        COLLECTIONS, max_records=MAX_RECORDS, filepath=XML_FILE, state=state
     )
-    extractor.save_xml(xml_data)
 
-    return xml_data
+    return collection_stats
+
+
+def update_data():
+    print("=" * 60)
+    print(f"{Fore.CYAN}PHASE 1: INCREMENTAL DATA EXTRACTION{Style.RESET_ALL}")
+    print("=" * 60)
+
+    extractor = CollectionExtractor()
+    state = HarvestState(HARVEST_STATE_FILE)
+
+    extractor.extract_multiple_collections(
+        COLLECTIONS, max_records=MAX_RECORDS, filepath=XML_DELTA_FILE, state=state
+    )
+
+    if state.in_progress:
+        print(
+            f"{Fore.YELLOW}Harvest did not finish; collection left unchanged.{Style.RESET_ALL}"
+        )
+        return load_json(JSON_FILE)
+
+    delta = state.get_delta()
+    if not delta["changed_ids"] and not delta["deleted_ids"]:
+        print(f"{Fore.GREEN}Collection is up to date.{Style.RESET_ALL}")
+        return load_json(JSON_FILE)
+
+    if not os.path.exists(XML_DELTA_FILE):
+        raise FileNotFoundError(
+            f"Harvest reported {len(delta['changed_ids'])} changed records but "
+            f"{XML_DELTA_FILE} does not exist; remove {HARVEST_STATE_FILE} and "
+            f"run the full extraction again."
+        )
+
+    processor = DocumentProcessor()
+    delta_documents = processor.xml_to_json(XML_DELTA_FILE)
+    documents = processor.apply_delta(
+        load_json(JSON_FILE),
+        delta_documents,
+        delta["changed_ids"],
+        delta["deleted_ids"],
+    )
+    processor.save_collection(documents)
+
+    return documents
 
 
 def process_data():
@@ -62,6 +109,8 @@ def validate_data():
     documents = load_json(JSON_FILE)
     clean_documents = validator.validate_and_clean_documents(documents)
     save_json(clean_documents, JSON_FILE)
+    write_collection_store(clean_documents, COLLECTION_STORE_FILE)
+    print(f"{Fore.GREEN}Collection store saved to: {COLLECTION_STORE_FILE}{Style.RESET_ALL}")
 
     return clean_documents
 
@@ -74,8 +123,16 @@ def calculate_similarities(documents):
     monitor = PerformanceMonitor()
     monitor.start_timer("similarity_calculation")
 
+    if TFIDF_STREAMING:
+        # Abstracts are streamed from the memory-mapped collection store.
+        documents = open_collection(JSON_FILE)
+
     calculator = SimilarityCalculator(
-        sample_ratio=0.05, use_clustering=True, n_clusters=min(50, len(documents) // 20)
+        sample_ratio=0.05,
+        use_clustering=True,
+        n_clusters=min(50, len(documents) // 20),
+        max_pairs_per_document=MAX_PAIRS_PER_DOCUMENT,
+        workers=SIMILARITY_WORKERS,
     )
 
     training_pairs = calculator.create_training_collection(documents)
@@ -98,14 +155,20 @@ def train_model():
     monitor.start_timer("model_training")
 
     trainer = SentenceTransformerTrainer()
-    training_examples = trainer.load_training_data(TRAIN_FILE)
+    train_file = TRAIN_FILE if os.path.exists(TRAIN_FILE) else LEGACY_TRAIN_FILE
+    mined_file = MINED_PAIRS_FILE if os.path.exists(MINED_PAIRS_FILE) else None
+    training_examples, validation_examples = trainer.load_training_data(
+        train_file, mined_file=mined_file
+    )
 
     if not training_examples:
         print(f"{Fore.RED}No training data available!{Style.RESET_ALL}")
         return None
 
-    if len(training_examples) > 100:
-        model = trainer.train_with_early_stopping(training_examples)
+    if validation_examples is not None:
+        model = trainer.train_with_early_stopping(
+            training_examples, validation_examples
+        )
     else:
         model = trainer.train_model(training_examples)
 
@@ -223,7 +286,7 @@ def search_by_document(ir_system, monitor):
         print(f"{'='*80}")
         
         for i, (doc, score) in enumerate(results, 1):
-            doc_idx = ir_system.documents.index(doc)
+            doc_idx = ir_system.get_document_index(doc["id"])
             print(f"\n{Fore.CYAN}{i}. [{doc_idx}] SCORE: {score:.4f}{Style.RESET_ALL}")
             print(f"{Fore.YELLOW}TITLE: {doc['title']}{Style.RESET_ALL}")
             print(f"{Fore.GREEN}AUTHORS: {', '.join(doc.get('authors', []))}{Style.RESET_ALL}")
@@ -236,7 +299,7 @@ def search_by_document(ir_system, monitor):
             selection_idx = int(selection) - 1
             if 0 <= selection_idx < len(results):
                 doc = results[selection_idx][0]
-                doc_idx = ir_system.documents.index(doc)
+                doc_idx = ir_system.get_document_index(doc["id"])
                 
                 monitor.start_timer("document_similarity")
                 ir_system.find_and_display_similar_documents(doc_idx, top_k=5)
@@ -287,7 +350,10 @@ def main():
             f"{Fore.YELLOW}Data not found. Running complete pipeline...{Style.RESET_ALL}"
         )
 
-        if not os.path.exists(XML_FILE):
+        state = HarvestState(HARVEST_STATE_FILE)
+        if not os.path.exists(XML_FILE) or (
+            state.in_progress and state.output_file == XML_FILE
+        ):
             extract_data()
 
         documents = process_data()
@@ -296,7 +362,7 @@ def main():
         if len(documents) > 1:
             calculate_similarities(documents)
 
-        if os.path.exists(TRAIN_FILE):
+        if os.path.exists(TRAIN_FILE) or os.path.exists(LEGACY_TRAIN_FILE):
             train_model()
 
     else:
@@ -307,6 +373,15 @@ def main():
             f"{Fore.BLUE}Current collection has {len(documents)} documents{Style.RESET_ALL}"
         )
 
+        response = input(
+            f"{Fore.YELLOW}Do you want to harvest new and updated records? (y/n): {Style.RESET_ALL}"
+        )
+        if response.lower() in ["s", "sim", "y", "yes"]:
+            documents = update_data()
+            print(
+                f"{Fore.BLUE}Current collection has {len(documents)} documents{Style.RESET_ALL}"
+            )
+
         response = input(
             f"{Fore.YELLOW}Do you want to validate and clean the existing collection? (y/n): {Style.RESET_ALL}"
         )
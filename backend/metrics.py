@@ -0,0 +1,265 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, List, Tuple, Any
+
+LATENCY_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class LatencyHistogram:
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.bucket_counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def snapshot(self) -> Tuple[List[int], int, float]:
+        with self._lock:
+            return list(self.bucket_counts), self.count, self.sum
+
+    def quantile(self, q: float) -> float:
+        bucket_counts, count, _ = self.snapshot()
+        return self._quantile_from_counts(bucket_counts, count, q)
+
+    def _quantile_from_counts(
+        self, bucket_counts: List[int], count: int, q: float
+    ) -> float:
+        if count == 0:
+            return 0.0
+
+        rank = q * count
+        cumulative = 0
+        for index, bucket_count in enumerate(bucket_counts):
+            if cumulative + bucket_count >= rank and bucket_count > 0:
+                if index == len(self.buckets):
+                    return self.buckets[-1]
+
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index]
+                fraction = (rank - cumulative) / bucket_count
+                return lower + (upper - lower) * fraction
+            cumulative += bucket_count
+
+        return self.buckets[-1]
+
+    def get_stats(self) -> Dict[str, float]:
+        bucket_counts, count, total = self.snapshot()
+        stats = {
+            "count": count,
+            "sum": total,
+            "avg": total / count if count else 0.0,
+        }
+        for q in QUANTILES:
+            stats[f"p{int(q * 100)}"] = self._quantile_from_counts(
+                bucket_counts, count, q
+            )
+        return stats
+
+
+class MetricsRegistry:
+    def __init__(self, namespace: str = "irum"):
+        self.namespace = namespace
+        self.stage_histograms: Dict[str, LatencyHistogram] = {}
+        self.request_histograms: Dict[str, LatencyHistogram] = {}
+        self.counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        self.counter_help: Dict[str, str] = {}
+        self.cache_lookups: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+
+    def _get_histogram(
+        self, histograms: Dict[str, LatencyHistogram], key: str
+    ) -> LatencyHistogram:
+        histogram = histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = histograms.setdefault(key, LatencyHistogram())
+        return histogram
+
+    def observe(self, stage: str, duration: float) -> None:
+        self._get_histogram(self.stage_histograms, stage).observe(duration)
+
+    def observe_request(self, endpoint: str, duration: float) -> None:
+        # End-to-end latency spans several stages, so it is kept apart from
+        # the stage histograms to keep their sum meaningful.
+        self._get_histogram(self.request_histograms, endpoint).observe(duration)
+
+    @contextmanager
+    def timer(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def increment(
+        self, name: str, amount: float = 1.0, help_text: str = "", **labels: str
+    ) -> None:
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0.0) + amount
+            if help_text and name not in self.counter_help:
+                self.counter_help[name] = help_text
+
+    def record_cache_lookup(self, cache: str, hit: bool) -> None:
+        with self._lock:
+            lookups = self.cache_lookups.setdefault(cache, [0, 0])
+            lookups[0 if hit else 1] += 1
+
+    def get_cache_hit_ratio(self, cache: str) -> float:
+        with self._lock:
+            hits, misses = self.cache_lookups.get(cache, [0, 0])
+        total = hits + misses
+        return hits / total if total else 0.0
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stages = dict(self.stage_histograms)
+            requests = dict(self.request_histograms)
+            cache_lookups = {k: list(v) for k, v in self.cache_lookups.items()}
+
+        return {
+            "stages": {stage: h.get_stats() for stage, h in sorted(stages.items())},
+            "requests": {
+                endpoint: h.get_stats() for endpoint, h in sorted(requests.items())
+            },
+            "cache_hit_ratio": {
+                cache: hits / (hits + misses) if hits + misses else 0.0
+                for cache, (hits, misses) in sorted(cache_lookups.items())
+            },
+        }
+
+    def render_prometheus(self) -> str:
+        ns = self.namespace
+        lines = []
+
+        with self._lock:
+            stages = sorted(self.stage_histograms.items())
+            requests = sorted(self.request_histograms.items())
+            counters = sorted(self.counters.items())
+            counter_help = dict(self.counter_help)
+            cache_lookups = sorted(
+                (k, list(v)) for k, v in self.cache_lookups.items()
+            )
+
+        _render_histograms(
+            lines,
+            f"{ns}_stage_duration_seconds",
+            "Latency of each request stage.",
+            "stage",
+            stages,
+        )
+        _render_histograms(
+            lines,
+            f"{ns}_request_duration_seconds",
+            "End-to-end latency of each HTTP endpoint.",
+            "endpoint",
+            requests,
+        )
+
+        ratio_name = f"{ns}_cache_hit_ratio"
+        lookups_name = f"{ns}_cache_lookups_total"
+        lines.append(f"# HELP {lookups_name} Cache lookups by result.")
+        lines.append(f"# TYPE {lookups_name} counter")
+        for cache, (hits, misses) in cache_lookups:
+            cache = _escape_label(cache)
+            lines.append(f'{lookups_name}{{cache="{cache}",result="hit"}} {hits}')
+            lines.append(f'{lookups_name}{{cache="{cache}",result="miss"}} {misses}')
+        lines.append(f"# HELP {ratio_name} Fraction of cache lookups that were hits.")
+        lines.append(f"# TYPE {ratio_name} gauge")
+        for cache, (hits, misses) in cache_lookups:
+            ratio = hits / (hits + misses) if hits + misses else 0.0
+            lines.append(
+                f'{ratio_name}{{cache="{_escape_label(cache)}"}} {_format_value(ratio)}'
+            )
+
+        current_name = None
+        for (name, labels), value in counters:
+            metric_name = f"{ns}_{name}"
+            if name != current_name:
+                current_name = name
+                lines.append(
+                    f"# HELP {metric_name} {counter_help.get(name, name.replace('_', ' '))}"
+                )
+                lines.append(f"# TYPE {metric_name} counter")
+            label_str = ",".join(
+                f'{k}="{_escape_label(v)}"' for k, v in labels
+            )
+            label_str = f"{{{label_str}}}" if label_str else ""
+            lines.append(f"{metric_name}{label_str} {_format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _render_histograms(
+    lines: List[str],
+    name: str,
+    help_text: str,
+    label: str,
+    histograms: List[Tuple[str, LatencyHistogram]],
+) -> None:
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    snapshots = []
+    for key, histogram in histograms:
+        bucket_counts, count, total = histogram.snapshot()
+        label_str = f'{label}="{_escape_label(key)}"'
+        snapshots.append((label_str, histogram, bucket_counts, count))
+        cumulative = 0
+        for bound, bucket_count in zip(histogram.buckets, bucket_counts):
+            cumulative += bucket_count
+            lines.append(
+                f'{name}_bucket{{{label_str},le="{_format_value(bound)}"}} {cumulative}'
+            )
+        lines.append(f'{name}_bucket{{{label_str},le="+Inf"}} {count}')
+        lines.append(f"{name}_sum{{{label_str}}} {_format_value(total)}")
+        lines.append(f"{name}_count{{{label_str}}} {count}")
+
+    quantile_name = name.replace("_seconds", "_quantile_seconds")
+    lines.append(
+        f"# HELP {quantile_name} Latency quantiles estimated from {name}."
+    )
+    lines.append(f"# TYPE {quantile_name} gauge")
+    for label_str, histogram, bucket_counts, count in snapshots:
+        for q in QUANTILES:
+            value = histogram._quantile_from_counts(bucket_counts, count, q)
+            lines.append(
+                f'{quantile_name}{{{label_str},quantile="{q}"}} {_format_value(value)}'
+            )
+
+
+def _format_value(value: float) -> str:
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -1,19 +1,70 @@
 import os
+import time
+from collections.abc import Sequence
 from sentence_transformers import SentenceTransformer, InputExample, losses
 from torch.utils.data import DataLoader
 import torch
-from typing import List
+from typing import List, Optional, Tuple, Union
 import numpy as np
-from config import BASE_MODEL
+from config import (
+    BASE_MODEL,
+    JSON_FILE,
+    TRAINING_TOKEN_CACHE,
+    EVALUATION_BATCH_SIZE,
+    BUCKET_BATCHES,
+    TRAINING_CHECKPOINT,
+    TRAINING_TELEMETRY_FILE,
+    MATRYOSHKA_DIMS,
+)
+from training_pairs import (
+    TrainingPairs,
+    exclude_pairs,
+    index_pair_texts,
+    load_pair_file,
+    load_training_pairs,
+    merge_training_pairs,
+)
+from embedding_projection import remove_projection
+from training_cache import (
+    CachedPairTrainer,
+    build_token_cache,
+    estimate_random_batch_seconds,
+    padding_report,
+    print_padding_report,
+)
+from utils import append_jsonl
 from colorama import Fore, Style, init
 
 init(autoreset=True)
 
 
+class PairExamples(Sequence):
+    """InputExamples built lazily from index-based training pairs."""
+
+    def __init__(self, pairs: TrainingPairs):
+        self.pairs = pairs
+
+    def __len__(self) -> int:
+        return len(self.pairs)
+
+    def __getitem__(
+        self, index: Union[int, slice]
+    ) -> Union[InputExample, "PairExamples"]:
+        if isinstance(index, slice):
+            return PairExamples(self.pairs[index])
+
+        text1, text2, similarity = self.pairs[index]
+        return InputExample(texts=[text1, text2], label=similarity)
+
+
 class SentenceTransformerTrainer:
-    def __init__(self, base_model: str = BASE_MODEL):
+    def __init__(
+        self, base_model: str = BASE_MODEL, use_token_cache: bool = TRAINING_TOKEN_CACHE
+    ):
         self.base_model = base_model
+        self.use_token_cache = use_token_cache
         self.model = None
+        self.padding = None
 
     def create_training_setup(self, training_examples: List[InputExample]):
         print(
@@ -33,10 +84,20 @@ class SentenceTransformerTrainer:
             pin_memory=True if torch.cuda.is_available() else False,
         )
 
-        train_loss = losses.CosineSimilarityLoss(self.model)
+        train_loss = self._create_loss()
 
         return train_dataloader, train_loss, epochs
 
+    def _create_loss(self):
+        train_loss = losses.CosineSimilarityLoss(self.model)
+        if MATRYOSHKA_DIMS:
+            # Nested embeddings: every prefix in MATRYOSHKA_DIMS is trained to
+            # rank on its own, so the model can later be truncated.
+            train_loss = losses.MatryoshkaLoss(
+                self.model, train_loss, matryoshka_dims=list(MATRYOSHKA_DIMS)
+            )
+        return train_loss
+
     def train_with_early_stopping(
         self,
         training_examples: List[InputExample],
@@ -62,17 +123,33 @@ class SentenceTransformerTrainer:
         best_score = -1
         patience = 2
         patience_counter = 0
+        start_epoch = 0
+
+        cached_trainer = None
+        if self.use_token_cache:
+            cached_trainer = self._create_cached_trainer(
+                training_examples, train_loss, epochs
+            )
+            if cached_trainer.resume():
+                start_epoch = cached_trainer.epoch
+                best_score = cached_trainer.extra_state.get("best_score", best_score)
+                patience_counter = cached_trainer.extra_state.get(
+                    "patience_counter", patience_counter
+                )
 
-        for epoch in range(epochs):
+        for epoch in range(start_epoch, epochs):
             print(f"{Fore.YELLOW}\nEpoch {epoch + 1}/{epochs}{Style.RESET_ALL}")
 
-            self.model.fit(
-                train_objectives=[(train_dataloader, train_loss)],
-                epochs=1,
-                warmup_steps=int(len(train_dataloader) * 0.1),
-                show_progress_bar=True,
-                output_path=None,
-            )
+            if cached_trainer:
+                self._train_cached_epoch(cached_trainer, epoch)
+            else:
+                self.model.fit(
+                    train_objectives=[(train_dataloader, train_loss)],
+                    epochs=1,
+                    warmup_steps=int(len(train_dataloader) * 0.1),
+                    show_progress_bar=True,
+                    output_path=None,
+                )
 
             if validation_examples:
                 val_score = self._evaluate_quickly(validation_examples)
@@ -92,52 +169,144 @@ class SentenceTransformerTrainer:
                     self.model = SentenceTransformer("models/best_model_temp")
                     break
 
-        return self.model
+            if cached_trainer:
+                # Saved after validation, so a resumed run neither repeats
+                # the epoch nor loses its early-stopping state.
+                cached_trainer.extra_state = {
+                    "best_score": float(best_score),
+                    "patience_counter": patience_counter,
+                }
+                cached_trainer.save_checkpoint()
 
-    def _evaluate_quickly(self, validation_examples: List[InputExample]) -> float:
-        if len(validation_examples) > 200:
-            validation_examples = validation_examples[:200]
+        if cached_trainer:
+            cached_trainer.clear_checkpoint()
 
-        predictions = []
-        ground_truth = []
+        return self.model
 
-        batch_size = 32
-        for i in range(0, len(validation_examples), batch_size):
-            batch = validation_examples[i : i + batch_size]
+    def _create_cached_trainer(
+        self, training_examples, train_loss, epochs: int, batch_size: int = 32
+    ) -> CachedPairTrainer:
+        pairs = build_token_cache(
+            training_examples, self.model.tokenizer, self.model.max_seq_length
+        )
+        trainer = CachedPairTrainer(
+            self.model,
+            train_loss,
+            pairs,
+            batch_size=batch_size,
+            epochs=epochs,
+            checkpoint_path=TRAINING_CHECKPOINT,
+        )
+        self.padding = padding_report(pairs, trainer.sampler)
+        print_padding_report(self.padding)
+        return trainer
 
-            texts1 = [ex.texts[0] for ex in batch]
-            texts2 = [ex.texts[1] for ex in batch]
-            labels = [ex.label for ex in batch]
+    def _train_cached_epoch(self, trainer: CachedPairTrainer, epoch: int) -> None:
+        stats = trainer.train_epoch(epoch)
+        print(
+            f"{Fore.GREEN}Epoch finished in {stats['seconds']:.1f}s "
+            f"({stats['examples_per_second']:.1f} examples/s, {stats['tokens_per_second']:.0f} tokens/s, "
+            f"peak RSS {stats['peak_rss_mb']:.0f} MB, loss {stats['loss']:.4f}){Style.RESET_ALL}"
+        )
+        if self.padding and not stats["resumed_at_step"]:
+            stats["estimated_random_batch_seconds"] = estimate_random_batch_seconds(
+                self.padding, stats["seconds"]
+            )
+            print(
+                f"{Fore.MAGENTA}Random batches: ~{stats['estimated_random_batch_seconds']:.1f}s "
+                f"(estimated from padded tokens, not timed){Style.RESET_ALL}"
+            )
 
-            embeddings1 = self.model.encode(texts1, convert_to_tensor=True)
-            embeddings2 = self.model.encode(texts2, convert_to_tensor=True)
+        # One line per epoch, tagged with the configuration, so data-pipeline
+        # and threading setups can be compared across runs.
+        append_jsonl(
+            {
+                **stats,
+                "examples": len(trainer.pairs),
+                "batch_size": trainer.sampler.batch_size,
+                "bucket_batches": BUCKET_BATCHES,
+                "torch_threads": torch.get_num_threads(),
+                "device": str(self.model.device),
+                "timestamp": time.time(),
+            },
+            TRAINING_TELEMETRY_FILE,
+        )
 
-            similarities = torch.nn.functional.cosine_similarity(
-                embeddings1, embeddings2
-            )
+    def _evaluate_quickly(self, validation_examples: List[InputExample]) -> float:
+        # Abstracts recur across many pairs: each distinct text is encoded
+        # once, longest first so batches pad little, and the pair
+        # similarities are gathered by index.
+        texts, first, second, labels = index_pair_texts(validation_examples)
+        if len(labels) < 2:
+            return 0.0
+
+        order = sorted(range(len(texts)), key=lambda index: -len(texts[index]))
+        encoded = self.model.encode(
+            [texts[index] for index in order],
+            batch_size=EVALUATION_BATCH_SIZE,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False,
+        )
+        embeddings = np.empty_like(encoded)
+        embeddings[order] = encoded
 
-            predictions.extend(similarities.cpu().numpy())
-            ground_truth.extend(labels)
+        predictions = np.einsum("ij,ij->i", embeddings[first], embeddings[second])
 
-        correlation = np.corrcoef(predictions, ground_truth)[0, 1]
+        correlation = np.corrcoef(predictions, labels)[0, 1]
         return correlation if not np.isnan(correlation) else 0.0
 
-    def load_training_data(self, filepath: str) -> List[InputExample]:
+    def load_training_data(
+        self,
+        filepath: str,
+        collection_file: str = JSON_FILE,
+        mined_file: Optional[str] = None,
+    ) -> Tuple[
+        Union[List[InputExample], PairExamples],
+        Optional[Union[List[InputExample], PairExamples]],
+    ]:
         print(f"{Fore.CYAN}Loading training data...{Style.RESET_ALL}")
 
-        from utils import load_json
-
-        training_data = load_json(filepath)
-
-        examples = []
-        for item in training_data:
-            example = InputExample(
-                texts=[item["text1"], item["text2"]], label=float(item["similarity"])
+        training_pairs = load_training_pairs(filepath, collection_file)
+
+        # The validation split is taken from the sampler pairs before mined
+        # pairs are added, so no pair is both trained on and validated.
+        validation_pairs = None
+        if len(training_pairs) > 100:
+            split_idx = int(0.9 * len(training_pairs))
+            validation_pairs = training_pairs[split_idx:]
+            training_pairs = training_pairs[:split_idx]
+
+        if mined_file and isinstance(training_pairs, TrainingPairs):
+            mined_pairs = load_pair_file(mined_file, training_pairs.documents)
+            if validation_pairs is not None:
+                mined_pairs = exclude_pairs(mined_pairs, validation_pairs)
+            print(
+                f"{Fore.BLUE}Adding {len(mined_pairs)} mined pairs from {mined_file}{Style.RESET_ALL}"
             )
-            examples.append(example)
+            training_pairs = merge_training_pairs([training_pairs, mined_pairs])
+
+        examples = self._to_examples(training_pairs)
+        validation_examples = (
+            self._to_examples(validation_pairs) if validation_pairs is not None else None
+        )
 
         print(f"{Fore.GREEN}Loaded {len(examples)} training examples{Style.RESET_ALL}")
-        return examples
+        if validation_examples is not None:
+            print(
+                f"{Fore.GREEN}Holding out {len(validation_examples)} validation examples{Style.RESET_ALL}"
+            )
+        return examples, validation_examples
+
+    def _to_examples(
+        self, training_pairs
+    ) -> Union[List[InputExample], PairExamples]:
+        if isinstance(training_pairs, TrainingPairs):
+            return PairExamples(training_pairs)
+        return [
+            InputExample(texts=[text1, text2], label=similarity)
+            for text1, text2, similarity in training_pairs
+        ]
 
     def train_model(self, training_examples: List[InputExample]) -> SentenceTransformer:
         print(
@@ -148,16 +317,26 @@ class SentenceTransformerTrainer:
 
         train_dataloader = DataLoader(training_examples, shuffle=True, batch_size=32)
 
-        train_loss = losses.CosineSimilarityLoss(self.model)
+        train_loss = self._create_loss()
 
         print(f"{Fore.YELLOW}Training for 2 epochs...{Style.RESET_ALL}")
 
-        self.model.fit(
-            train_objectives=[(train_dataloader, train_loss)],
-            epochs=2,
-            warmup_steps=int(len(train_dataloader) * 0.1),
-            show_progress_bar=True,
-        )
+        if self.use_token_cache:
+            cached_trainer = self._create_cached_trainer(
+                training_examples, train_loss, epochs=2
+            )
+            cached_trainer.resume()
+            for epoch in range(cached_trainer.epoch, 2):
+                self._train_cached_epoch(cached_trainer, epoch)
+                cached_trainer.save_checkpoint()
+            cached_trainer.clear_checkpoint()
+        else:
+            self.model.fit(
+                train_objectives=[(train_dataloader, train_loss)],
+                epochs=2,
+                warmup_steps=int(len(train_dataloader) * 0.1),
+                show_progress_bar=True,
+            )
 
         print(f"{Fore.GREEN}Training completed!{Style.RESET_ALL}")
         return self.model
@@ -172,6 +351,12 @@ class SentenceTransformerTrainer:
         self.model.save(model_path)
         print(f"{Fore.GREEN}Model saved to: {model_path}{Style.RESET_ALL}")
 
+        if remove_projection(model_path):
+            print(
+                f"{Fore.YELLOW}Removed the embedding projection fitted for the previous "
+                f"model; run embedding_projection.py to fit a new one{Style.RESET_ALL}"
+            )
+
     def load_model(self, model_path: str) -> SentenceTransformer:
         if os.path.exists(model_path):
             self.model = SentenceTransformer(model_path)
@@ -0,0 +1,264 @@
+import re
+import time
+import zlib
+from typing import List, Dict, Any, Set, Tuple
+import numpy as np
+from config import (
+    JSON_FILE,
+    NEAR_DUPLICATE_THRESHOLD,
+    MINHASH_PERMUTATIONS,
+    SHINGLE_SIZE,
+    NEAR_DUPLICATE_REPORT,
+)
+from utils import DisjointSet, load_json, save_json
+from colorama import Fore, Style, init
+
+init(autoreset=True)
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+TOKEN_PATTERN = re.compile(r"\w+")
+MIN_BAND_RECALL = 0.95
+
+
+def shingle_hashes(text: str, size: int = SHINGLE_SIZE) -> np.ndarray:
+    tokens = TOKEN_PATTERN.findall((text or "").casefold())
+    if not tokens:
+        return np.zeros(0, dtype=np.uint64)
+
+    if len(tokens) <= size:
+        shingles = {" ".join(tokens)}
+    else:
+        shingles = {
+            " ".join(tokens[i : i + size]) for i in range(len(tokens) - size + 1)
+        }
+
+    hashes = np.fromiter(
+        (zlib.crc32(shingle.encode("utf-8")) for shingle in shingles),
+        dtype=np.uint64,
+        count=len(shingles),
+    )
+    return np.unique(hashes)
+
+
+def exact_jaccard(first: np.ndarray, second: np.ndarray) -> float:
+    if len(first) == 0 or len(second) == 0:
+        return 0.0
+    intersection = len(np.intersect1d(first, second, assume_unique=True))
+    return intersection / (len(first) + len(second) - intersection)
+
+
+def choose_bands(threshold: float, num_perm: int) -> Tuple[int, int]:
+    # Use the longest bands that still make a pair at the threshold a
+    # candidate with probability MIN_BAND_RECALL; verification is exact, so
+    # extra candidates only cost time while missed ones are lost.
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        recall = 1.0 - (1.0 - threshold**rows) ** bands
+        if recall < MIN_BAND_RECALL:
+            break
+        best = (bands, rows)
+    return best
+
+
+class NearDuplicateDetector:
+    def __init__(
+        self,
+        threshold: float = NEAR_DUPLICATE_THRESHOLD,
+        num_perm: int = MINHASH_PERMUTATIONS,
+        shingle_size: int = SHINGLE_SIZE,
+        field: str = "abstract",
+        seed: int = 2025,
+    ):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.field = field
+        self.bands, self.rows = choose_bands(threshold, num_perm)
+
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+        self.stats = {
+            "documents": 0,
+            "candidate_pairs": 0,
+            "verified_pairs": 0,
+            "clusters": 0,
+            "seconds": 0.0,
+        }
+
+    def signatures(self, shingle_sets: List[np.ndarray]) -> np.ndarray:
+        signatures = np.full((len(shingle_sets), self.num_perm), MAX_HASH, np.uint64)
+        for index, hashes in enumerate(shingle_sets):
+            if len(hashes) == 0:
+                continue
+            # Overflow wraps modulo 2**64, which is fine for hashing purposes.
+            permuted = (np.outer(hashes, self.a) + self.b) % MERSENNE_PRIME
+            signatures[index] = (permuted & MAX_HASH).min(axis=0)
+        return signatures.astype(np.uint32)
+
+    def candidate_pairs(
+        self, signatures: np.ndarray, active: np.ndarray
+    ) -> Set[Tuple[int, int]]:
+        candidates = set()
+        active_indices = np.flatnonzero(active)
+        if len(active_indices) < 2:
+            return candidates
+
+        for band in range(self.bands):
+            band_rows = np.ascontiguousarray(
+                signatures[active_indices, band * self.rows : (band + 1) * self.rows]
+            )
+            keys = band_rows.view(np.dtype((np.void, band_rows.shape[1] * 4))).ravel()
+            _, bucket_ids, bucket_sizes = np.unique(
+                keys, return_inverse=True, return_counts=True
+            )
+            if bucket_sizes.max() < 2:
+                continue
+
+            order = np.argsort(bucket_ids.ravel(), kind="stable")
+            boundaries = np.cumsum(bucket_sizes)[:-1]
+            for bucket in np.split(active_indices[order], boundaries):
+                if len(bucket) < 2:
+                    continue
+                members = bucket.tolist()
+                for position, first in enumerate(members):
+                    for second in members[position + 1 :]:
+                        candidates.add((first, second))
+
+        return candidates
+
+    def find_clusters(
+        self, documents: List[Dict[str, Any]]
+    ) -> Tuple[List[List[int]], List[np.ndarray]]:
+        start = time.perf_counter()
+
+        shingle_sets = [
+            shingle_hashes(doc.get(self.field, ""), self.shingle_size)
+            for doc in documents
+        ]
+        active = np.array([len(hashes) > 0 for hashes in shingle_sets], dtype=bool)
+        signatures = self.signatures(shingle_sets)
+        candidates = self.candidate_pairs(signatures, active)
+
+        disjoint_set = DisjointSet(len(documents))
+        verified = 0
+        for first, second in candidates:
+            if exact_jaccard(shingle_sets[first], shingle_sets[second]) >= self.threshold:
+                disjoint_set.union(first, second)
+                verified += 1
+
+        clusters = disjoint_set.groups()
+
+        self.stats.update(
+            {
+                "documents": len(documents),
+                "candidate_pairs": len(candidates),
+                "verified_pairs": verified,
+                "clusters": len(clusters),
+                "seconds": time.perf_counter() - start,
+            }
+        )
+        return clusters, shingle_sets
+
+    def deduplicate(
+        self, documents: List[Dict[str, Any]]
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        clusters, shingle_sets = self.find_clusters(documents)
+
+        removed = set()
+        report_clusters = []
+        for cluster in clusters:
+            kept = min(cluster, key=lambda index: self._keep_priority(documents, index))
+            duplicates = [index for index in cluster if index != kept]
+            removed.update(duplicates)
+
+            report_clusters.append(
+                {
+                    "kept": self._describe(documents[kept]),
+                    "removed": [
+                        dict(
+                            self._describe(documents[index]),
+                            jaccard=round(
+                                exact_jaccard(shingle_sets[kept], shingle_sets[index]), 4
+                            ),
+                        )
+                        for index in duplicates
+                    ],
+                }
+            )
+
+        kept_documents = [
+            doc for index, doc in enumerate(documents) if index not in removed
+        ]
+        report = {
+            "threshold": self.threshold,
+            "num_perm": self.num_perm,
+            "bands": self.bands,
+            "rows": self.rows,
+            "shingle_size": self.shingle_size,
+            **self.stats,
+            "documents_removed": len(removed),
+            "clusters": report_clusters,
+        }
+        return kept_documents, report
+
+    def _keep_priority(
+        self, documents: List[Dict[str, Any]], index: int
+    ) -> Tuple[int, int, int]:
+        # Prefer the most recent version, then the longest abstract, then the
+        # document that appears first in the collection.
+        doc = documents[index]
+        date = str(doc.get("date", ""))
+        year = int(date[:4]) if date[:4].isdigit() else 0
+        return (-year, -len(doc.get(self.field, "") or ""), index)
+
+    def _describe(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "id": doc.get("id", ""),
+            "title": doc.get("title", ""),
+            "date": doc.get("date", ""),
+            "language": doc.get("language", ""),
+        }
+
+
+def print_report(report: Dict[str, Any], max_clusters: int = 10) -> None:
+    print("\n" + "=" * 60)
+    print(f"{Fore.CYAN}NEAR-DUPLICATE REPORT{Style.RESET_ALL}")
+    print("=" * 60)
+    print(
+        f"{Fore.YELLOW}Threshold: {report['threshold']} | MinHash: {report['num_perm']} "
+        f"({report['bands']} bands × {report['rows']} rows){Style.RESET_ALL}"
+    )
+    print(
+        f"{Fore.BLUE}Candidates: {report['candidate_pairs']:,} | Verified pairs: "
+        f"{report['verified_pairs']:,} | {report['seconds']:.2f}s{Style.RESET_ALL}"
+    )
+    print(
+        f"{Fore.RED}Clusters: {len(report['clusters']):,} | Documents removed: "
+        f"{report['documents_removed']:,}{Style.RESET_ALL}"
+    )
+
+    for cluster in report["clusters"][:max_clusters]:
+        print("-" * 60)
+        print(f"{Fore.GREEN}KEPT: {cluster['kept']['title']}{Style.RESET_ALL}")
+        for doc in cluster["removed"]:
+            print(f"{Fore.RED}  - [{doc['jaccard']:.2f}] {doc['title']}{Style.RESET_ALL}")
+
+    print("=" * 60)
+
+
+def main():
+    documents = load_json(JSON_FILE)
+    detector = NearDuplicateDetector()
+    _, report = detector.deduplicate(documents)
+
+    save_json(report, NEAR_DUPLICATE_REPORT)
+    print_report(report)
+    print(f"{Fore.GREEN}Report saved to: {NEAR_DUPLICATE_REPORT}{Style.RESET_ALL}")
+
+
+if __name__ == "__main__":
+    main()
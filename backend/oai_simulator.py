@@ -0,0 +1,295 @@
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import urlparse, parse_qs
+from xml.sax.saxutils import escape
+from colorama import Fore, Style, init
+
+init(autoreset=True)
+
+OAI_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<OAI-PMH xmlns="http://www.openarchives.org/OAI/2.0/">'
+    "<responseDate>{response_date}</responseDate>"
+)
+
+WORDS = (
+    "sistema dados modelo análise rede neural aprendizagem máquina algoritmo "
+    "otimização processamento linguagem natural informação pesquisa software "
+    "desenvolvimento avaliação desempenho arquitetura distribuído segurança "
+    "framework learning network data model system evaluation retrieval semantic "
+    "embedding classification clustering graph database cloud performance"
+).split()
+
+FIELDS_OF_SCIENCE = (
+    "Engenharia e Tecnologia::Engenharia Eletrotécnica, Eletrónica e Informática",
+    "Ciências Naturais::Ciências da Computação e da Informação",
+    "Ciências Sociais::Economia e Gestão",
+)
+
+BASE_DATESTAMP = datetime(2015, 1, 1, tzinfo=timezone.utc)
+
+
+class SyntheticRepository:
+    def __init__(
+        self, collections: Dict[str, int], seed: int = 2025, deleted_ratio: float = 0.0
+    ):
+        self.collections = collections
+        self.seed = seed
+        self.deleted_ratio = deleted_ratio
+
+    def datestamp(self, collection_id: str, index: int) -> str:
+        moment = BASE_DATESTAMP + timedelta(hours=index)
+        return moment.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    def record_indices(self, collection_id: str, harvest_from: str = None) -> range:
+        total = self.collections.get(collection_id, 0)
+        if not harvest_from:
+            return range(total)
+
+        try:
+            start = datetime.strptime(harvest_from[:19], "%Y-%m-%dT%H:%M:%S")
+        except ValueError:
+            start = datetime.strptime(harvest_from[:10], "%Y-%m-%d")
+        start = start.replace(tzinfo=timezone.utc)
+        first = max(0, int((start - BASE_DATESTAMP).total_seconds() // 3600))
+        return range(min(first, total), total)
+
+    def record_xml(self, collection_id: str, index: int) -> str:
+        rng = random.Random(f"{self.seed}:{collection_id}:{index}")
+        identifier = f"oai:simulator:{collection_id}/{index}"
+        datestamp = self.datestamp(collection_id, index)
+
+        if rng.random() < self.deleted_ratio:
+            return (
+                f'<record><header status="deleted"><identifier>{identifier}</identifier>'
+                f"<datestamp>{datestamp}</datestamp><setSpec>{collection_id}</setSpec>"
+                f"</header></record>"
+            )
+
+        title = " ".join(rng.choices(WORDS, k=rng.randint(4, 10))).capitalize()
+        abstract = " ".join(rng.choices(WORDS, k=rng.randint(40, 220))).capitalize()
+        fields = [
+            ("contributor", "author", f"Autor {rng.randint(1, 500)}, Nome"),
+            ("date", "issued", str(2000 + rng.randint(0, 24))),
+            ("identifier", "uri", f"https://hdl.handle.net/1822/{index}"),
+            ("description", "abstract", abstract + "."),
+            ("language", "iso", rng.choice(("por", "eng"))),
+            ("title", None, title),
+            ("type", None, "info:eu-repo/semantics/masterThesis"),
+            ("subject", "fos", rng.choice(FIELDS_OF_SCIENCE)),
+            ("degree", "grade", f"{rng.randint(10, 20)} valores"),
+        ]
+        fields.extend(
+            ("subject", None, keyword) for keyword in rng.sample(WORDS, rng.randint(2, 5))
+        )
+
+        dim_fields = "".join(
+            f'<dim:field mdschema="dc" element="{element}"'
+            + (f' qualifier="{qualifier}"' if qualifier else "")
+            + f">{escape(value)}</dim:field>"
+            for element, qualifier, value in fields
+        )
+
+        return (
+            f"<record><header><identifier>{identifier}</identifier>"
+            f"<datestamp>{datestamp}</datestamp><setSpec>{collection_id}</setSpec></header>"
+            f'<metadata><dim:dim xmlns:dim="http://www.dspace.org/xmlns/dspace/dim">'
+            f"{dim_fields}</dim:dim></metadata></record>"
+        )
+
+    def write_xml_file(self, filepath: str, collection_id: str, count: int) -> None:
+        with open(filepath, "w", encoding="utf-8") as f:
+            f.write('<?xml version="1.0" encoding="UTF-8"?>\n<collection>\n')
+            for index in range(count):
+                record = self.record_xml(collection_id, index)
+                f.write(
+                    record.replace(
+                        "<record>",
+                        '<record xmlns="http://www.openarchives.org/OAI/2.0/">',
+                        1,
+                    )
+                    + "\n"
+                )
+            f.write("</collection>\n")
+
+
+class OAIPMHSimulator:
+    def __init__(
+        self,
+        repository: SyntheticRepository,
+        page_size: int = 100,
+        latency: float = 0.05,
+        latency_jitter: float = 0.02,
+        timeout_rate: float = 0.0,
+        timeout_delay: float = 5.0,
+        unavailable_rate: float = 0.0,
+        retry_after: int = 1,
+        malformed_rate: float = 0.0,
+        seed: int = 2025,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.repository = repository
+        self.page_size = page_size
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.timeout_rate = timeout_rate
+        self.timeout_delay = timeout_delay
+        self.unavailable_rate = unavailable_rate
+        self.retry_after = retry_after
+        self.malformed_rate = malformed_rate
+        self.rng = random.Random(seed)
+        self.stats = {
+            "requests": 0,
+            "pages": 0,
+            "timeouts": 0,
+            "unavailable": 0,
+            "malformed": 0,
+        }
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._make_handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/oai/request"
+
+    def start(self) -> "OAIPMHSimulator":
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "OAIPMHSimulator":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.stop()
+
+    def _draw_fault(self) -> Optional[str]:
+        with self._lock:
+            self.stats["requests"] += 1
+            roll = self.rng.random()
+            delay = self.latency + self.rng.uniform(0, self.latency_jitter)
+
+        for fault, rate in (
+            ("timeouts", self.timeout_rate),
+            ("unavailable", self.unavailable_rate),
+            ("malformed", self.malformed_rate),
+        ):
+            if roll < rate:
+                with self._lock:
+                    self.stats[fault] += 1
+                return fault
+            roll -= rate
+
+        time.sleep(delay)
+        return None
+
+    def list_records(self, params: Dict[str, str]) -> str:
+        response_date = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        head = OAI_HEADER.format(response_date=response_date)
+
+        token = params.get("resumptionToken")
+        if token:
+            try:
+                collection_id, offset, harvest_from = token.split("|", 2)
+                offset = int(offset)
+            except ValueError:
+                return head + '<error code="badResumptionToken"/></OAI-PMH>'
+        else:
+            collection_id = params.get("set", "")
+            harvest_from = params.get("from", "")
+            offset = 0
+
+        indices = self.repository.record_indices(collection_id, harvest_from)
+        if len(indices) == 0:
+            return head + '<error code="noRecordsMatch"/></OAI-PMH>'
+
+        page = indices[offset : offset + self.page_size]
+        records = "".join(
+            self.repository.record_xml(collection_id, index) for index in page
+        )
+
+        next_offset = offset + self.page_size
+        if next_offset < len(indices):
+            resumption_token = (
+                f'<resumptionToken completeListSize="{len(indices)}" cursor="{offset}">'
+                f"{collection_id}|{next_offset}|{harvest_from}</resumptionToken>"
+            )
+        else:
+            resumption_token = "<resumptionToken/>"
+
+        with self._lock:
+            self.stats["pages"] += 1
+
+        return head + f"<ListRecords>{records}{resumption_token}</ListRecords></OAI-PMH>"
+
+    def _make_handler(self):
+        simulator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                query = parse_qs(urlparse(self.path).query)
+                params = {key: values[0] for key, values in query.items()}
+
+                fault = simulator._draw_fault()
+                if fault == "timeouts":
+                    time.sleep(simulator.timeout_delay)
+                elif fault == "unavailable":
+                    self.send_response(503)
+                    self.send_header("Retry-After", str(simulator.retry_after))
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+
+                if params.get("verb") != "ListRecords":
+                    body = OAI_HEADER.format(response_date="") + (
+                        '<error code="badVerb"/></OAI-PMH>'
+                    )
+                else:
+                    body = simulator.list_records(params)
+
+                if fault == "malformed":
+                    body = body[: len(body) // 2]
+
+                payload = body.encode("utf-8")
+                try:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/xml; charset=utf-8")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    repository = SyntheticRepository({"msc_sim": 2000, "phd_sim": 1000})
+    simulator = OAIPMHSimulator(repository, port=8080, unavailable_rate=0.02)
+    print(f"{Fore.GREEN}OAI-PMH simulator listening on {simulator.url}{Style.RESET_ALL}")
+    print(f"{Fore.YELLOW}Sets: {list(repository.collections)}{Style.RESET_ALL}")
+
+    try:
+        simulator.server.serve_forever()
+    except KeyboardInterrupt:
+        simulator.server.server_close()
+        print(f"\n{Fore.BLUE}Simulator stats: {simulator.stats}{Style.RESET_ALL}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+import os
+import time
+from typing import List, Dict, Any, Tuple, Optional
+import numpy as np
+from config import (
+    TRAIN_FILE,
+    MINED_PAIRS_FILE,
+    MINING_REPORT,
+    MINING_TOP_K,
+    MINING_MIN_LOSS,
+    MINING_BLOCK_SIZE,
+    TRAINING_COST_FACTOR,
+    TRAINING_TELEMETRY_FILE,
+)
+from similarity_calculator import SimilarityCalculator
+from streaming_tfidf import iter_text_chunks
+from training_pairs import TrainingPairs, load_pair_file, pair_keys
+from utils import iter_jsonl, save_json
+from colorama import Fore, Style, init
+
+init(autoreset=True)
+
+TRIVIAL_LOSS = 0.01
+
+
+def normalize_rows(embeddings: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def top_k_neighbours(
+    vectors: np.ndarray, top_k: int, block_size: int = MINING_BLOCK_SIZE
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Exact search over normalised vectors, one block of queries at a time;
+    # each unordered pair is returned once, with the smaller index first.
+    count = len(vectors)
+    top_k = min(top_k, count - 1)
+    if top_k <= 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, np.zeros(0, dtype=np.float32)
+
+    row_parts, col_parts = [], []
+    for start in range(0, count, block_size):
+        end = min(start + block_size, count)
+        block = vectors[start:end] @ vectors.T
+        block[np.arange(end - start), np.arange(start, end)] = -np.inf
+
+        neighbours = np.argpartition(block, -top_k, axis=1)[:, -top_k:]
+        row_parts.append(np.repeat(np.arange(start, end), top_k))
+        col_parts.append(neighbours.ravel())
+
+    rows = np.concatenate(row_parts)
+    cols = np.concatenate(col_parts)
+    pairs = np.unique(
+        np.stack([np.minimum(rows, cols), np.maximum(rows, cols)], axis=1), axis=0
+    )
+    rows, cols = pairs[:, 0], pairs[:, 1]
+    return rows, cols, pair_cosine(vectors, rows, cols)
+
+
+def pair_cosine(vectors: np.ndarray, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+    return np.einsum("ij,ij->i", vectors[rows], vectors[cols])
+
+
+class HardPairMiner:
+    """Finds pairs the current model scores furthest from the TF-IDF/metadata label."""
+
+    def __init__(
+        self,
+        calculator: Optional[SimilarityCalculator] = None,
+        top_k: int = MINING_TOP_K,
+        min_loss: float = MINING_MIN_LOSS,
+        block_size: int = MINING_BLOCK_SIZE,
+    ):
+        self.calculator = calculator or SimilarityCalculator(use_clustering=False)
+        self.top_k = top_k
+        self.min_loss = min_loss
+        self.block_size = block_size
+        self.stats = {}
+
+    def mine(
+        self,
+        documents,
+        embeddings: np.ndarray,
+        sampler_pairs: Optional[TrainingPairs] = None,
+    ) -> TrainingPairs:
+        start = time.perf_counter()
+        vectors = normalize_rows(embeddings)
+        self.calculator.prepare(documents)
+
+        # Candidates are the model's own nearest neighbours. Pairs the sampler
+        # already produced are left out: training gets them from the sampler
+        # file, and mining them again would count them twice.
+        rows, cols, _ = top_k_neighbours(vectors, self.top_k, self.block_size)
+        neighbour_pairs = len(rows)
+        if sampler_pairs is not None and len(sampler_pairs):
+            new = ~np.isin(
+                pair_keys(rows, cols, len(vectors)),
+                pair_keys(sampler_pairs.first, sampler_pairs.second, len(vectors)),
+            )
+            rows, cols = rows[new], cols[new]
+
+        labels = self.calculator.score_pairs(rows, cols)
+        predictions = pair_cosine(vectors, rows, cols)
+        losses = (predictions - labels) ** 2
+
+        keep = losses >= self.min_loss
+        negatives = keep & (predictions > labels)
+
+        self.stats = {
+            "documents": len(documents),
+            "neighbour_pairs": int(neighbour_pairs),
+            "candidate_pairs": int(len(rows)),
+            "hard_negatives": int(negatives.sum()),
+            "hard_positives": int((keep & ~negatives).sum()),
+            "seconds": time.perf_counter() - start,
+        }
+        return TrainingPairs(documents, rows[keep], cols[keep], labels[keep])
+
+    def learning_signal(
+        self,
+        pairs: TrainingPairs,
+        embeddings: np.ndarray,
+        characters_per_minute: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        # CosineSimilarityLoss is the squared error between the model cosine
+        # and the label, so its value under the current model is the signal a
+        # pair still carries. Training cost is taken as proportional to text
+        # length.
+        vectors = normalize_rows(embeddings)
+        losses = (pair_cosine(vectors, pairs.first, pairs.second) - pairs.scores) ** 2
+        lengths = pair_characters(pairs)
+
+        summary = {
+            "pairs": len(pairs),
+            "mean_loss": float(losses.mean()) if len(pairs) else 0.0,
+            "trivial_fraction": (
+                float(np.mean(losses < TRIVIAL_LOSS)) if len(pairs) else 0.0
+            ),
+            "mean_characters": float(lengths.mean()) if len(pairs) else 0.0,
+        }
+        if characters_per_minute and len(pairs):
+            examples_per_minute = characters_per_minute / summary["mean_characters"]
+            summary["examples_per_minute"] = examples_per_minute
+            summary["signal_per_minute"] = summary["mean_loss"] * examples_per_minute
+        return summary
+
+
+def pair_characters(pairs: TrainingPairs) -> np.ndarray:
+    document_lengths = np.fromiter(
+        (len(text) for chunk in iter_text_chunks(pairs.documents) for text in chunk),
+        dtype=np.float64,
+        count=len(pairs.documents),
+    )
+    return document_lengths[pairs.first] + document_lengths[pairs.second]
+
+
+def measured_training_throughput(
+    mean_characters: float, telemetry_file: str = TRAINING_TELEMETRY_FILE
+) -> Optional[float]:
+    # Examples/s of the latest logged training epoch, in characters per
+    # minute for pairs of the given mean length.
+    if not mean_characters or not os.path.exists(telemetry_file):
+        return None
+    rates = [
+        record["examples_per_second"]
+        for record in iter_jsonl(telemetry_file)
+        if record.get("examples_per_second")
+    ]
+    return rates[-1] * 60 * mean_characters if rates else None
+
+
+def estimate_training_throughput(model, texts: List[str]) -> float:
+    # Forward-pass throughput in characters per minute, scaled down by the
+    # extra cost of the backward pass and optimiser step.
+    start = time.perf_counter()
+    model.encode(texts, batch_size=32, show_progress_bar=False)
+    elapsed = time.perf_counter() - start
+    characters = sum(len(text) for text in texts)
+    return characters / elapsed * 60 / TRAINING_COST_FACTOR if elapsed > 0 else 0.0
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print("\n" + "=" * 60)
+    print(f"{Fore.CYAN}HARD PAIR MINING{Style.RESET_ALL}")
+    print("=" * 60)
+    mining = report["mining"]
+    print(
+        f"{Fore.YELLOW}Candidates: {mining['candidate_pairs']:,} "
+        f"(top-{report['top_k']} neighbours, "
+        f"{mining['neighbour_pairs'] - mining['candidate_pairs']:,} already sampled) | "
+        f"{mining['seconds']:.2f}s{Style.RESET_ALL}"
+    )
+    print(
+        f"{Fore.RED}Hard negatives: {mining['hard_negatives']:,} | "
+        f"Hard positives: {mining['hard_positives']:,}{Style.RESET_ALL}"
+    )
+    throughput = report["throughput"]
+    if throughput["source"] == "measured":
+        print(
+            f"{Fore.BLUE}Training throughput measured from {throughput['telemetry_file']}{Style.RESET_ALL}"
+        )
+    else:
+        print(
+            f"{Fore.YELLOW}Training throughput estimated: encoding speed / "
+            f"{throughput['training_cost_factor']} (assumed training cost factor){Style.RESET_ALL}"
+        )
+    print("-" * 60)
+    print(f"{'source':10} {'pairs':>9} {'loss':>8} {'trivial':>8} {'signal/min':>12}")
+    for name in ("sampler", "mined"):
+        summary = report.get(name)
+        if not summary:
+            continue
+        signal = summary.get("signal_per_minute")
+        print(
+            f"{Fore.BLUE}{name:10}{Style.RESET_ALL} {summary['pairs']:>9,} "
+            f"{summary['mean_loss']:>8.4f} {summary['trivial_fraction']:>8.1%} "
+            f"{signal if signal is not None else float('nan'):>12.2f}"
+        )
+    print("=" * 60)
+
+
+def main():
+    from retrieval_system import InformationRetrievalSystem
+
+    ir_system = InformationRetrievalSystem()
+    # The loss is measured on the model's own, full-dimensional cosine.
+    ir_system.projection = None
+    ir_system.load_collection()
+    documents = ir_system.documents
+    embeddings = ir_system.document_embeddings
+
+    sampler_pairs = None
+    if os.path.exists(TRAIN_FILE):
+        sampler_pairs = load_pair_file(TRAIN_FILE, documents)
+
+    miner = HardPairMiner()
+    mined_pairs = miner.mine(documents, embeddings, sampler_pairs)
+    mined_pairs.save(MINED_PAIRS_FILE)
+
+    # Measured training throughput is used when a training run logged it;
+    # otherwise it is estimated from encoding speed and an assumed factor.
+    trained_pairs = sampler_pairs if sampler_pairs is not None else mined_pairs
+    characters_per_minute = measured_training_throughput(
+        float(pair_characters(trained_pairs).mean()) if len(trained_pairs) else 0.0
+    )
+    if characters_per_minute is not None:
+        throughput = {"source": "measured", "telemetry_file": TRAINING_TELEMETRY_FILE}
+    else:
+        sample = next(iter_text_chunks(documents, chunk_size=256), [])
+        characters_per_minute = estimate_training_throughput(ir_system.model, sample)
+        throughput = {"source": "estimated", "training_cost_factor": TRAINING_COST_FACTOR}
+    throughput["characters_per_minute"] = characters_per_minute
+
+    report = {
+        "top_k": miner.top_k,
+        "min_loss": miner.min_loss,
+        "throughput": throughput,
+        "mining": miner.stats,
+        "mined": miner.learning_signal(mined_pairs, embeddings, characters_per_minute),
+    }
+    if sampler_pairs is not None:
+        report["sampler"] = miner.learning_signal(
+            sampler_pairs, embeddings, characters_per_minute
+        )
+
+    save_json(report, MINING_REPORT)
+    print_report(report)
+    print(
+        f"{Fore.GREEN}{len(mined_pairs)} mined pairs saved to: {MINED_PAIRS_FILE}{Style.RESET_ALL}"
+    )
+
+
+if __name__ == "__main__":
+    main()
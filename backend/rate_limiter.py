@@ -0,0 +1,112 @@
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+
+class TokenBucketRateLimiter:
+    def __init__(
+        self,
+        rate: float,
+        capacity: float = 1.0,
+        min_rate: float = None,
+        recovery_step: float = None,
+    ):
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.min_rate = min_rate if min_rate is not None else rate / 16
+        self.recovery_step = recovery_step if recovery_step is not None else rate / 10
+        self.tokens = self.capacity
+        self.last_refill = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self.last_refill
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.last_refill = now
+
+    def acquire(self) -> float:
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    delay = self.paused_until - now
+                else:
+                    self._refill(now)
+                    if self.tokens >= 1.0:
+                        self.tokens -= 1.0
+                        return waited
+                    delay = (1.0 - self.tokens) / self.rate
+
+            time.sleep(delay)
+            waited += delay
+
+    def penalize(self, retry_after: float = None) -> float:
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            delay = retry_after if retry_after is not None else 1.0 / self.rate
+            now = time.monotonic()
+            self.paused_until = max(self.paused_until, now + delay)
+            self.tokens = 0.0
+            self.last_refill = max(now, self.paused_until)
+            return delay
+
+    def reward(self) -> None:
+        with self._lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.recovery_step)
+
+    def get_stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "rate": self.rate,
+                "max_rate": self.max_rate,
+                "tokens": self.tokens,
+            }
+
+
+class HostRateLimiter:
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.buckets: Dict[str, TokenBucketRateLimiter] = {}
+        self._lock = threading.Lock()
+
+    def for_url(self, url: str) -> TokenBucketRateLimiter:
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucketRateLimiter(self.rate, self.capacity)
+                self.buckets[host] = bucket
+            return bucket
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            buckets = dict(self.buckets)
+        return {host: bucket.get_stats() for host, bucket in buckets.items()}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
@@ -1,10 +1,15 @@
 import numpy as np
-from typing import List, Dict, Any, Tuple
+from collections import defaultdict
+from typing import List, Dict, Any, Tuple, Iterator
 from sentence_transformers import SentenceTransformer
 from config import *
-from utils import load_json
+from collection_store import open_collection
+from embedding_projection import load_projection
+from document_encoder import encode_texts
 from query_processor import QueryProcessor
-from caching_system import EmbeddingCache
+from caching_system import EmbeddingCache, RankingCache
+from metrics import MetricsRegistry
+from suggestion_index import PrefixSuggester
 from colorama import Fore, Style, init
 
 init(autoreset=True)
@@ -15,71 +20,122 @@ class InformationRetrievalSystem:
         self.model = None
         self.documents = []
         self.document_embeddings = None
+        self.model_path = model_path
+        self.projection = None
+        self.id_index: Dict[str, int] = {}
+        self.lower_titles: List[str] = []
+        self.keyword_index: Dict[str, np.ndarray] = {}
         self.query_processor = QueryProcessor()
         self.cache = EmbeddingCache()
+        self.ranking_cache = RankingCache(max_items=RANKING_CACHE_SIZE)
+        self.metrics = MetricsRegistry()
+        self.suggester = PrefixSuggester()
         self.load_model(model_path)
 
     def load_model(self, model_path: str) -> None:
         try:
             self.model = SentenceTransformer(model_path)
+            self.model_path = model_path
             print(f"{Fore.GREEN}Model loaded from: {model_path}{Style.RESET_ALL}")
         except:
             print(f"{Fore.RED}Error loading model from: {model_path}{Style.RESET_ALL}")
             print(f"{Fore.YELLOW}Loading base model...{Style.RESET_ALL}")
             self.model = SentenceTransformer(BASE_MODEL)
+            self.model_path = BASE_MODEL
+            self.projection = None
+            return
+
+        # A projection saved next to the model applies to its embeddings only.
+        self.projection = load_projection(model_path)
+        if self.projection is not None:
+            print(
+                f"{Fore.GREEN}Embedding projection: {self.projection.method} → "
+                f"{self.projection.dimensions} dimensions{Style.RESET_ALL}"
+            )
 
     def load_collection(self, filepath: str = JSON_FILE) -> None:
-        self.documents = load_json(filepath)
+        if hasattr(self.documents, "close"):
+            self.documents.close()
+
+        self.documents = open_collection(filepath)
         print(f"{Fore.GREEN}Loaded {len(self.documents)} documents{Style.RESET_ALL}")
 
+        self._build_document_indexes()
+        self.ranking_cache.clear()
+        self.suggester = PrefixSuggester.from_documents(self.documents)
         self._precompute_embeddings()
 
+    def _field_values(self, field: str, default: Any = None) -> List[Any]:
+        if hasattr(self.documents, "column"):
+            values = self.documents.column(field)
+        else:
+            values = [doc.get(field) for doc in self.documents]
+        return [default if value is None else value for value in values]
+
+    def _build_document_indexes(self) -> None:
+        self.id_index = {}
+        for index, doc_id in enumerate(self._field_values("id")):
+            if doc_id:
+                self.id_index.setdefault(doc_id, index)
+
+        self.lower_titles = [title.lower() for title in self._field_values("title", "")]
+
+        keyword_documents = defaultdict(set)
+        for index, keywords in enumerate(self._field_values("keywords", [])):
+            for keyword in keywords:
+                keyword_documents[keyword.lower().strip()].add(index)
+        self.keyword_index = {
+            keyword: np.fromiter(sorted(indices), dtype=np.int32, count=len(indices))
+            for keyword, indices in keyword_documents.items()
+        }
+
     def _precompute_embeddings(self) -> None:
         print(f"{Fore.CYAN}Checking document embedding cache...{Style.RESET_ALL}")
 
         model_name = self.model._modules["0"].auto_model.config.name_or_path
-        abstracts = [doc["abstract"] for doc in self.documents]
+        abstracts = self._field_values("abstract", "")
 
         cached_embeddings = self.cache.batch_get_embeddings(abstracts, model_name)
+        # Repeated abstracts share one cache entry and are encoded once.
+        uncached_abstracts = list(
+            dict.fromkeys(
+                abstract for abstract in abstracts if abstract not in cached_embeddings
+            )
+        )
 
-        if len(cached_embeddings) == len(abstracts):
+        if not uncached_abstracts:
             print(
                 f"{Fore.GREEN}✅ All {len(abstracts)} embeddings found in cache!{Style.RESET_ALL}"
             )
-            self.document_embeddings = np.array(
-                [cached_embeddings[abstract] for abstract in abstracts]
-            )
         else:
+            found = sum(abstract in cached_embeddings for abstract in abstracts)
             print(
-                f"{Fore.BLUE}📊 Cache: {len(cached_embeddings)}/{len(abstracts)} embeddings found{Style.RESET_ALL}"
+                f"{Fore.BLUE}📊 Cache: {found}/{len(abstracts)} embeddings found{Style.RESET_ALL}"
             )
             print(f"{Fore.YELLOW}Computing missing embeddings...{Style.RESET_ALL}")
 
-            uncached_abstracts = [
-                abstract for abstract in abstracts if abstract not in cached_embeddings
-            ]
-
-            if uncached_abstracts:
-                new_embeddings = self.model.encode(
-                    uncached_abstracts, show_progress_bar=True, convert_to_numpy=True
-                )
-
-                embedding_pairs = list(zip(uncached_abstracts, new_embeddings))
+            # Each chunk is written to the cache as soon as it arrives.
+            for chunk, embeddings in encode_texts(
+                self.model, self.model_path, uncached_abstracts
+            ):
+                embedding_pairs = list(zip(chunk, embeddings))
                 self.cache.batch_store_embeddings(embedding_pairs, model_name)
-                print(
-                    f"{Fore.GREEN}💾 {len(uncached_abstracts)} new embeddings saved to cache{Style.RESET_ALL}"
-                )
+                cached_embeddings.update(embedding_pairs)
 
-            all_embeddings = []
-            for abstract in abstracts:
-                if abstract in cached_embeddings:
-                    all_embeddings.append(cached_embeddings[abstract])
-                else:
-                    embedding = self.model.encode([abstract], convert_to_numpy=True)[0]
-                    all_embeddings.append(embedding)
-                    self.cache.store_embedding(abstract, model_name, embedding)
+            print(
+                f"{Fore.GREEN}💾 {len(uncached_abstracts)} new embeddings saved to cache{Style.RESET_ALL}"
+            )
 
-            self.document_embeddings = np.array(all_embeddings)
+        self.document_embeddings = np.array(
+            [cached_embeddings[abstract] for abstract in abstracts]
+        )
+
+        # The cache keeps full-dimensional embeddings, so changing or removing
+        # the projection never invalidates it.
+        if self.projection is not None:
+            self.document_embeddings = self.projection.transform(
+                self.document_embeddings
+            )
 
         cache_stats = self.cache.get_cache_stats()
         print(
@@ -88,18 +144,48 @@ class InformationRetrievalSystem:
         print(f"{Fore.GREEN}Document embeddings ready!{Style.RESET_ALL}")
 
     def retrieve(
-        self, query: str, top_k: int = 10
+        self, query: str, top_k: int = 10, offset: int = 0
     ) -> List[Tuple[Dict[str, Any], float]]:
+        ranked_indices, scores = self.rank(query)
+
+        results = []
+        for position in range(offset, min(offset + top_k, len(ranked_indices))):
+            results.append(
+                (self.documents[ranked_indices[position]], float(scores[position]))
+            )
+
+        return results
+
+    def iter_results(
+        self, query: str, limit: int = None
+    ) -> Iterator[Tuple[Dict[str, Any], float]]:
+        ranked_indices, scores = self.rank(query)
+
+        if limit is None:
+            limit = len(ranked_indices)
+
+        return (
+            (self.documents[ranked_indices[position]], float(scores[position]))
+            for position in range(min(limit, len(ranked_indices)))
+        )
+
+    def rank(self, query: str) -> Tuple[np.ndarray, np.ndarray]:
         if not self.documents or self.document_embeddings is None:
             raise ValueError("Collection not loaded")
 
+        cached_ranking = self.ranking_cache.get(query)
+        self.metrics.record_cache_lookup("ranking", cached_ranking is not None)
+        if cached_ranking is not None:
+            return cached_ranking
+
         print(f"{Fore.CYAN}Processing query: '{query}'{Style.RESET_ALL}")
 
-        processed_query_data = self.query_processor.process_query(query)
+        with self.metrics.timer("query_processing"):
+            processed_query_data = self.query_processor.process_query(query)
 
-        enhanced_query = self.query_processor.enhance_query_for_similarity(
-            processed_query_data
-        )
+            enhanced_query = self.query_processor.enhance_query_for_similarity(
+                processed_query_data
+            )
 
         final_query = enhanced_query if enhanced_query.strip() else query
 
@@ -111,30 +197,42 @@ class InformationRetrievalSystem:
         )
 
         model_name = self.model._modules["0"].auto_model.config.name_or_path
-        cached_query_embedding = self.cache.get_embedding(final_query, model_name)
+        with self.metrics.timer("cache_lookup"):
+            cached_query_embedding = self.cache.get_embedding(final_query, model_name)
+        self.metrics.record_cache_lookup(
+            "query_embedding", cached_query_embedding is not None
+        )
 
         if cached_query_embedding is not None:
             print(f"{Fore.GREEN}🚀 Query embedding found in cache!{Style.RESET_ALL}")
             query_embedding = cached_query_embedding
         else:
             print(f"{Fore.YELLOW}🔄 Computing query embedding...{Style.RESET_ALL}")
-            query_embedding = self.model.encode([final_query], convert_to_numpy=True)[0]
+            with self.metrics.timer("encoding"):
+                query_embedding = self.model.encode(
+                    [final_query], convert_to_numpy=True
+                )[0]
             self.cache.store_embedding(final_query, model_name, query_embedding)
             print(f"{Fore.GREEN}💾 Query embedding saved to cache{Style.RESET_ALL}")
 
-        similarities = self._calculate_similarities(query_embedding)
+        if self.projection is not None:
+            query_embedding = self.projection.transform(query_embedding)
 
-        similarities = self._apply_query_processing_boost(
-            similarities, processed_query_data
-        )
+        with self.metrics.timer("scoring"):
+            similarities = self._calculate_similarities(query_embedding)
+
+        with self.metrics.timer("boosting"):
+            similarities = self._apply_query_processing_boost(
+                similarities, processed_query_data
+            )
 
-        ranked_indices = np.argsort(similarities)[::-1]
+        with self.metrics.timer("top_k"):
+            ranked_indices = np.argsort(similarities)[::-1].astype(np.int32)
+            scores = similarities[ranked_indices]
 
-        results = []
-        for i in ranked_indices[:top_k]:
-            results.append((self.documents[i], float(similarities[i])))
+        self.ranking_cache.store(query, ranked_indices, scores)
 
-        return results
+        return ranked_indices, scores
 
     def retrieve_similar_documents(
         self, doc_index: int, top_k: int = 10
@@ -155,13 +253,16 @@ class InformationRetrievalSystem:
         )
 
         doc_embedding = self.document_embeddings[doc_index]
-        similarities = self._calculate_similarities(doc_embedding)
+        with self.metrics.timer("scoring"):
+            similarities = self._calculate_similarities(doc_embedding)
         similarities[doc_index] = -1
-        ranked_indices = np.argsort(similarities)[::-1]
 
-        results = []
-        for i in ranked_indices[:top_k]:
-            results.append((self.documents[i], float(similarities[i])))
+        with self.metrics.timer("top_k"):
+            ranked_indices = np.argsort(similarities)[::-1]
+
+            results = []
+            for i in ranked_indices[:top_k]:
+                results.append((self.documents[i], float(similarities[i])))
 
         return results
 
@@ -182,27 +283,25 @@ class InformationRetrievalSystem:
         if not query_keywords:
             return similarities
 
-        boosted_similarities = similarities.copy()
+        keyword_matches = np.zeros(len(similarities), dtype=np.int32)
+        title_matches = np.zeros(len(similarities), dtype=np.int32)
 
-        for i, doc in enumerate(self.documents):
-            boost_factor = 1.0
+        for token in query_keywords:
+            matching_documents = self.keyword_index.get(token)
+            if matching_documents is not None:
+                keyword_matches[matching_documents] += 1
 
-            doc_keywords = [kw.lower().strip() for kw in doc.get("keywords", [])]
-            keyword_matches = sum(
-                1 for token in query_keywords if token in doc_keywords
+            title_matches += np.fromiter(
+                (token in title for title in self.lower_titles),
+                dtype=bool,
+                count=len(self.lower_titles),
             )
-            if keyword_matches > 0:
-                boost_factor += 0.1 * keyword_matches
-
-            doc_title = doc.get("title", "").lower()
-            title_matches = sum(1 for token in query_keywords if token in doc_title)
-            if title_matches > 0:
-                boost_factor += 0.15 * title_matches
 
-            boost_factor = min(boost_factor, 1.5)
-            boosted_similarities[i] *= boost_factor
+        boost_factors = 1.0 + 0.1 * keyword_matches
+        boost_factors += 0.15 * title_matches
+        boost_factors = np.minimum(boost_factors, 1.5)
 
-        return boosted_similarities
+        return similarities * boost_factors.astype(similarities.dtype)
 
     def search_and_display(self, query: str, top_k: int = 5) -> None:
         results = self.retrieve(query, top_k)
@@ -297,24 +396,26 @@ class InformationRetrievalSystem:
         except ValueError as e:
             print(f"{Fore.RED}Error: {e}{Style.RESET_ALL}")
 
+    def suggest(self, query: str, limit: int = 8) -> List[Dict[str, Any]]:
+        with self.metrics.timer("suggest"):
+            return self.suggester.suggest(query, limit=limit)
+
     def get_cache_stats(self) -> Dict[str, Any]:
-        return self.cache.get_cache_stats()
+        cache_stats = self.cache.get_cache_stats()
+        cache_stats.update(self.ranking_cache.get_cache_stats())
+        return cache_stats
 
     def clear_cache(self) -> None:
         self.cache.clear_cache()
+        self.ranking_cache.clear()
         print(f"{Fore.GREEN}Cache cleared!{Style.RESET_ALL}")
 
     def get_document_by_id(self, doc_id: str) -> Dict[str, Any]:
-        for doc in self.documents:
-            if doc.get("id") == doc_id:
-                return doc
-        return None
+        doc_index = self.get_document_index(doc_id)
+        return self.documents[doc_index] if doc_index != -1 else None
 
     def get_document_index(self, doc_id: str) -> int:
-        for idx, doc in enumerate(self.documents):
-            if doc.get("id") == doc_id:
-                return idx
-        return -1
+        return self.id_index.get(doc_id, -1)
 
 
 def main():
@@ -1,20 +1,162 @@
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.cluster import MiniBatchKMeans
-from typing import List, Dict, Any, Tuple
-import random
-from collections import defaultdict
+from multiprocessing.shared_memory import SharedMemory
+from typing import List, Dict, Any, Tuple, Optional, Iterator
+import numpy as np
+from scipy.sparse import csr_matrix
+from config import SIMILARITY_WORKERS, TFIDF_STREAMING
+from utils import parallel_map_chunks, resolve_workers
+from training_pairs import TrainingPairs, pair_keys
+from streaming_tfidf import StreamingTfidfVectorizer, iter_text_chunks
 from colorama import Fore, Style, init
 
 init(autoreset=True)
 
 
+def threshold_similarity_block(
+    vectors_i, vectors_j, offset_i: int, offset_j: int, min_similarity: float
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # TF-IDF rows are L2-normalised, so the sparse product is the cosine
+    # similarity; only pairs above the threshold and above the diagonal are
+    # returned, in row-major order.
+    block = (vectors_i @ vectors_j.T).tocoo()
+
+    rows = block.row.astype(np.int64) + offset_i
+    cols = block.col.astype(np.int64) + offset_j
+    scores = block.data
+
+    mask = (scores > min_similarity) & (rows < cols)
+    rows, cols, scores = rows[mask], cols[mask], scores[mask]
+
+    order = np.lexsort((cols, rows))
+    return rows[order], cols[order], scores[order]
+
+
+def incidence_matrix(item_sets: List[set]) -> Tuple[csr_matrix, np.ndarray]:
+    vocabulary: Dict[str, int] = {}
+    indices = []
+    indptr = [0]
+    for items in item_sets:
+        indices.extend(vocabulary.setdefault(item, len(vocabulary)) for item in items)
+        indptr.append(len(indices))
+
+    matrix = csr_matrix(
+        (np.ones(len(indices), dtype=np.int32), indices, indptr),
+        shape=(len(item_sets), max(len(vocabulary), 1)),
+    )
+    return matrix, np.diff(matrix.indptr)
+
+
+def rowwise_cosine(vectors, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+    # Rows are L2-normalised, so the row-wise dot product is the cosine.
+    if len(rows) == 0:
+        return np.zeros(0, dtype=np.float64)
+    return np.asarray(vectors[rows].multiply(vectors[cols]).sum(axis=1)).ravel()
+
+
+def batch_jaccard(
+    matrix: csr_matrix, counts: np.ndarray, rows: np.ndarray, cols: np.ndarray
+) -> np.ndarray:
+    # Intersections come from the row-wise product of the binary incidence
+    # rows, unions from the row counts; pairs where either set is empty
+    # contribute nothing.
+    similarity = np.zeros(len(rows), dtype=np.float64)
+    if len(rows) == 0:
+        return similarity
+
+    intersection = np.asarray(matrix[rows].multiply(matrix[cols]).sum(axis=1)).ravel()
+    union = counts[rows] + counts[cols] - intersection
+
+    both = (counts[rows] > 0) & (counts[cols] > 0)
+    similarity[both] = intersection[both] / union[both]
+    return similarity
+
+
+def csr_arrays(prefix: str, matrix) -> Dict[str, np.ndarray]:
+    matrix = csr_matrix(matrix)
+    return {
+        f"{prefix}.data": matrix.data,
+        f"{prefix}.indices": matrix.indices,
+        f"{prefix}.indptr": matrix.indptr,
+    }
+
+
+def share_arrays(
+    arrays: Dict[str, np.ndarray]
+) -> Tuple[List[SharedMemory], Dict[str, Tuple[str, str, Tuple[int, ...]]]]:
+    handles, specs = [], {}
+    for name, array in arrays.items():
+        handle = SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=handle.buf)[...] = array
+        handles.append(handle)
+        specs[name] = (handle.name, array.dtype.str, array.shape)
+    return handles, specs
+
+
+_block_worker = {}
+
+
+def _init_block_worker(
+    specs: Dict[str, Tuple[str, str, Tuple[int, ...]]],
+    shapes: Dict[str, Tuple[int, int]],
+) -> None:
+    handles, arrays = [], {}
+    for name, (shm_name, dtype, shape) in specs.items():
+        handle = SharedMemory(name=shm_name)
+        handles.append(handle)
+        arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=handle.buf)
+
+    def attach(prefix: str) -> csr_matrix:
+        return csr_matrix(
+            (
+                arrays[f"{prefix}.data"],
+                arrays[f"{prefix}.indices"],
+                arrays[f"{prefix}.indptr"],
+            ),
+            shape=shapes[prefix],
+            copy=False,
+        )
+
+    calculator = SimilarityCalculator(workers=1)
+    calculator.document_vectors = attach("vectors")
+    calculator.subject_matrix = attach("subjects")
+    calculator.keyword_matrix = attach("keywords")
+    calculator.subject_counts = arrays["subject_counts"]
+    calculator.keyword_counts = arrays["keyword_counts"]
+
+    _block_worker["handles"] = handles
+    _block_worker["calculator"] = calculator
+
+
+def score_block_chunk(
+    blocks: List[Tuple[int, int, int, int]]
+) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+    calculator = _block_worker["calculator"]
+    return [calculator._score_block(block) for block in blocks]
+
+
 class SimilarityCalculator:
-    def __init__(self, sample_ratio=0.1, use_clustering=True, n_clusters=50):
+    def __init__(
+        self,
+        sample_ratio=0.1,
+        use_clustering=True,
+        n_clusters=50,
+        max_pairs_per_document: Optional[int] = None,
+        random_state: int = 2025,
+        workers: Optional[int] = SIMILARITY_WORKERS,
+        streaming_tfidf: bool = TFIDF_STREAMING,
+    ):
         self.sample_ratio = sample_ratio
         self.use_clustering = use_clustering
         self.n_clusters = n_clusters
-        self.tfidf_vectorizer = TfidfVectorizer(
+        self.max_pairs_per_document = max_pairs_per_document
+        self.rng = np.random.default_rng(random_state)
+        self.workers = resolve_workers(workers)
+        self.streaming_tfidf = streaming_tfidf
+        vectorizer_class = (
+            StreamingTfidfVectorizer if streaming_tfidf else TfidfVectorizer
+        )
+        self.tfidf_vectorizer = vectorizer_class(
             max_features=5000,
             stop_words="english",
             ngram_range=(1, 2),
@@ -23,33 +165,50 @@ class SimilarityCalculator:
         )
         self.document_vectors = None
         self.clusters = None
+        self.subject_matrix = None
+        self.subject_counts = None
+        self.keyword_matrix = None
+        self.keyword_counts = None
 
     def create_training_collection(
         self, documents: List[Dict[str, Any]]
-    ) -> List[Tuple[str, str, float]]:
+    ) -> TrainingPairs:
         print(
             f"{Fore.CYAN}Processing similarity calculation for {len(documents)} documents...{Style.RESET_ALL}"
         )
 
-        abstracts = [doc.get("abstract", "") for doc in documents]
-        print(f"{Fore.YELLOW}Creating TF-IDF vectors...{Style.RESET_ALL}")
-        self.document_vectors = self.tfidf_vectorizer.fit_transform(abstracts)
-
-        training_pairs = []
+        self.prepare(documents)
 
         if self.use_clustering and len(documents) > 1000:
-            training_pairs = self._clustering_based_sampling(documents)
+            rows, cols, similarities = self._clustering_based_sampling(documents)
         else:
-            training_pairs = self._smart_sampling(documents)
+            rows, cols, similarities = self._smart_sampling(documents)
+
+        training_pairs = TrainingPairs(documents, rows, cols, similarities)
 
         print(
             f"{Fore.GREEN}Generated {len(training_pairs)} training pairs{Style.RESET_ALL}"
         )
         return training_pairs
 
+    def prepare(self, documents: List[Dict[str, Any]]) -> None:
+        print(f"{Fore.YELLOW}Creating TF-IDF vectors...{Style.RESET_ALL}")
+        if self.streaming_tfidf:
+            self.document_vectors = self.tfidf_vectorizer.fit_transform_chunks(
+                lambda: iter_text_chunks(documents)
+            )
+        else:
+            abstracts = [doc.get("abstract", "") for doc in documents]
+            self.document_vectors = self.tfidf_vectorizer.fit_transform(abstracts)
+        self._build_metadata_matrices(documents)
+
+    def score_pairs(self, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        tfidf_similarities = rowwise_cosine(self.document_vectors, rows, cols)
+        return self._enhance_similarities(rows, cols, tfidf_similarities)
+
     def _clustering_based_sampling(
         self, documents: List[Dict[str, Any]]
-    ) -> List[Tuple[str, str, float]]:
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
         print(
             f"{Fore.MAGENTA}Using clustering-based sampling with {self.n_clusters} clusters...{Style.RESET_ALL}"
         )
@@ -59,150 +218,217 @@ class SimilarityCalculator:
         )
         cluster_labels = kmeans.fit_predict(self.document_vectors)
 
-        clusters = defaultdict(list)
-        for idx, label in enumerate(cluster_labels):
-            clusters[label].append(idx)
-
-        training_pairs = []
+        cluster_order = np.argsort(cluster_labels, kind="stable")
+        cluster_ids, cluster_starts, cluster_sizes = np.unique(
+            cluster_labels[cluster_order], return_index=True, return_counts=True
+        )
 
-        for cluster_id, doc_indices in clusters.items():
-            if len(doc_indices) < 2:
+        # Intra-cluster pairs: min(2m, 100) random draws per cluster, with
+        # repeated pairs dropped, all scored together as index arrays.
+        first_parts, second_parts = [], []
+        for start, size in zip(cluster_starts.tolist(), cluster_sizes.tolist()):
+            if size < 2:
                 continue
-
-            n_pairs = min(len(doc_indices) * 2, 100)
-            for _ in range(n_pairs):
-                if len(doc_indices) >= 2:
-                    idx1, idx2 = random.sample(doc_indices, 2)
-                    similarity = self._calculate_fast_similarity(
-                        documents[idx1], documents[idx2], idx1, idx2
-                    )
-                    if similarity > 0.3:
-                        training_pairs.append(
-                            (
-                                documents[idx1]["abstract"],
-                                documents[idx2]["abstract"],
-                                similarity,
-                            )
-                        )
-
-        cluster_ids = list(clusters.keys())
-        for _ in range(len(training_pairs) // 3):
-            if len(cluster_ids) >= 2:
-                cluster1, cluster2 = random.sample(cluster_ids, 2)
-                if clusters[cluster1] and clusters[cluster2]:
-                    idx1 = random.choice(clusters[cluster1])
-                    idx2 = random.choice(clusters[cluster2])
-                    similarity = self._calculate_fast_similarity(
-                        documents[idx1], documents[idx2], idx1, idx2
-                    )
-                    training_pairs.append(
-                        (
-                            documents[idx1]["abstract"],
-                            documents[idx2]["abstract"],
-                            similarity,
-                        )
-                    )
-
-        return training_pairs
+            members = cluster_order[start : start + size]
+            first, second = self._sample_distinct(size, min(size * 2, 100))
+            _, unique = np.unique(pair_keys(first, second, size), return_index=True)
+            unique.sort()
+            first, second = first[unique], second[unique]
+            first_parts.append(members[first])
+            second_parts.append(members[second])
+
+        pairs = []
+        if first_parts:
+            rows = np.concatenate(first_parts)
+            cols = np.concatenate(second_parts)
+            similarities = self.score_pairs(rows, cols)
+            keep = similarities > 0.3
+            pairs.append((rows[keep], cols[keep], similarities[keep]))
+
+        # Cross-cluster pairs: one random document from each of two distinct
+        # clusters, as many as a third of the intra-cluster pairs.
+        n_cross = len(pairs[0][0]) // 3 if pairs else 0
+        if n_cross and len(cluster_ids) >= 2:
+            cluster1, cluster2 = self._sample_distinct(len(cluster_ids), n_cross)
+            rows = cluster_order[
+                cluster_starts[cluster1]
+                + self.rng.integers(0, cluster_sizes[cluster1])
+            ]
+            cols = cluster_order[
+                cluster_starts[cluster2]
+                + self.rng.integers(0, cluster_sizes[cluster2])
+            ]
+            pairs.append((rows, cols, self.score_pairs(rows, cols)))
+
+        return self._concatenate_pairs(pairs)
+
+    def _sample_distinct(self, size: int, count: int) -> Tuple[np.ndarray, np.ndarray]:
+        first = self.rng.integers(0, size, count)
+        second = self.rng.integers(0, size - 1, count)
+        second += second >= first
+        return first, second
+
+    def _concatenate_pairs(
+        self, pairs: List[Tuple[np.ndarray, np.ndarray, np.ndarray]]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        if not pairs:
+            return (
+                np.zeros(0, dtype=np.int64),
+                np.zeros(0, dtype=np.int64),
+                np.zeros(0, dtype=np.float64),
+            )
+        rows, cols, similarities = zip(*pairs)
+        return np.concatenate(rows), np.concatenate(cols), np.concatenate(similarities)
 
     def _smart_sampling(
         self, documents: List[Dict[str, Any]]
-    ) -> List[Tuple[str, str, float]]:
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
         print(f"{Fore.BLUE}Using smart sampling strategy...{Style.RESET_ALL}")
 
         n_docs = len(documents)
         max_pairs = int(n_docs * self.sample_ratio * n_docs)
 
-        training_pairs = []
+        pairs = []
+        n_pairs = 0
+        pairs_per_document = np.zeros(n_docs, dtype=np.int32)
 
         batch_size = 1000
-        for i in range(0, n_docs, batch_size):
-            end_i = min(i + batch_size, n_docs)
-            batch_vectors_i = self.document_vectors[i:end_i]
-
-            for j in range(i, n_docs, batch_size):
-                end_j = min(j + batch_size, n_docs)
-                batch_vectors_j = self.document_vectors[j:end_j]
-
-                similarity_matrix = cosine_similarity(batch_vectors_i, batch_vectors_j)
-
-                for local_i in range(similarity_matrix.shape[0]):
-                    start_j = 0 if j > i else local_i + 1
-                    for local_j in range(start_j, similarity_matrix.shape[1]):
-                        global_i = i + local_i
-                        global_j = j + local_j
-
-                        if global_i >= global_j:
-                            continue
-
-                        tfidf_sim = similarity_matrix[local_i, local_j]
-
-                        if tfidf_sim > 0.1:
-                            enhanced_sim = self._enhance_similarity(
-                                documents[global_i], documents[global_j], tfidf_sim
-                            )
-
-                            if enhanced_sim > 0.2:
-                                training_pairs.append(
-                                    (
-                                        documents[global_i]["abstract"],
-                                        documents[global_j]["abstract"],
-                                        enhanced_sim,
-                                    )
-                                )
-
-                if len(training_pairs) >= max_pairs:
-                    return training_pairs[:max_pairs]
-
-        return training_pairs
-
-    def _calculate_fast_similarity(
-        self, doc1: Dict[str, Any], doc2: Dict[str, Any], idx1: int, idx2: int
-    ) -> float:
-        tfidf_sim = cosine_similarity(
-            self.document_vectors[idx1 : idx1 + 1],
-            self.document_vectors[idx2 : idx2 + 1],
-        )[0, 0]
-
-        return self._enhance_similarity(doc1, doc2, tfidf_sim)
+        blocks = [
+            (i, min(i + batch_size, n_docs), j, min(j + batch_size, n_docs))
+            for i in range(0, n_docs, batch_size)
+            for j in range(i, n_docs, batch_size)
+        ]
 
-    def _enhance_similarity(
-        self, doc1: Dict[str, Any], doc2: Dict[str, Any], base_similarity: float
-    ) -> float:
-        enhancements = []
+        # Blocks are merged strictly in grid order, so quotas, max_pairs and
+        # the resulting pairs do not depend on the number of workers.
+        for rows, cols, scores, enhanced in self._iter_scored_blocks(blocks):
+            # Only pairs that pass the threshold compete for, and use up, a
+            # document's quota.
+            eligible = enhanced > 0.2
+            rows, cols = rows[eligible], cols[eligible]
+            scores, enhanced = scores[eligible], enhanced[eligible]
+            keep = self._within_document_quota(rows, scores, pairs_per_document)
+
+            pairs.append((rows[keep], cols[keep], enhanced[keep]))
+            n_pairs += int(keep.sum())
+
+            if n_pairs >= max_pairs:
+                rows, cols, similarities = self._concatenate_pairs(pairs)
+                return rows[:max_pairs], cols[:max_pairs], similarities[:max_pairs]
+
+        return self._concatenate_pairs(pairs)
+
+    def _iter_scored_blocks(
+        self, blocks: List[Tuple[int, int, int, int]]
+    ) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+        workers = min(self.workers, len(blocks))
+        if workers <= 1:
+            for block in blocks:
+                yield self._score_block(block)
+            return
 
-        subjects1 = set(
-            s.lower()
-            for s in doc1.get("subjects_udc", []) + doc1.get("subjects_fos", [])
+        print(
+            f"{Fore.BLUE}Scoring {len(blocks)} similarity blocks on {workers} processes...{Style.RESET_ALL}"
+        )
+        handles, specs = share_arrays(
+            {
+                **csr_arrays("vectors", self.document_vectors),
+                **csr_arrays("subjects", self.subject_matrix),
+                **csr_arrays("keywords", self.keyword_matrix),
+                "subject_counts": self.subject_counts,
+                "keyword_counts": self.keyword_counts,
+            }
         )
-        subjects2 = set(
-            s.lower()
-            for s in doc2.get("subjects_udc", []) + doc2.get("subjects_fos", [])
+        shapes = {
+            "vectors": self.document_vectors.shape,
+            "subjects": self.subject_matrix.shape,
+            "keywords": self.keyword_matrix.shape,
+        }
+
+        try:
+            for results in parallel_map_chunks(
+                score_block_chunk,
+                blocks,
+                1,
+                workers,
+                initializer=_init_block_worker,
+                initargs=(specs, shapes),
+            ):
+                yield from results
+        finally:
+            for handle in handles:
+                handle.close()
+                handle.unlink()
+
+    def _score_block(
+        self, block: Tuple[int, int, int, int]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        i, end_i, j, end_j = block
+        rows, cols, scores = threshold_similarity_block(
+            self.document_vectors[i:end_i], self.document_vectors[j:end_j], i, j, 0.1
+        )
+        return rows, cols, scores, self._enhance_similarities(rows, cols, scores)
+
+    def _within_document_quota(
+        self, rows: np.ndarray, scores: np.ndarray, pairs_per_document: np.ndarray
+    ) -> np.ndarray:
+        keep = np.ones(len(rows), dtype=bool)
+        if self.max_pairs_per_document is None or len(rows) == 0:
+            return keep
+
+        # Keep each document's strongest candidates, up to what is left of
+        # its quota from earlier blocks.
+        order = np.lexsort((-scores, rows))
+        sorted_rows = rows[order]
+
+        row_starts = np.flatnonzero(np.r_[True, sorted_rows[1:] != sorted_rows[:-1]])
+        row_lengths = np.diff(np.r_[row_starts, len(rows)])
+        rank_in_row = np.arange(len(rows)) - np.repeat(row_starts, row_lengths)
+        keep[order] = (
+            rank_in_row < self.max_pairs_per_document - pairs_per_document[sorted_rows]
         )
 
-        if subjects1 and subjects2:
-            subject_sim = len(subjects1.intersection(subjects2)) / len(
-                subjects1.union(subjects2)
+        np.add.at(pairs_per_document, rows[keep], 1)
+        return keep
+
+    def _build_metadata_matrices(self, documents: List[Dict[str, Any]]) -> None:
+        subject_sets, keyword_sets = [], []
+        for doc in documents:
+            subject_sets.append(
+                set(
+                    s.lower()
+                    for s in doc.get("subjects_udc", []) + doc.get("subjects_fos", [])
+                )
             )
-            enhancements.append(subject_sim * 0.3)
+            keyword_sets.append(set(kw.lower() for kw in doc.get("keywords", [])))
 
-        keywords1 = set(kw.lower() for kw in doc1.get("keywords", []))
-        keywords2 = set(kw.lower() for kw in doc2.get("keywords", []))
+        self.subject_matrix, self.subject_counts = incidence_matrix(subject_sets)
+        self.keyword_matrix, self.keyword_counts = incidence_matrix(keyword_sets)
 
-        if keywords1 and keywords2:
-            keyword_sim = len(keywords1.intersection(keywords2)) / len(
-                keywords1.union(keywords2)
-            )
-            enhancements.append(keyword_sim * 0.2)
+    def _enhance_similarities(
+        self, rows: np.ndarray, cols: np.ndarray, base_similarities: np.ndarray
+    ) -> np.ndarray:
+        # Subject and keyword Jaccard for arrays of (row, col) pairs.
+        subject_sim = batch_jaccard(
+            self.subject_matrix, self.subject_counts, rows, cols
+        )
+        keyword_sim = batch_jaccard(
+            self.keyword_matrix, self.keyword_counts, rows, cols
+        )
 
-        total_enhancement = sum(enhancements)
-        final_similarity = base_similarity * 0.7 + total_enhancement
+        total_enhancement = subject_sim * 0.3 + keyword_sim * 0.2
+        final_similarity = base_similarities * 0.7 + total_enhancement
 
-        return min(1.0, final_similarity)
+        return np.minimum(1.0, final_similarity)
 
     def save_training_data(
-        self, training_pairs: List[Tuple[str, str, float]], filepath: str
+        self, training_pairs: TrainingPairs, filepath: str
     ) -> None:
+        if filepath.endswith(".npz"):
+            training_pairs.save(filepath)
+            print(f"{Fore.GREEN}Training pairs saved to: {filepath}{Style.RESET_ALL}")
+            return
+
         training_data = [
             {"text1": pair[0], "text2": pair[1], "similarity": pair[2]}
             for pair in training_pairs
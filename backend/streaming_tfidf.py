@@ -0,0 +1,129 @@
+from typing import List, Iterable, Iterator, Callable, Optional
+import numpy as np
+from scipy.sparse import csr_matrix, vstack
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+from config import TFIDF_HASH_FEATURES, TFIDF_CHUNK_SIZE
+from colorama import Fore, Style, init
+
+init(autoreset=True)
+
+
+class StreamingTfidfVectorizer:
+    """TF-IDF over hashed n-grams, fitted one chunk of texts at a time.
+
+    Only per-feature document and term counts are accumulated, so memory does
+    not grow with the vocabulary or the collection. min_df, max_df and
+    max_features follow TfidfVectorizer, and the kept features are remapped to
+    contiguous columns.
+    """
+
+    def __init__(
+        self,
+        max_features: Optional[int] = 5000,
+        stop_words: Optional[str] = "english",
+        ngram_range=(1, 2),
+        min_df: int = 2,
+        max_df: float = 0.8,
+        n_features: int = TFIDF_HASH_FEATURES,
+    ):
+        self.max_features = max_features
+        self.min_df = min_df
+        self.max_df = max_df
+        self.n_features = n_features
+        self.hasher = HashingVectorizer(
+            n_features=n_features,
+            stop_words=stop_words,
+            ngram_range=ngram_range,
+            alternate_sign=False,
+            norm=None,
+        )
+        self.reset()
+
+    def reset(self) -> None:
+        self.n_documents = 0
+        self.document_frequency = np.zeros(self.n_features, dtype=np.int64)
+        self.term_frequency = np.zeros(self.n_features, dtype=np.float64)
+        self.columns = None
+        self.idf_ = None
+
+    def partial_fit(self, texts: List[str]) -> "StreamingTfidfVectorizer":
+        counts = self.hasher.transform(texts)
+        self.document_frequency += np.bincount(
+            counts.indices, minlength=self.n_features
+        )
+        self.term_frequency += np.bincount(
+            counts.indices, weights=counts.data, minlength=self.n_features
+        )
+        self.n_documents += len(texts)
+        self.columns = None
+        return self
+
+    def finalize(self) -> "StreamingTfidfVectorizer":
+        max_doc_count = (
+            self.max_df
+            if isinstance(self.max_df, int)
+            else self.max_df * self.n_documents
+        )
+        if max_doc_count < self.min_df:
+            raise ValueError("max_df corresponds to < documents than min_df")
+
+        df = self.document_frequency
+        columns = np.flatnonzero((df >= self.min_df) & (df <= max_doc_count))
+        if self.max_features is not None and len(columns) > self.max_features:
+            order = np.argsort(-self.term_frequency[columns], kind="stable")
+            columns = np.sort(columns[order[: self.max_features]])
+        if len(columns) == 0:
+            raise ValueError(
+                "After pruning, no terms remain. Try a lower min_df or a higher max_df."
+            )
+
+        # Smoothed idf, as in TfidfTransformer(smooth_idf=True).
+        self.columns = columns
+        self.idf_ = np.log((1 + self.n_documents) / (1 + df[columns])) + 1
+        return self
+
+    def transform(self, texts: List[str]) -> csr_matrix:
+        if self.columns is None:
+            self.finalize()
+
+        counts = self.hasher.transform(texts)[:, self.columns]
+        return normalize(counts.multiply(self.idf_).tocsr(), norm="l2", copy=False)
+
+    def fit_chunks(self, chunks: Iterable[List[str]]) -> "StreamingTfidfVectorizer":
+        self.reset()
+        for chunk in chunks:
+            self.partial_fit(chunk)
+        return self.finalize()
+
+    def fit_transform_chunks(
+        self, make_chunks: Callable[[], Iterable[List[str]]]
+    ) -> csr_matrix:
+        # Two passes over the source: document frequencies first, then the
+        # weighted rows, so only one chunk of texts is held at a time.
+        self.fit_chunks(make_chunks())
+
+        blocks = []
+        processed = 0
+        for chunk in make_chunks():
+            blocks.append(self.transform(chunk))
+            processed += len(chunk)
+            print(
+                f"{Fore.BLUE}Vectorised {processed}/{self.n_documents} documents...{Style.RESET_ALL}"
+            )
+
+        if not blocks:
+            return csr_matrix((0, len(self.columns)), dtype=np.float64)
+        return vstack(blocks, format="csr")
+
+
+def iter_text_chunks(
+    documents, field: str = "abstract", chunk_size: int = TFIDF_CHUNK_SIZE
+) -> Iterator[List[str]]:
+    # A CollectionStore decodes just the requested field from its mmap.
+    for start in range(0, len(documents), chunk_size):
+        end = min(start + chunk_size, len(documents))
+        if hasattr(documents, "get_field"):
+            yield [documents.get_field(index, field) or "" for index in range(start, end)]
+        else:
+            yield [documents[index].get(field, "") for index in range(start, end)]
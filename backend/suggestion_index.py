@@ -0,0 +1,128 @@
+import time
+import unicodedata
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from heapq import nsmallest
+from typing import List, Dict, Any, Tuple
+import numpy as np
+from colorama import Fore, Style, init
+
+init(autoreset=True)
+
+SUGGESTION_FIELDS = (
+    ("title", "title"),
+    ("keywords", "keyword"),
+    ("authors", "author"),
+)
+HOT_PREFIX_LENGTH = 3
+HOT_PREFIX_LIMIT = 20
+
+
+def normalize_for_prefix(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(text.split())
+
+
+class PrefixSuggester:
+    def __init__(self):
+        self.texts: List[str] = []
+        self.kinds: List[str] = []
+        self.counts = np.zeros(0, dtype=np.int32)
+        self.keys: List[str] = []
+        self.key_entries = np.zeros(0, dtype=np.int32)
+        self.hot_prefixes: Dict[str, List[int]] = {}
+
+    @classmethod
+    def from_documents(cls, documents) -> "PrefixSuggester":
+        suggester = cls()
+        suggester.build(documents)
+        return suggester
+
+    def build(self, documents) -> None:
+        start = time.perf_counter()
+
+        # Case and accent variants count as one entry, shown in its most
+        # frequent surface form.
+        frequencies = Counter()
+        surface_forms = defaultdict(Counter)
+        for doc in documents:
+            seen = set()
+            for field, kind in SUGGESTION_FIELDS:
+                values = doc.get(field) or []
+                if isinstance(values, str):
+                    values = [values]
+                for value in values:
+                    value = " ".join(value.split())
+                    key = (normalize_for_prefix(value), kind)
+                    if value and key not in seen:
+                        seen.add(key)
+                        frequencies[key] += 1
+                        surface_forms[key][value] += 1
+
+        entries = sorted(
+            (
+                ((surface_forms[key].most_common(1)[0][0], key[1]), count)
+                for key, count in frequencies.items()
+            ),
+            key=lambda item: (-item[1], item[0]),
+        )
+        self.texts = [text for (text, _), _ in entries]
+        self.kinds = [kind for (_, kind), _ in entries]
+        self.counts = np.array([count for _, count in entries], dtype=np.int32)
+
+        # Every word boundary is indexed so "learning" also completes
+        # "Machine learning"; entry ids are already ordered by frequency.
+        index_keys: List[Tuple[str, int]] = []
+        for entry_id, text in enumerate(self.texts):
+            words = normalize_for_prefix(text).split(" ")
+            for position in range(len(words)):
+                index_keys.append((" ".join(words[position:]), entry_id))
+
+        index_keys.sort()
+        self.keys = [key for key, _ in index_keys]
+        self.key_entries = np.array(
+            [entry_id for _, entry_id in index_keys], dtype=np.int32
+        )
+
+        hot_candidates = defaultdict(set)
+        for key, entry_id in index_keys:
+            for length in range(1, min(HOT_PREFIX_LENGTH, len(key)) + 1):
+                hot_candidates[key[:length]].add(entry_id)
+        self.hot_prefixes = {
+            prefix: nsmallest(HOT_PREFIX_LIMIT, entry_ids)
+            for prefix, entry_ids in hot_candidates.items()
+        }
+
+        print(
+            f"{Fore.GREEN}Suggestion index built: {len(self.texts)} entries, "
+            f"{len(self.keys)} prefix keys in {time.perf_counter() - start:.2f}s{Style.RESET_ALL}"
+        )
+
+    def suggest(self, query: str, limit: int = 8) -> List[Dict[str, Any]]:
+        prefix = normalize_for_prefix(query)
+        if not prefix:
+            return []
+
+        if len(prefix) <= HOT_PREFIX_LENGTH and limit <= HOT_PREFIX_LIMIT:
+            entry_ids = self.hot_prefixes.get(prefix, [])[:limit]
+        else:
+            lo = bisect_left(self.keys, prefix)
+            hi = bisect_left(self.keys, prefix + "\uffff", lo)
+            entry_ids = nsmallest(limit, set(self.key_entries[lo:hi].tolist()))
+
+        return [
+            {
+                "text": self.texts[entry_id],
+                "type": self.kinds[entry_id],
+                "count": int(self.counts[entry_id]),
+            }
+            for entry_id in entry_ids
+        ]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "suggestion_entries": len(self.texts),
+            "suggestion_keys": len(self.keys),
+            "hot_prefixes": len(self.hot_prefixes),
+        }
@@ -0,0 +1,458 @@
+import hashlib
+import os
+import resource
+import time
+from typing import List, Dict, Any, Iterable, Iterator, Optional
+import numpy as np
+import torch
+from transformers import get_linear_schedule_with_warmup
+from config import TOKEN_CACHE_DIR, BUCKET_BATCHES, CHECKPOINT_STEPS, TELEMETRY_STEPS
+from training_pairs import index_pair_texts
+from utils import ensure_dir
+from colorama import Fore, Style, init
+
+init(autoreset=True)
+
+TOKENIZE_CHUNK_SIZE = 1000
+
+
+class TokenizedPairs:
+    """Training pairs as indices into a table of texts tokenised once."""
+
+    def __init__(
+        self,
+        token_ids: np.ndarray,
+        offsets: np.ndarray,
+        first: np.ndarray,
+        second: np.ndarray,
+        labels: np.ndarray,
+        cache_key: str = "",
+    ):
+        self.token_ids = token_ids
+        self.offsets = offsets
+        self.labels = labels
+        self.cache_key = cache_key
+        self.text_lengths = np.diff(offsets)
+
+        # CosineSimilarityLoss is symmetric, so each pair is oriented with the
+        # longer text first; sorting by (first, second) length then keeps
+        # both sides of a batch close in length.
+        swap = self.text_lengths[first] < self.text_lengths[second]
+        self.first = np.where(swap, second, first)
+        self.second = np.where(swap, first, second)
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    @property
+    def pair_lengths(self) -> np.ndarray:
+        return self.text_lengths[self.first] + self.text_lengths[self.second]
+
+    @property
+    def sort_keys(self) -> np.ndarray:
+        longest = int(self.text_lengths.max(initial=0)) + 1
+        return self.text_lengths[self.first] * longest + self.text_lengths[self.second]
+
+    def tokens(self, text_index: int) -> np.ndarray:
+        return self.token_ids[self.offsets[text_index] : self.offsets[text_index + 1]]
+
+
+def build_token_cache(
+    examples: Iterable[Any],
+    tokenizer,
+    max_length: int,
+    cache_dir: str = TOKEN_CACHE_DIR,
+) -> TokenizedPairs:
+    texts, first, second, labels = index_pair_texts(examples)
+
+    # The cache is keyed by the tokenizer, the length limit and the texts, so
+    # a new collection or model never reuses stale token ids.
+    setup = f"{tokenizer.name_or_path}:{max_length}"
+    digest = hashlib.md5(setup.encode())
+    for text in texts:
+        digest.update(text.encode("utf-8"))
+        digest.update(b"\0")
+    cache_key = digest.hexdigest()
+    prefix = hashlib.md5(setup.encode()).hexdigest()[:8]
+    cache_path = os.path.join(cache_dir, f"{prefix}-{cache_key}.npz")
+
+    if os.path.exists(cache_path):
+        with np.load(cache_path) as data:
+            token_ids, offsets = data["token_ids"], data["offsets"]
+        print(
+            f"{Fore.GREEN}Loaded token cache for {len(texts)} texts from {cache_path}{Style.RESET_ALL}"
+        )
+    else:
+        start = time.perf_counter()
+        token_ids, offsets = _tokenize(texts, tokenizer, max_length)
+        ensure_dir(cache_dir)
+        np.savez(cache_path, token_ids=token_ids, offsets=offsets)
+        print(
+            f"{Fore.GREEN}Tokenised {len(texts)} unique texts for {len(labels)} pairs "
+            f"in {time.perf_counter() - start:.2f}s → {cache_path}{Style.RESET_ALL}"
+        )
+        _remove_stale_caches(cache_dir, prefix, cache_path)
+
+    return TokenizedPairs(token_ids, offsets, first, second, labels, cache_key)
+
+
+def _remove_stale_caches(cache_dir: str, prefix: str, current_path: str) -> None:
+    # Only the latest texts for a tokenizer and length are ever reused, so
+    # older entries for the same setup (and unprefixed entries from before
+    # this naming) are removed instead of accumulating.
+    for filename in os.listdir(cache_dir):
+        stem, extension = os.path.splitext(filename)
+        if extension != ".npz":
+            continue
+        if stem.startswith(f"{prefix}-") or "-" not in stem:
+            path = os.path.join(cache_dir, filename)
+            if path != current_path:
+                os.remove(path)
+
+
+def _tokenize(texts: List[str], tokenizer, max_length: int):
+    lengths, parts = [], []
+    for start in range(0, len(texts), TOKENIZE_CHUNK_SIZE):
+        encoded = tokenizer(
+            texts[start : start + TOKENIZE_CHUNK_SIZE],
+            truncation=True,
+            max_length=max_length,
+        )["input_ids"]
+        lengths.extend(len(ids) for ids in encoded)
+        parts.extend(np.asarray(ids, dtype=np.int32) for ids in encoded)
+
+    offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    token_ids = np.concatenate(parts) if parts else np.zeros(0, dtype=np.int32)
+    return token_ids, offsets
+
+
+class LengthBucketBatchSampler:
+    """Shuffled batches of similar-length pairs.
+
+    Pairs are shuffled, split into buckets of bucket_batches batches, sorted
+    by their length key within each bucket and cut into batches; the batch order is then
+    shuffled again. A batch's padding is therefore set by pairs of about the
+    same length rather than by the longest abstract in a random batch.
+    """
+
+    def __init__(
+        self,
+        lengths: np.ndarray,
+        batch_size: int,
+        bucket_batches: int = BUCKET_BATCHES,
+        seed: int = 2025,
+    ):
+        self.lengths = lengths
+        self.batch_size = batch_size
+        self.bucket_batches = bucket_batches
+        self.bucket_size = batch_size * bucket_batches
+        self.seed = seed
+        self.epoch = 0
+
+    def set_epoch(self, epoch: int) -> None:
+        self.epoch = epoch
+
+    def batches(self) -> List[np.ndarray]:
+        rng = np.random.default_rng((self.seed, self.epoch))
+        order = rng.permutation(len(self.lengths))
+
+        batches = []
+        for start in range(0, len(order), self.bucket_size):
+            bucket = order[start : start + self.bucket_size]
+            bucket = bucket[np.argsort(self.lengths[bucket], kind="stable")]
+            batches.extend(
+                bucket[i : i + self.batch_size]
+                for i in range(0, len(bucket), self.batch_size)
+            )
+        return [batches[index] for index in rng.permutation(len(batches))]
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        return iter(self.batches())
+
+    def __len__(self) -> int:
+        full_buckets, rest = divmod(len(self.lengths), self.bucket_size)
+        return full_buckets * self.bucket_batches + -(-rest // self.batch_size)
+
+
+def pad_texts(
+    pairs: TokenizedPairs, text_indices: np.ndarray, pad_token_id: int
+) -> Dict[str, torch.Tensor]:
+    lengths = pairs.text_lengths[text_indices]
+    input_ids = np.full((len(text_indices), lengths.max()), pad_token_id, dtype=np.int64)
+    attention_mask = np.zeros_like(input_ids)
+    for row, text_index in enumerate(text_indices.tolist()):
+        input_ids[row, : lengths[row]] = pairs.tokens(text_index)
+        attention_mask[row, : lengths[row]] = 1
+    return {
+        "input_ids": torch.from_numpy(input_ids),
+        "attention_mask": torch.from_numpy(attention_mask),
+    }
+
+
+def padded_tokens(pairs: TokenizedPairs, batches: Iterable[np.ndarray]) -> int:
+    total = 0
+    for batch in batches:
+        total += len(batch) * (
+            int(pairs.text_lengths[pairs.first[batch]].max())
+            + int(pairs.text_lengths[pairs.second[batch]].max())
+        )
+    return total
+
+
+def padding_report(
+    pairs: TokenizedPairs, sampler: LengthBucketBatchSampler
+) -> Dict[str, Any]:
+    # Tokens the encoder processes per epoch, padding included, with random
+    # batches of the same pairs and with length-bucketed ones.
+    order = np.random.default_rng(sampler.seed).permutation(len(pairs))
+    random_batches = [
+        order[i : i + sampler.batch_size] for i in range(0, len(order), sampler.batch_size)
+    ]
+    real = int(pairs.pair_lengths.sum())
+    random_padded = padded_tokens(pairs, random_batches)
+    bucketed_padded = padded_tokens(pairs, sampler.batches())
+    return {
+        "tokens": real,
+        "random_padded_tokens": random_padded,
+        "bucketed_padded_tokens": bucketed_padded,
+        "reduction": 1 - bucketed_padded / random_padded if random_padded else 0.0,
+    }
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is reported in KiB on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class TrainingTelemetry:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.examples = 0
+        self.tokens = 0
+        self.padded_tokens = 0
+
+    def record(self, examples: int, tokens: int, padded_tokens: int) -> None:
+        self.examples += examples
+        self.tokens += tokens
+        self.padded_tokens += padded_tokens
+
+    def snapshot(self) -> Dict[str, float]:
+        seconds = time.perf_counter() - self.start
+        elapsed = seconds if seconds > 0 else float("inf")
+        return {
+            "seconds": seconds,
+            "examples_per_second": self.examples / elapsed,
+            "tokens_per_second": self.tokens / elapsed,
+            "padded_tokens_per_second": self.padded_tokens / elapsed,
+            "peak_rss_mb": peak_rss_mb(),
+        }
+
+
+class CachedPairTrainer:
+    """Training loop over cached token ids, equivalent to model.fit.
+
+    With a checkpoint_path, model, optimiser, scheduler, RNG and sampler
+    position are saved every checkpoint_steps steps (and whenever the caller
+    asks), and resume() continues from the exact batch where the last run
+    stopped.
+    """
+
+    def __init__(
+        self,
+        model,
+        loss_model: torch.nn.Module,
+        pairs: TokenizedPairs,
+        batch_size: int = 32,
+        epochs: int = 1,
+        learning_rate: float = 2e-5,
+        max_grad_norm: float = 1.0,
+        seed: int = 2025,
+        checkpoint_path: Optional[str] = None,
+        checkpoint_steps: int = CHECKPOINT_STEPS,
+        telemetry_steps: int = TELEMETRY_STEPS,
+    ):
+        self.model = model
+        self.loss_model = loss_model
+        self.pairs = pairs
+        self.max_grad_norm = max_grad_norm
+        self.pad_token_id = model.tokenizer.pad_token_id or 0
+        self.sampler = LengthBucketBatchSampler(pairs.sort_keys, batch_size, seed=seed)
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_steps = checkpoint_steps
+        self.telemetry_steps = telemetry_steps
+        # A checkpoint only resumes the same objective: the loss class and,
+        # for MatryoshkaLoss, its dimensions are part of the setup.
+        loss_setup = type(loss_model).__name__
+        matryoshka_dims = getattr(loss_model, "matryoshka_dims", None)
+        if matryoshka_dims:
+            loss_setup += f"{list(matryoshka_dims)}"
+        self.fingerprint = (
+            f"{pairs.cache_key}:{len(pairs)}:{batch_size}:{epochs}:{seed}:"
+            f"{loss_setup}:{learning_rate}"
+        )
+
+        # Position of the next batch to train, and caller state (e.g. early
+        # stopping) stored alongside it.
+        self.epoch = 0
+        self.step = 0
+        self.global_step = 0
+        self.extra_state: Dict[str, Any] = {}
+
+        # Same optimiser setup as SentenceTransformer.fit: AdamW without
+        # weight decay on biases and LayerNorm, linear warmup over 10% of
+        # the first epoch.
+        no_decay = ("bias", "LayerNorm.bias", "LayerNorm.weight")
+        parameters = list(loss_model.named_parameters())
+        self.optimizer = torch.optim.AdamW(
+            [
+                {
+                    "params": [p for n, p in parameters if not any(nd in n for nd in no_decay)],
+                    "weight_decay": 0.01,
+                },
+                {
+                    "params": [p for n, p in parameters if any(nd in n for nd in no_decay)],
+                    "weight_decay": 0.0,
+                },
+            ],
+            lr=learning_rate,
+        )
+        steps_per_epoch = len(self.sampler)
+        self.scheduler = get_linear_schedule_with_warmup(
+            self.optimizer,
+            num_warmup_steps=int(steps_per_epoch * 0.1),
+            num_training_steps=steps_per_epoch * epochs,
+        )
+
+    def train_epoch(self, epoch: int) -> Dict[str, Any]:
+        device = self.model.device
+        self.loss_model.to(device)
+        self.loss_model.train()
+        if epoch != self.epoch:
+            self.epoch, self.step = epoch, 0
+        self.sampler.set_epoch(epoch)
+
+        telemetry = TrainingTelemetry()
+        total_loss = 0.0
+        batches = self.sampler.batches()
+        first_step = self.step
+        for batch in batches[first_step:]:
+            features = [
+                {
+                    key: value.to(device)
+                    for key, value in pad_texts(
+                        self.pairs, text_indices, self.pad_token_id
+                    ).items()
+                }
+                for text_indices in (self.pairs.first[batch], self.pairs.second[batch])
+            ]
+            labels = torch.from_numpy(self.pairs.labels[batch]).to(device)
+
+            loss_value = self.loss_model(features, labels)
+            loss_value.backward()
+            torch.nn.utils.clip_grad_norm_(
+                self.loss_model.parameters(), self.max_grad_norm
+            )
+            self.optimizer.step()
+            self.scheduler.step()
+            self.optimizer.zero_grad()
+
+            total_loss += loss_value.item()
+            self.step += 1
+            self.global_step += 1
+            telemetry.record(
+                len(batch),
+                int(self.pairs.pair_lengths[batch].sum()),
+                sum(int(f["input_ids"].numel()) for f in features),
+            )
+
+            trained = self.step - first_step
+            if self.step % self.telemetry_steps == 0:
+                stats = telemetry.snapshot()
+                print(
+                    f"{Fore.BLUE}Step {self.step}/{len(batches)} | loss {total_loss / trained:.4f} | "
+                    f"{stats['examples_per_second']:.1f} ex/s | {stats['tokens_per_second']:.0f} tok/s | "
+                    f"peak RSS {stats['peak_rss_mb']:.0f} MB{Style.RESET_ALL}"
+                )
+            if self.checkpoint_path and self.global_step % self.checkpoint_steps == 0:
+                self.save_checkpoint()
+
+        trained = self.step - first_step
+        self.epoch, self.step = epoch + 1, 0
+        return {
+            "epoch": epoch,
+            "steps": trained,
+            "resumed_at_step": first_step,
+            "loss": total_loss / max(trained, 1),
+            **telemetry.snapshot(),
+        }
+
+    def save_checkpoint(self) -> None:
+        state = {
+            "fingerprint": self.fingerprint,
+            "epoch": self.epoch,
+            "step": self.step,
+            "global_step": self.global_step,
+            "model": self.model.state_dict(),
+            "optimizer": self.optimizer.state_dict(),
+            "scheduler": self.scheduler.state_dict(),
+            "sampler": {"seed": self.sampler.seed, "epoch": self.sampler.epoch},
+            "torch_rng": torch.get_rng_state(),
+            "extra": self.extra_state,
+        }
+        ensure_dir(os.path.dirname(self.checkpoint_path))
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        torch.save(state, tmp_path)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def resume(self) -> bool:
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return False
+
+        state = torch.load(self.checkpoint_path, map_location="cpu")
+        if state.get("fingerprint") != self.fingerprint:
+            print(
+                f"{Fore.YELLOW}Ignoring checkpoint from a different training setup: "
+                f"{self.checkpoint_path}{Style.RESET_ALL}"
+            )
+            return False
+
+        self.model.load_state_dict(state["model"])
+        self.optimizer.load_state_dict(state["optimizer"])
+        self.scheduler.load_state_dict(state["scheduler"])
+        self.sampler.seed = state["sampler"]["seed"]
+        self.sampler.set_epoch(state["sampler"]["epoch"])
+        torch.set_rng_state(state["torch_rng"])
+        self.epoch = state["epoch"]
+        self.step = state["step"]
+        self.global_step = state["global_step"]
+        self.extra_state = state["extra"]
+
+        print(
+            f"{Fore.GREEN}Resumed from {self.checkpoint_path}: epoch {self.epoch + 1}, "
+            f"step {self.step} ({self.global_step} steps done){Style.RESET_ALL}"
+        )
+        return True
+
+    def clear_checkpoint(self) -> None:
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+
+def estimate_random_batch_seconds(
+    report: Dict[str, Any], bucketed_seconds: float
+) -> float:
+    # The DataLoader path is not timed; encoder cost is taken as
+    # proportional to padded tokens, which is the proxy for its epoch time.
+    if not report["bucketed_padded_tokens"]:
+        return bucketed_seconds
+    return bucketed_seconds * report["random_padded_tokens"] / report["bucketed_padded_tokens"]
+
+
+def print_padding_report(report: Dict[str, Any]) -> None:
+    print(
+        f"{Fore.MAGENTA}Encoder tokens per epoch: {report['random_padded_tokens']:,} with random "
+        f"batches → {report['bucketed_padded_tokens']:,} length-bucketed "
+        f"({report['reduction']:.1%} less; {report['tokens']:,} real tokens). "
+        f"Padded tokens are the proxy for epoch time; random batches are not timed.{Style.RESET_ALL}"
+    )
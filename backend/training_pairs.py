@@ -0,0 +1,172 @@
+import os
+from collections.abc import Sequence
+from typing import List, Dict, Any, Iterable, Tuple, Union
+import numpy as np
+from config import JSON_FILE
+from utils import ensure_dir, load_json
+from colorama import Fore, Style, init
+
+init(autoreset=True)
+
+
+class TrainingPairs(Sequence):
+    """Pairs kept as document indices; abstracts are looked up on access."""
+
+    def __init__(
+        self,
+        documents,
+        first: np.ndarray,
+        second: np.ndarray,
+        scores: np.ndarray,
+    ):
+        self.documents = documents
+        self.first = np.asarray(first, dtype=np.int64)
+        self.second = np.asarray(second, dtype=np.int64)
+        self.scores = np.asarray(scores, dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    def __getitem__(
+        self, index: Union[int, slice]
+    ) -> Union[Tuple[str, str, float], "TrainingPairs"]:
+        if isinstance(index, slice):
+            return TrainingPairs(
+                self.documents,
+                self.first[index],
+                self.second[index],
+                self.scores[index],
+            )
+
+        return (
+            self._abstract(int(self.first[index])),
+            self._abstract(int(self.second[index])),
+            float(self.scores[index]),
+        )
+
+    def save(self, filepath: str) -> None:
+        # Only the documents referenced by some pair are listed, and the pair
+        # arrays index into that list.
+        referenced, inverse = np.unique(
+            np.concatenate([self.first, self.second]), return_inverse=True
+        )
+        if hasattr(self.documents, "column"):
+            all_ids = self.documents.column("id")
+            document_ids = [all_ids[index] for index in referenced.tolist()]
+        else:
+            document_ids = [
+                self.documents[index].get("id", "") for index in referenced.tolist()
+            ]
+
+        ensure_dir(os.path.dirname(filepath))
+        with open(filepath, "wb") as f:
+            np.savez(
+                f,
+                first=inverse[: len(self)].astype(np.int32),
+                second=inverse[len(self) :].astype(np.int32),
+                scores=self.scores.astype(np.float16),
+                document_ids=np.array(document_ids, dtype=str),
+            )
+
+    def _abstract(self, index: int) -> str:
+        if hasattr(self.documents, "get_field"):
+            return self.documents.get_field(index, "abstract") or ""
+        return self.documents[index].get("abstract", "")
+
+
+def pair_keys(first: np.ndarray, second: np.ndarray, count: int) -> np.ndarray:
+    # One integer per unordered pair, so (a, b) and (b, a) compare equal.
+    first = np.asarray(first, dtype=np.int64)
+    second = np.asarray(second, dtype=np.int64)
+    return np.minimum(first, second) * count + np.maximum(first, second)
+
+
+def exclude_pairs(pairs: TrainingPairs, excluded: TrainingPairs) -> TrainingPairs:
+    count = len(pairs.documents)
+    keep = ~np.isin(
+        pair_keys(pairs.first, pairs.second, count),
+        pair_keys(excluded.first, excluded.second, count),
+    )
+    return TrainingPairs(
+        pairs.documents, pairs.first[keep], pairs.second[keep], pairs.scores[keep]
+    )
+
+
+def merge_training_pairs(
+    pairs: List[TrainingPairs], random_state: int = 2025
+) -> TrainingPairs:
+    # A pair found by more than one source is kept once, with the label of
+    # the first source that has it; the result is shuffled so sources mix.
+    first = np.concatenate([p.first for p in pairs])
+    second = np.concatenate([p.second for p in pairs])
+    scores = np.concatenate([p.scores for p in pairs])
+    _, unique = np.unique(
+        pair_keys(first, second, len(pairs[0].documents)), return_index=True
+    )
+    order = np.random.default_rng(random_state).permutation(np.sort(unique))
+    return TrainingPairs(pairs[0].documents, first[order], second[order], scores[order])
+
+
+def load_pair_file(filepath: str, documents) -> TrainingPairs:
+    with np.load(filepath) as data:
+        first = data["first"].astype(np.int64)
+        second = data["second"].astype(np.int64)
+        scores = data["scores"].astype(np.float64)
+        document_ids = data["document_ids"].tolist()
+
+    if hasattr(documents, "column"):
+        collection_ids = documents.column("id")
+    else:
+        collection_ids = [doc.get("id", "") for doc in documents]
+    positions = {doc_id: index for index, doc_id in enumerate(collection_ids)}
+
+    # Pairs whose documents left the collection since they were generated
+    # (e.g. after re-validation) are dropped rather than misaligned.
+    mapping = np.array(
+        [positions.get(doc_id, -1) for doc_id in document_ids], dtype=np.int64
+    )
+    first, second = mapping[first], mapping[second]
+    valid = (first >= 0) & (second >= 0)
+    if not valid.all():
+        print(
+            f"{Fore.YELLOW}Skipping {int((~valid).sum())} pairs that reference "
+            f"documents no longer in the collection{Style.RESET_ALL}"
+        )
+
+    return TrainingPairs(documents, first[valid], second[valid], scores[valid])
+
+
+def load_training_pairs(
+    filepath: str, collection_file: str = JSON_FILE
+) -> Union[TrainingPairs, List[Tuple[str, str, float]]]:
+    if filepath.endswith(".npz"):
+        from collection_store import open_collection
+
+        return load_pair_file(filepath, open_collection(collection_file))
+
+    # Legacy format: a JSON list of {"text1", "text2", "similarity"} items.
+    return [
+        (item["text1"], item["text2"], float(item["similarity"]))
+        for item in load_json(filepath)
+    ]
+
+
+def index_pair_texts(
+    examples: Iterable[Any],
+) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
+    # Each distinct text appears once in the returned list; pairs refer to it
+    # by position, so it only has to be tokenised or encoded once.
+    texts: Dict[str, int] = {}
+    first, second, labels = [], [], []
+    for example in examples:
+        text1, text2 = example.texts
+        first.append(texts.setdefault(text1, len(texts)))
+        second.append(texts.setdefault(text2, len(texts)))
+        labels.append(example.label)
+
+    return (
+        list(texts),
+        np.array(first, dtype=np.int64),
+        np.array(second, dtype=np.int64),
+        np.array(labels, dtype=np.float32),
+    )
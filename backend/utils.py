@@ -2,7 +2,11 @@ import os
 import json
 import re
 import unicodedata
-from typing import List, Dict, Any
+import xml.etree.ElementTree as ET
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.context import BaseContext
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Optional
 import nltk
 from nltk.corpus import stopwords
 from nltk.tokenize import word_tokenize
@@ -37,6 +41,114 @@ def load_json(filepath: str) -> Any:
         return json.load(f)
 
 
+def save_jsonl(items: Iterable[Any], filepath: str) -> int:
+    ensure_dir(os.path.dirname(filepath))
+    count = 0
+    with open(filepath, "w", encoding="utf-8") as f:
+        for item in items:
+            f.write(json.dumps(item, ensure_ascii=False))
+            f.write("\n")
+            count += 1
+    return count
+
+
+def append_jsonl(item: Any, filepath: str) -> None:
+    ensure_dir(os.path.dirname(filepath))
+    with open(filepath, "a", encoding="utf-8") as f:
+        f.write(json.dumps(item, ensure_ascii=False))
+        f.write("\n")
+
+
+def iter_jsonl(filepath: str) -> Iterator[Any]:
+    with open(filepath, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def iterparse_records(filepath: str, tag: str) -> Iterator[ET.Element]:
+    # Each matching element is detached from its parent once the consumer
+    # resumes, so memory stays flat regardless of the file size.
+    stack = []
+    for event, elem in ET.iterparse(filepath, events=("start", "end")):
+        if event == "start":
+            stack.append(elem)
+            continue
+
+        stack.pop()
+        if elem.tag == tag:
+            yield elem
+            elem.clear()
+            if stack:
+                stack[-1].remove(elem)
+
+
+def chunked(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def resolve_workers(workers: Optional[int]) -> int:
+    return workers if workers and workers > 0 else os.cpu_count() or 1
+
+
+def parallel_map_chunks(
+    func: Callable[[List[Any]], Any],
+    items: Iterable[Any],
+    chunk_size: int,
+    workers: int,
+    initializer: Optional[Callable[..., None]] = None,
+    initargs: tuple = (),
+    mp_context: Optional[BaseContext] = None,
+) -> Iterator[Any]:
+    # Results come back in input order. At most two chunks per worker are in
+    # flight, so a streamed input is never read far ahead of the consumer.
+    if workers <= 1:
+        for chunk in chunked(items, chunk_size):
+            yield func(chunk)
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=mp_context,
+        initializer=initializer,
+        initargs=initargs,
+    ) as executor:
+        pending = deque()
+        chunk = []
+        error = None
+        try:
+            try:
+                for item in items:
+                    chunk.append(item)
+                    if len(chunk) >= chunk_size:
+                        pending.append(executor.submit(func, chunk))
+                        chunk = []
+                        if len(pending) >= workers * 2:
+                            yield pending.popleft().result()
+            except Exception as e:
+                # Whatever was read before the input failed is still delivered,
+                # as it would be by a serial loop, before the error is raised.
+                error = e
+
+            if chunk:
+                pending.append(executor.submit(func, chunk))
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+        if error is not None:
+            raise error
+
+
 def clean_text(text: str) -> str:
     if not text:
         return ""
@@ -82,6 +194,36 @@ def calculate_jaccard_similarity(set1: set, set2: set) -> float:
     return intersection / union if union > 0 else 0.0
 
 
+class DisjointSet:
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+        self.size = [1] * size
+
+    def find(self, item: int) -> int:
+        root = item
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[item] != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, first: int, second: int) -> bool:
+        first, second = self.find(first), self.find(second)
+        if first == second:
+            return False
+        if self.size[first] < self.size[second]:
+            first, second = second, first
+        self.parent[second] = first
+        self.size[first] += self.size[second]
+        return True
+
+    def groups(self) -> List[List[int]]:
+        members: Dict[int, List[int]] = {}
+        for item in range(len(self.parent)):
+            members.setdefault(self.find(item), []).append(item)
+        return [group for group in members.values() if len(group) > 1]
+
+
 def normalize_score(score: float, min_val: float = 0.0, max_val: float = 1.0) -> float:
     return max(min_val, min(max_val, score))
 
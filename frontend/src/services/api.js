@@ -75,5 +75,45 @@ export const api = {
       console.error('API error:', error);
       throw error;
     }
+  },
+
+  searchNextPage: async (cursor) => {
+    try {
+      const response = await fetch(`${API_BASE_URL}/api/search`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ cursor }),
+      });
+
+      if (!response.ok) {
+        const errorText = await response.text();
+        console.error('API response error:', errorText);
+        throw new Error('Search failed');
+      }
+
+      return await response.json();
+    } catch (error) {
+      console.error('API error:', error);
+      throw error;
+    }
+  },
+
+  suggest: async (query, limit = 8) => {
+    try {
+      const response = await fetch(
+        `${API_BASE_URL}/api/suggest?q=${encodeURIComponent(query)}&limit=${limit}`,
+      );
+      if (!response.ok) {
+        const errorText = await response.text();
+        console.error('API response error:', errorText);
+        throw new Error('Failed to fetch suggestions');
+      }
+      return await response.json();
+    } catch (error) {
+      console.error('API error:', error);
+      throw error;
+    }
   }
-};
\ No newline at end of file
+};